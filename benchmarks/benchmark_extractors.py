@@ -0,0 +1,222 @@
+'''Benchmarks for the read and write paths of the extractors.
+
+A synthetic dataset is generated with example_datasets.toy_example, written to
+every benchmarked format and read back. Recording results are reported in MB/s
+(of traces read or written) and sorting results in spikes/s.
+
+Run from the repository root:
+
+    python benchmarks/benchmark_extractors.py --duration 60 --num-channels 64 --num-units 50
+
+Formats whose dependencies are not installed are skipped.
+'''
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# use the spikeextractors of this checkout
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import spikeextractors as se
+
+
+def _best_time(func, repeat):
+    best = np.inf
+    result = None
+    for _ in range(repeat):
+        t_start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - t_start)
+    return best, result
+
+
+def _report(fmt, operation, elapsed, amount, unit):
+    rate = amount / elapsed if elapsed > 0 else np.inf
+    print('{:<16}{:<28}{:>10.4f} s{:>14.1f} {}'.format(fmt, operation, elapsed, rate, unit))
+
+
+def _report_error(fmt, operation, error):
+    print('{:<16}{:<28}{:>12} ({})'.format(fmt, operation, 'failed', str(error).splitlines()[0][:60]))
+
+
+def _write_phy_recording(recording, folder):
+    se.write_binary_dat_format(recording, folder / 'recording.dat', dtype='int16')
+    with (folder / 'params.py').open('w') as f:
+        f.write("dat_path = 'recording.dat'\n")
+        f.write('n_channels_dat = ' + str(recording.get_num_channels()) + '\n')
+        f.write("dtype = 'int16'\n")
+        f.write('offset = 0\n')
+        f.write('sample_rate = ' + str(recording.get_sampling_frequency()) + '\n')
+        f.write('hp_filtered = False\n')
+
+
+def recording_formats(folder):
+    '''Returns (name, writer, reader) for each benchmarked recording format.
+    writer(recording) writes the recording in the folder and reader() opens it.
+    '''
+    folder = Path(folder)
+    formats = [
+        ('Numpy', lambda rec: se.NumpyRecordingExtractor.write_recording(rec, folder / 'recording.npy'),
+         lambda rec: se.NumpyRecordingExtractor(str(folder / 'recording.npy'), rec.get_sampling_frequency())),
+        ('BinDat', lambda rec: se.BinDatRecordingExtractor.write_recording(rec, folder / 'recording.dat',
+                                                                           dtype='int16'),
+         lambda rec: se.BinDatRecordingExtractor(folder / 'recording.dat', rec.get_sampling_frequency(),
+                                                 rec.get_num_channels(), 'int16')),
+        ('Mda', lambda rec: se.MdaRecordingExtractor.write_recording(rec, str(folder / 'mda')),
+         lambda rec: se.MdaRecordingExtractor(str(folder / 'mda'))),
+        ('Phy', lambda rec: _write_phy_recording(rec, folder),
+         lambda rec: se.PhyRecordingExtractor(folder)),
+        ('Compressed', lambda rec: se.CompressedRecordingExtractor.write_recording(rec, folder / 'recording.cdat',
+                                                                                   dtype='int16'),
+         lambda rec: se.CompressedRecordingExtractor(folder / 'recording.cdat')),
+    ]
+    if se.BiocamRecordingExtractor.installed:
+        formats.append(('Biocam', lambda rec: se.BiocamRecordingExtractor.write_recording(rec, folder / 'rec.brw'),
+                        lambda rec: se.BiocamRecordingExtractor(folder / 'rec.brw')))
+    return formats
+
+
+def _write_phy_sorting(sorting, folder):
+    folder.mkdir(exist_ok=True)
+    se.PhySortingExtractor.write_sorting(sorting, folder)
+    # the PhySortingExtractor also needs the templates and the params file
+    shutil.copy(str(folder / 'spike_clusters.npy'), str(folder / 'spike_templates.npy'))
+    with (folder / 'params.py').open('w') as f:
+        f.write('sample_rate = 30000.\n')
+
+
+def sorting_formats(folder):
+    '''Returns (name, writer, reader) for each benchmarked sorting format.
+    writer(sorting) writes the sorting in the folder and reader() opens it.
+    '''
+    folder = Path(folder)
+    formats = [
+        ('Npz', lambda sort: se.NpzSortingExtractor.write_sorting(sort, str(folder / 'sorting.npz')),
+         lambda: se.NpzSortingExtractor(str(folder / 'sorting.npz'))),
+        ('Mda', lambda sort: se.MdaSortingExtractor.write_sorting(sort, str(folder / 'firings.mda')),
+         lambda: se.MdaSortingExtractor(str(folder / 'firings.mda'))),
+        ('Kilosort', lambda sort: se.KiloSortSortingExtractor.write_sorting(sort, folder / 'kilosort'),
+         lambda: se.KiloSortSortingExtractor(folder / 'kilosort')),
+        ('Phy', lambda sort: _write_phy_sorting(sort, folder / 'phy'),
+         lambda: se.PhySortingExtractor(folder / 'phy')),
+    ]
+    if se.HS2SortingExtractor.installed:
+        formats.append(('HS2', lambda sort: se.HS2SortingExtractor.write_sorting(sort, str(folder / 'hs2.hdf5')),
+                        lambda: se.HS2SortingExtractor(str(folder / 'hs2.hdf5'))))
+    if se.KlustaSortingExtractor.installed:
+        formats.append(('Klusta', lambda sort: se.KlustaSortingExtractor.write_sorting(sort, folder / 'klusta'),
+                        lambda: se.KlustaSortingExtractor(folder / 'klusta' / 'klusta.kwik')))
+    if se.SpykingCircusSortingExtractor.installed:
+        formats.append(('SpykingCircus',
+                        lambda sort: se.SpykingCircusSortingExtractor.write_sorting(sort, folder / 'spykingcircus'),
+                        lambda: se.SpykingCircusSortingExtractor(folder / 'spykingcircus')))
+    return formats
+
+
+def benchmark_recording(fmt, recording, repeat=3, num_windows=20, num_snippets=1000, snippet_len=60, seed=0):
+    '''Times get_traces (full and in 1 s windows) and get_snippets on a recording.
+    '''
+    rng = np.random.RandomState(seed)
+    num_frames = recording.get_num_frames()
+
+    # traces are copied so that memory-mapped extractors actually read the data
+    elapsed, traces = _best_time(lambda: np.array(recording.get_traces()), repeat)
+    _report(fmt, 'get_traces (full)', elapsed, traces.nbytes / 1e6, 'MB/s')
+    bytes_per_frame = traces.nbytes / num_frames
+    del traces
+
+    window = min(int(recording.get_sampling_frequency()), num_frames)
+    starts = rng.randint(0, num_frames - window + 1, num_windows)
+
+    def read_windows():
+        for start in starts:
+            np.array(recording.get_traces(start_frame=int(start), end_frame=int(start) + window))
+
+    elapsed, _ = _best_time(read_windows, repeat)
+    _report(fmt, 'get_traces (1 s windows)', elapsed, num_windows * window * bytes_per_frame / 1e6, 'MB/s')
+
+    reference_frames = rng.randint(0, num_frames, num_snippets)
+    elapsed, snippets = _best_time(lambda: recording.get_snippets(reference_frames=reference_frames,
+                                                                  snippet_len=snippet_len), repeat)
+    _report(fmt, 'get_snippets (random)', elapsed, num_snippets * snippet_len * bytes_per_frame / 1e6, 'MB/s')
+
+
+def benchmark_sorting(fmt, sorting, num_frames, repeat=3, num_windows=20, window=30000, seed=0):
+    '''Times full and windowed get_unit_spike_train queries on a sorting.
+    '''
+    rng = np.random.RandomState(seed)
+    unit_ids = sorting.get_unit_ids()
+
+    def read_all():
+        return sum(len(sorting.get_unit_spike_train(unit_id)) for unit_id in unit_ids)
+
+    elapsed, num_spikes = _best_time(read_all, repeat)
+    _report(fmt, 'get_unit_spike_train', elapsed, num_spikes, 'spikes/s')
+
+    starts = rng.randint(0, max(num_frames - window, 1), num_windows)
+
+    def read_windows():
+        return sum(len(sorting.get_unit_spike_train(unit_id, start_frame=int(start), end_frame=int(start) + window))
+                   for start in starts for unit_id in unit_ids)
+
+    elapsed, num_spikes = _best_time(read_windows, repeat)
+    _report(fmt, 'spike train (1 s windows)', elapsed, num_spikes, 'spikes/s')
+
+
+def run(duration=30, num_channels=32, num_units=30, repeat=3, seed=0):
+    '''Generates a toy dataset and benchmarks every available format.
+    '''
+    print('Generating toy example: ' + str(duration) + ' s, ' + str(num_channels) + ' channels, ' +
+          str(num_units) + ' units')
+    recording, sorting = se.example_datasets.toy_example(duration=duration, num_channels=num_channels, K=num_units,
+                                                         seed=seed)
+    traces_mb = recording.get_traces().nbytes / 1e6
+    num_spikes = sum(len(sorting.get_unit_spike_train(u)) for u in sorting.get_unit_ids())
+    print('{:.1f} MB of traces, {} spikes\n'.format(traces_mb, num_spikes))
+
+    folder = Path(tempfile.mkdtemp())
+    try:
+        print('Recording extractors')
+        benchmark_recording('Numpy (memory)', recording, repeat=repeat, seed=seed)
+        for fmt, writer, reader in recording_formats(folder):
+            try:
+                elapsed, _ = _best_time(lambda: writer(recording), 1)
+                _report(fmt, 'write_recording', elapsed, traces_mb, 'MB/s')
+                benchmark_recording(fmt, reader(recording), repeat=repeat, seed=seed)
+            except Exception as e:
+                _report_error(fmt, 'recording', e)
+
+        print('\nSorting extractors')
+        num_frames = recording.get_num_frames()
+        benchmark_sorting('Numpy (memory)', sorting, num_frames, repeat=repeat, seed=seed)
+        # the Phy writer stores the amplitudes and pc_features features, which the Phy reader requires
+        for unit_id in sorting.get_unit_ids():
+            n_unit_spikes = len(sorting.get_unit_spike_train(unit_id))
+            sorting.set_unit_spike_features(unit_id, 'amplitudes', np.ones(n_unit_spikes))
+            sorting.set_unit_spike_features(unit_id, 'pc_features', np.zeros((n_unit_spikes, 3, 4)))
+        for fmt, writer, reader in sorting_formats(folder):
+            try:
+                elapsed, _ = _best_time(lambda: writer(sorting), 1)
+                _report(fmt, 'write_sorting', elapsed, num_spikes, 'spikes/s')
+                benchmark_sorting(fmt, reader(), num_frames, repeat=repeat, seed=seed)
+            except Exception as e:
+                _report_error(fmt, 'sorting', e)
+    finally:
+        shutil.rmtree(str(folder))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the read and write paths of the extractors')
+    parser.add_argument('--duration', type=float, default=30, help='duration of the toy recording in s')
+    parser.add_argument('--num-channels', type=int, default=32, help='number of channels')
+    parser.add_argument('--num-units', type=int, default=30, help='number of units')
+    parser.add_argument('--repeat', type=int, default=3, help='number of repetitions (the best time is reported)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args()
+    run(duration=args.duration, num_channels=args.num_channels, num_units=args.num_units, repeat=args.repeat,
+        seed=args.seed)
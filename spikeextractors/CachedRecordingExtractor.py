@@ -0,0 +1,114 @@
+from .SubRecordingExtractor import SubRecordingExtractor
+from collections import OrderedDict
+import threading
+import numpy as np
+
+
+# Caches time blocks (all channels) of a recording in memory with LRU eviction
+
+class CachedRecordingExtractor(SubRecordingExtractor):
+    '''A recording extractor that wraps another recording and keeps the most
+    recently read time blocks of its traces in memory. Reads that overlap
+    cached blocks (e.g. repeated get_traces or get_snippets calls from a GUI)
+    are served from memory, and reads spanning several blocks are assembled
+    from the cached pieces. It can be shared between threads.
+
+    Parameters
+    ----------
+    recording: RecordingExtractor
+        The recording extractor to be cached
+    block_size: int
+        The number of frames of each cached block. If None, blocks of 1 s are used.
+    max_cache_bytes: int
+        The maximum memory (in bytes) used by the cached blocks. When it is exceeded,
+        the least recently used blocks are evicted.
+    '''
+
+    def __init__(self, recording, block_size=None, max_cache_bytes=500 * 1024 ** 2):
+        SubRecordingExtractor.__init__(self, recording)
+        if block_size is None:
+            block_size = int(recording.get_sampling_frequency())
+        if block_size <= 0:
+            raise ValueError("'block_size' must be positive")
+        self._block_size = int(block_size)
+        self._max_cache_bytes = max_cache_bytes
+        self._blocks = OrderedDict()
+        self._cache_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+        for epoch_name in recording.get_epoch_names():
+            epoch_info = recording.get_epoch_info(epoch_name)
+            self.add_epoch(epoch_name, epoch_info['start_frame'], epoch_info['end_frame'])
+
+    def get_traces(self, channel_ids=None, start_frame=None, end_frame=None):
+        if start_frame is None:
+            start_frame = 0
+        if end_frame is None:
+            end_frame = self.get_num_frames()
+        start_frame = max(int(start_frame), 0)
+        end_frame = min(int(end_frame), self.get_num_frames())
+        if channel_ids is None:
+            channel_idxs = slice(None)
+        else:
+            channel_idxs = self._get_channel_indices(channel_ids)
+        first_block = start_frame // self._block_size
+        last_block = max(end_frame - 1, start_frame) // self._block_size
+
+        traces = None
+        for block_index in range(first_block, last_block + 1):
+            block = self._get_block(block_index)
+            block_start = block_index * self._block_size
+            sf = max(start_frame, block_start)
+            ef = min(end_frame, block_start + block.shape[1])
+            block_traces = block[channel_idxs, sf - block_start:max(ef - block_start, sf - block_start)]
+            if first_block == last_block:
+                # copy, so that the caller cannot modify the cached block
+                return np.array(block_traces)
+            if traces is None:
+                traces = np.empty((block_traces.shape[0], end_frame - start_frame), dtype=block.dtype)
+            traces[:, sf - start_frame:ef - start_frame] = block_traces
+        return traces
+
+    def _get_block(self, block_index):
+        with self._lock:
+            block = self._blocks.get(block_index)
+            if block is not None:
+                self._blocks.move_to_end(block_index)
+                self._hits += 1
+                return block
+            self._misses += 1
+        # the read is done outside the lock so that other threads can use the cache meanwhile
+        block_start = block_index * self._block_size
+        block_end = min(block_start + self._block_size, self.get_num_frames())
+        block = np.asarray(self._parent_recording.get_traces(start_frame=block_start, end_frame=block_end))
+        with self._lock:
+            if block_index not in self._blocks:
+                self._blocks[block_index] = block
+                self._cache_bytes += block.nbytes
+                while self._cache_bytes > self._max_cache_bytes and len(self._blocks) > 1:
+                    _, evicted_block = self._blocks.popitem(last=False)
+                    self._cache_bytes -= evicted_block.nbytes
+        return block
+
+    def get_cache_info(self):
+        '''Returns the statistics of the cache.
+
+        Returns
+        -------
+        cache_info: dict
+            Dictionary with the number of block hits and misses, the number of cached
+            blocks, and the memory (in bytes) used and allowed for the cache.
+        '''
+        with self._lock:
+            return dict(hits=self._hits, misses=self._misses, num_blocks=len(self._blocks),
+                        cache_bytes=self._cache_bytes, max_cache_bytes=self._max_cache_bytes)
+
+    def clear_cache(self):
+        '''Removes all the cached blocks and resets the hit/miss counters.
+        '''
+        with self._lock:
+            self._blocks.clear()
+            self._cache_bytes = 0
+            self._hits = 0
+            self._misses = 0
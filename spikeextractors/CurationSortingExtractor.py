@@ -1,23 +1,42 @@
 from .SortingExtractor import SortingExtractor
+from .LazyFeature import LazyFeature, concatenate_features
+from .SpikeVector import SpikeVector
+from functools import partial
+from collections import OrderedDict
+from pathlib import Path
+import base64
+import json
+import os
 import numpy as np
 
 
-# A Sorting Extractor that allows for manual curation of a sorting result (Represents curation as a tree of units)
+# A Sorting Extractor that allows for manual curation of a sorting result (Represents curation as a tree of units
+# over the relabeled spikes of the parent sorting)
 
 class CurationSortingExtractor(SortingExtractor):
 
-    def __init__(self, parent_sorting):
+    def __init__(self, parent_sorting, journal=None, curation_log=None):
         SortingExtractor.__init__(self)
         self._parent_sorting = parent_sorting
         self._original_unit_ids = list(np.copy(parent_sorting.get_unit_ids()))
         self._all_ids = list(np.copy(parent_sorting.get_unit_ids()))
-
-        #Create and store roots with original unit ids and cached spiketrains
-        self._roots = []
-        for i, unit_id in enumerate(self._original_unit_ids):
-            root = Unit(unit_id)
-            root.set_spike_train(parent_sorting.get_unit_spike_train(unit_id))
-            self._roots.append(root)
+        self._all_ids_index = {unit_id: i for i, unit_id in enumerate(self._all_ids)}
+
+        #The curation is a label (index in _all_ids, -1 if excluded) for each spike of the parent sorting.
+        #Curation operations are recorded in a journal and applied to the labels when spikes are read.
+        times, labels = parent_sorting.get_spike_vector(unit_ids=self._original_unit_ids)
+        self._times = np.asarray(times)
+        self._labels = np.array(labels, dtype='int64')
+        num_spikes = np.bincount(self._labels, minlength=len(self._original_unit_ids))
+        self._num_spikes = dict(zip(self._original_unit_ids, num_spikes.tolist()))
+        self._spike_vector = None
+        self._journal = []
+        self._num_applied = 0
+        self._curation_log = None
+
+        #Create and store roots with original unit ids
+        self._roots = OrderedDict((unit_id, Unit(unit_id)) for unit_id in self._original_unit_ids)
+        self._unit_ids = list(self._roots.keys())
         '''
         Copies over properties and spike features from parent_sorting.
         Only spike features will be preserved with merges and splits, properties
@@ -25,31 +44,55 @@ class CurationSortingExtractor(SortingExtractor):
         '''
         self.copy_unit_properties(parent_sorting)
         self.copy_unit_spike_features(parent_sorting)
+        #The spike trains of the curated units are sorted, so the features of unsorted parent trains are reordered
+        for unit_id, spike_train in zip(self._original_unit_ids, parent_sorting.get_all_spike_trains(self._original_unit_ids)):
+            if unit_id in self._unit_features and np.any(np.diff(spike_train) < 0):
+                order = np.argsort(spike_train, kind='mergesort')
+                for feature_name, features in self._unit_features[unit_id].items():
+                    self._unit_features[unit_id][feature_name] = \
+                        features.take(order) if isinstance(features, LazyFeature) else features[order]
+        if curation_log is not None:
+            #Operations already in the log are replayed, new operations are appended to it
+            self.apply_curation_journal(_read_curation_log(curation_log, self._original_unit_ids, len(self._times)))
+            self._curation_log = Path(curation_log)
+            if not self._curation_log.is_file() or self._curation_log.stat().st_size == 0:
+                _write_log_record(self._curation_log, {'unit_ids': [int(unit_id) for unit_id in self._original_unit_ids],
+                                                       'num_spikes': int(len(self._times))})
+        if journal is not None:
+            self.apply_curation_journal(journal)
 
     def get_unit_ids(self):
-        unit_ids = []
-        for root in self._roots:
-            unit_ids.append(root.unit_id)
-        return unit_ids
+        return list(self._unit_ids)
 
     def get_unit_spike_train(self, unit_id, start_frame=None, end_frame=None):
-        if start_frame is None:
-            start_frame = 0
-        if end_frame is None:
-            end_frame = np.Inf
-
-        valid_unit_id = False
-        spike_train = np.asarray([])
-        for root in self._roots:
-            if(root.unit_id == unit_id):
-                valid_unit_id = True
-                full_spike_train = root.get_spike_train()
-                inds = np.where((start_frame <= full_spike_train) & (full_spike_train < end_frame))
-                spike_train = full_spike_train[inds]
-        if(valid_unit_id):
-            return spike_train
-        else:
+        if unit_id not in self._roots:
             raise ValueError(str(unit_id) + " is an invalid unit id")
+        return self._get_curated_spike_vector().get_unit_spike_train(self._all_ids_index[unit_id],
+                                                                     start_frame=start_frame, end_frame=end_frame)
+
+    def get_spike_vector(self, unit_ids=None, start_frame=None, end_frame=None):
+        if unit_ids is None:
+            unit_ids = self._unit_ids
+        for unit_id in unit_ids:
+            if unit_id not in self._roots:
+                raise ValueError(str(unit_id) + " is an invalid unit id")
+        return self._get_curated_spike_vector().get_spike_vector(
+            unit_ids=[self._all_ids_index[unit_id] for unit_id in unit_ids],
+            start_frame=start_frame, end_frame=end_frame)
+
+    def get_unit_spike_features(self, unit_id, feature_name, start_frame=None, end_frame=None):
+        self._apply_journal()
+        return SortingExtractor.get_unit_spike_features(self, unit_id, feature_name,
+                                                        start_frame=start_frame, end_frame=end_frame)
+
+    def get_unit_spike_feature_names(self, unit_id=None):
+        self._apply_journal()
+        return SortingExtractor.get_unit_spike_feature_names(self, unit_id)
+
+    def _get_lazy_unit_spike_features(self, unit_id, feature_name, start_frame=None, end_frame=None):
+        self._apply_journal()
+        return SortingExtractor._get_lazy_unit_spike_features(self, unit_id, feature_name,
+                                                              start_frame=start_frame, end_frame=end_frame)
 
     def print_curation_tree(self, unit_id):
         '''This function prints the current curation tree for the unit_id (roots are current unit ids).
@@ -59,16 +102,48 @@ class CurationSortingExtractor(SortingExtractor):
         unit_id: in
             The unit id whose curation history will be printed.
         '''
-        root_ids = []
-        for i in range(len(self._roots)):
-            root_id = self._roots[i].unit_id
-            root_ids.append(root_id)
-        if(unit_id in root_ids):
-            root_index = root_ids.index(unit_id)
-            print(self._roots[root_index])
+        if(unit_id in self._roots):
+            print(self._roots[unit_id])
         else:
             raise ValueError("invalid unit id")
 
+    def get_curation_journal(self):
+        '''This function returns the curation operations applied to the parent sorting, in order.
+        Each operation is one of:
+
+            ('exclude', unit_ids)
+            ('merge', unit_ids, new_unit_id)
+            ('split', unit_id, indices, [new_unit_id_1, new_unit_id_2])
+
+        The journal can be given to a new CurationSortingExtractor of the same parent sorting
+        to reproduce the curation. To persist the curation while it is done, use the
+        curation_log argument: each operation is then appended to the log file, and a
+        CurationSortingExtractor created with the same parent sorting and log file replays it.
+
+        Returns
+        ----------
+        journal: list
+            The list of curation operations.
+        '''
+        return list(self._journal)
+
+    def apply_curation_journal(self, journal):
+        '''This function applies the curation operations of a journal (see get_curation_journal).
+
+        Parameters
+        ----------
+        journal: list
+            The list of curation operations to be applied
+        '''
+        for operation in journal:
+            if operation[0] == 'exclude':
+                self.exclude_units(operation[1])
+            elif operation[0] == 'merge':
+                self._merge_units(operation[1], operation[2])
+            elif operation[0] == 'split':
+                self._split_unit(operation[1], operation[2], operation[3])
+            else:
+                raise ValueError(str(operation[0]) + " is not a valid curation operation")
 
     def exclude_units(self, unit_ids):
         '''This function deletes roots from the curation tree according to the given unit_ids
@@ -80,19 +155,14 @@ class CurationSortingExtractor(SortingExtractor):
         '''
         if(len(unit_ids) == 0):
             return
-        root_ids = []
-        for i in range(len(self._roots)):
-            root_id = self._roots[i].unit_id
-            root_ids.append(root_id)
-
-        if(set(unit_ids).issubset(set(root_ids)) and len(unit_ids) > 0):
-            indices_to_be_deleted = []
+        if(set(unit_ids).issubset(self._roots)):
+            unit_ids = list(unit_ids)
+            self._add_operation(('exclude', unit_ids))
             for unit_id in unit_ids:
-                root_index = root_ids.index(unit_id)
-                indices_to_be_deleted.append(root_index)
-                if unit_id in self._unit_features:
-                    del self._unit_features[unit_id]
-            self._roots = [self._roots[i] for i,_ in enumerate(root_ids) if i not in indices_to_be_deleted]
+                del self._roots[unit_id]
+                del self._num_spikes[unit_id]
+            self._unit_ids = list(self._roots.keys())
+            self._invalidate_unit_index_map()
         else:
             raise ValueError(str(unit_ids) + " has one or more invalid unit ids")
 
@@ -100,6 +170,10 @@ class CurationSortingExtractor(SortingExtractor):
         '''This function merges two roots from the curation tree according to the given unit_ids. It creates a new unit_id and root
         that has the merged roots as children.
 
+        The spike train of the new unit contains the spikes of the merged units sorted by frame. Spikes at the
+        same frame are ordered as their units in unit_ids (and then as in the spike train of their unit), and
+        the spike features of the new unit follow the same order.
+
         Parameters
         ----------
         unit_ids: list
@@ -107,51 +181,20 @@ class CurationSortingExtractor(SortingExtractor):
         '''
         if(len(unit_ids) <= 1):
             return
+        self._merge_units(unit_ids, max(self._all_ids)+1)
 
-        root_ids = []
-        for i in range(len(self._roots)):
-            root_id = self._roots[i].unit_id
-            root_ids.append(root_id)
-
-        indices_to_be_deleted = []
-        if(set(unit_ids).issubset(set(root_ids))):
-            #Find all unique feature names and create all feature lists
-            all_feature_names = []
-            for unit_id in unit_ids:
-                feature_names = self.get_unit_spike_feature_names(unit_id)
-                all_feature_names.append(feature_names)
-
-            shared_feature_names = set(all_feature_names[0])
-            for feature_names in all_feature_names[1:]:
-                shared_feature_names.intersection_update(feature_names)
-            shared_feature_names = list(shared_feature_names)
-            shared_features = []
-            for i in range(len(shared_feature_names)):
-                shared_features.append([])
-
-            new_root_id = max(self._all_ids)+1
-            self._all_ids.append(new_root_id)
+    def _merge_units(self, unit_ids, new_root_id):
+        if(set(unit_ids).issubset(self._roots)):
+            unit_ids = list(unit_ids)
+            self._add_unit_id(new_root_id)
+            self._add_operation(('merge', unit_ids, new_root_id))
             new_root = Unit(new_root_id)
-            all_spike_trains = []
             for unit_id in unit_ids:
-                root_index = root_ids.index(unit_id)
-                new_root.add_child(self._roots[root_index])
-                all_spike_trains.append(self._roots[root_index].get_spike_train())
-                for i, feature_name in enumerate(shared_feature_names):
-                    features = self.get_unit_spike_features(unit_id, feature_name)
-                    shared_features[i].append(features)
-                del self._unit_features[unit_id]
-                self._roots[root_index].set_spike_train(np.asarray([])) #clear spiketrain
-                indices_to_be_deleted.append(root_index)
-
-            all_spike_trains = np.concatenate(all_spike_trains)
-            sort_indices = np.argsort(all_spike_trains)
-            new_root.set_spike_train(np.asarray(all_spike_trains)[sort_indices])
-            del all_spike_trains
-            self._roots = [self._roots[i] for i,_ in enumerate(root_ids) if i not in indices_to_be_deleted]
-            self._roots.append(new_root)
-            for i, feature_name in enumerate(shared_feature_names):
-                self.set_unit_spike_features(new_root_id, feature_name, np.concatenate(shared_features[i])[sort_indices])
+                new_root.add_child(self._roots.pop(unit_id))
+            self._roots[new_root_id] = new_root
+            self._num_spikes[new_root_id] = sum(self._num_spikes.pop(unit_id) for unit_id in unit_ids)
+            self._unit_ids = list(self._roots.keys())
+            self._invalidate_unit_index_map()
         else:
             raise ValueError(str(unit_ids) + " has one or more invalid unit ids")
 
@@ -159,6 +202,10 @@ class CurationSortingExtractor(SortingExtractor):
         '''This function splits a root from the curation tree according to the given unit_id and indices. It creates two new unit_ids
         and roots that have the split root as a child. This function splits the spike train of the root by the given indices.
 
+        The indices are positions in the spike train (and spike features) of the unit, as returned by
+        get_unit_spike_train. The spikes at these positions form the first new unit and the other spikes the
+        second one. Both keep the order of the split spike train, also for spikes at the same frame.
+
         Parameters
         ----------
         unit_id: int
@@ -166,51 +213,143 @@ class CurationSortingExtractor(SortingExtractor):
         indices: list
             The indices of the unit spike train at which the spike train will be split.
         '''
-        root_ids = []
-        for i in range(len(self._roots)):
-            root_id = self._roots[i].unit_id
-            root_ids.append(root_id)
-
-        if(unit_id in root_ids):
-            indices_1 = np.sort(np.asarray(list(set(indices))))
-
-            root_index = root_ids.index(unit_id)
-            new_child = self._roots[root_index]
-            original_spike_train = self._roots[root_index].get_spike_train()
-
-            try:
-                spike_train_1 = original_spike_train[indices_1]
-            except IndexError:
-                print(str(indices) + " out of bounds for the spike train of " + str(unit_id))
-
-            indices_2 = list(set(range(len(original_spike_train))) - set(indices_1))
-            spike_train_2 = original_spike_train[indices_2]
-            del original_spike_train
-
-            new_root_1_id = max(self._all_ids)+1
-            self._all_ids.append(new_root_1_id)
-            new_root_1 = Unit(new_root_1_id)
-            new_root_1.add_child(new_child)
-            new_root_1.set_spike_train(spike_train_1)
-
-            new_root_2_id = max(self._all_ids)+1
-            self._all_ids.append(new_root_2_id)
-            new_root_2 = Unit(new_root_2_id)
-            new_root_2.add_child(new_child)
-            new_root_2.set_spike_train(spike_train_2)
-
-            self._roots.append(new_root_1)
-            self._roots.append(new_root_2)
-
-            for feature_name in self.get_unit_spike_feature_names(unit_id):
-                full_features = self.get_unit_spike_features(unit_id, feature_name)
-                self.set_unit_spike_features(new_root_1_id, feature_name, full_features[indices_1])
-                self.set_unit_spike_features(new_root_2_id, feature_name, full_features[indices_2])
-            del self._unit_features[unit_id]
-            del self._roots[root_index]
+        new_root_1_id = max(self._all_ids)+1
+        self._split_unit(unit_id, indices, [new_root_1_id, new_root_1_id+1])
+
+    def _split_unit(self, unit_id, indices, new_root_ids):
+        if(unit_id in self._roots):
+            indices_1 = np.unique(np.asarray(indices, dtype='int64'))
+            num_spikes = self._num_spikes[unit_id]
+            if len(indices_1) > 0 and (indices_1[0] < 0 or indices_1[-1] >= num_spikes):
+                raise ValueError(str(indices) + " out of bounds for the spike train of " + str(unit_id))
+            new_root_1_id, new_root_2_id = new_root_ids
+            self._add_unit_id(new_root_1_id)
+            self._add_unit_id(new_root_2_id)
+            self._add_operation(('split', unit_id, indices_1, [new_root_1_id, new_root_2_id]), num_spikes)
+
+            new_child = self._roots.pop(unit_id)
+            for new_root_id in new_root_ids:
+                new_root = Unit(new_root_id)
+                new_root.add_child(new_child)
+                self._roots[new_root_id] = new_root
+            del self._num_spikes[unit_id]
+            self._num_spikes[new_root_1_id] = len(indices_1)
+            self._num_spikes[new_root_2_id] = num_spikes - len(indices_1)
+            self._unit_ids = list(self._roots.keys())
+            self._invalidate_unit_index_map()
         else:
             raise ValueError(str(unit_id) + " non-valid unit id")
 
+    def _add_operation(self, operation, num_spikes=None):
+        self._journal.append(operation)
+        if self._curation_log is not None:
+            _write_log_record(self._curation_log, _encode_operation(operation, num_spikes))
+
+    def _add_unit_id(self, unit_id):
+        if unit_id in self._all_ids_index:
+            raise ValueError(str(unit_id) + " is already used as a unit id")
+        self._all_ids_index[unit_id] = len(self._all_ids)
+        self._all_ids.append(unit_id)
+
+    def _get_curated_spike_vector(self):
+        self._apply_journal()
+        if self._spike_vector is None:
+            self._spike_vector = SpikeVector(self._times, self._labels,
+                                             unit_ids=[self._all_ids_index[unit_id] for unit_id in self._unit_ids])
+        return self._spike_vector
+
+    def _apply_journal(self):
+        # applies the pending curation operations to the spike labels and to the spike features.
+        # Consecutive exclude and merge operations are composed into one lookup table of labels, which
+        # is applied to the spikes once, and each split relabels the spikes of the split unit.
+        while self._num_applied < len(self._journal):
+            self._spike_vector = None
+            if self._journal[self._num_applied][0] == 'split':
+                self._apply_split(*self._journal[self._num_applied][1:])
+                self._num_applied += 1
+            else:
+                end = self._num_applied
+                while end < len(self._journal) and self._journal[end][0] != 'split':
+                    end += 1
+                self._apply_relabel_operations(self._journal[self._num_applied:end])
+                self._num_applied = end
+
+    def _apply_relabel_operations(self, operations):
+        # lookup[label + 1] is the label after the operations (-1 for excluded spikes)
+        lookup = np.arange(-1, len(self._all_ids), dtype='int64')
+        # positions of the spikes of each label after the operations, only computed if merged units have features
+        label_positions = None
+        for operation in operations:
+            labels = [self._all_ids_index[unit_id] for unit_id in operation[1]]
+            if operation[0] == 'exclude':
+                lookup[np.isin(lookup, labels)] = -1
+                for unit_id in operation[1]:
+                    self._pop_unit_features(unit_id)
+                    if label_positions is not None:
+                        label_positions.pop(self._all_ids_index[unit_id], None)
+                continue
+            unit_ids, new_root_id = operation[1], operation[2]
+            new_label = self._all_ids_index[new_root_id]
+            all_features = [self._pop_unit_features(unit_id) for unit_id in unit_ids]
+            shared_feature_names = set(all_features[0])
+            for features in all_features[1:]:
+                shared_feature_names.intersection_update(features)
+            if len(shared_feature_names) == 0:
+                lookup[np.isin(lookup, labels)] = new_label
+                if label_positions is not None:
+                    label_positions[new_label] = np.sort(np.concatenate([label_positions.pop(label)
+                                                                         for label in labels]))
+                self._unit_features[new_root_id] = {}
+                continue
+            if label_positions is None:
+                label_positions = self._get_label_positions(lookup[self._labels + 1])
+            lookup[np.isin(lookup, labels)] = new_label
+            # the features of the merged unit are the concatenated features sorted by spike time
+            # (spikes at the same frame are ordered as the units in unit_ids)
+            unit_positions = np.concatenate([label_positions.pop(label) for label in labels])
+            sort_indices = np.argsort(self._times[unit_positions], kind='mergesort')
+            label_positions[new_label] = np.sort(unit_positions)
+            self._unit_features[new_root_id] = {}
+            for feature_name in shared_feature_names:
+                shared_features = [features[feature_name] for features in all_features]
+                if any(isinstance(features, LazyFeature) for features in shared_features):
+                    # lazy features are merged when they are read
+                    self._unit_features[new_root_id][feature_name] = \
+                        LazyFeature(partial(concatenate_features, shared_features, sort_indices))
+                else:
+                    self._unit_features[new_root_id][feature_name] = \
+                        concatenate_features(shared_features, sort_indices)
+        self._relabel_spikes(lookup)
+
+    def _relabel_spikes(self, lookup):
+        self._labels = lookup[self._labels + 1]
+
+    def _get_label_positions(self, labels):
+        # the positions of the spikes of each label, in increasing order
+        order = np.argsort(labels, kind='mergesort')
+        bounds = np.searchsorted(labels[order], np.arange(len(self._all_ids) + 1), side='left')
+        return {label: order[bounds[label]:bounds[label + 1]] for label in range(len(self._all_ids))}
+
+    def _apply_split(self, unit_id, indices_1, new_root_ids):
+        positions = np.flatnonzero(self._labels == self._all_ids_index[unit_id])
+        mask = np.zeros(len(positions), dtype=bool)
+        mask[indices_1] = True
+        indices_2 = np.flatnonzero(~mask)
+        self._labels[positions[mask]] = self._all_ids_index[new_root_ids[0]]
+        self._labels[positions[~mask]] = self._all_ids_index[new_root_ids[1]]
+        features = self._pop_unit_features(unit_id)
+        for new_root_id, split_indices in zip(new_root_ids, [indices_1, indices_2]):
+            self._unit_features[new_root_id] = {}
+            for feature_name, full_features in features.items():
+                if isinstance(full_features, LazyFeature):
+                    self._unit_features[new_root_id][feature_name] = full_features.take(split_indices)
+                else:
+                    self._unit_features[new_root_id][feature_name] = full_features[split_indices]
+
+    def _pop_unit_features(self, unit_id):
+        self._remove_cached_features(unit_id)
+        return self._unit_features.pop(unit_id, {})
+
     def printCurationTree(self, unit_id):
         '''This function prints the current curation tree for the unit_id (roots are current unit ids).
 
@@ -219,29 +358,80 @@ class CurationSortingExtractor(SortingExtractor):
         unit_id: in
             The unit id whose curation history will be printed.
         '''
-        root_ids = []
-        for i in range(len(self._roots)):
-            root_id = self._roots[i].unit_id
-            root_ids.append(root_id)
-        if(unit_id in root_ids):
-            root_index = root_ids.index(unit_id)
-            print(self._roots[root_index])
-        else:
-            raise ValueError("invalid unit id")
-
-
-# The Unit class is a node in the curation tree. Each Unit contains its unit_id, children, and spike_train.
+        self.print_curation_tree(unit_id)
+
+
+# The curation log is a json lines file: a header with the unit ids and number of spikes of the parent
+# sorting, followed by one line per operation. Split indices are stored as a packed bitmask of the spikes
+# of the unit.
+
+def _write_log_record(log_file, record):
+    with open(str(log_file), 'a') as f:
+        f.write(json.dumps(record) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _encode_operation(operation, num_spikes=None):
+    if operation[0] == 'exclude':
+        return {'op': 'exclude', 'unit_ids': [int(unit_id) for unit_id in operation[1]]}
+    elif operation[0] == 'merge':
+        return {'op': 'merge', 'unit_ids': [int(unit_id) for unit_id in operation[1]],
+                'new_unit_id': int(operation[2])}
+    else:
+        mask = np.zeros(num_spikes, dtype=bool)
+        mask[operation[2]] = True
+        return {'op': 'split', 'unit_id': int(operation[1]), 'num_spikes': int(num_spikes),
+                'mask': base64.b64encode(np.packbits(mask).tobytes()).decode('ascii'),
+                'new_unit_ids': [int(unit_id) for unit_id in operation[3]]}
+
+
+def _decode_operation(record):
+    if record['op'] == 'exclude':
+        return ('exclude', record['unit_ids'])
+    elif record['op'] == 'merge':
+        return ('merge', record['unit_ids'], record['new_unit_id'])
+    elif record['op'] == 'split':
+        mask = np.unpackbits(np.frombuffer(base64.b64decode(record['mask']), dtype='uint8'),
+                             count=record['num_spikes'])
+        return ('split', record['unit_id'], np.flatnonzero(mask), record['new_unit_ids'])
+    else:
+        raise ValueError(str(record['op']) + " is not a valid curation operation")
+
+
+def _read_curation_log(log_file, unit_ids, num_spikes):
+    log_file = Path(log_file)
+    if not log_file.is_file():
+        return []
+    with open(str(log_file), 'r') as f:
+        lines = f.readlines()
+    records = []
+    valid_size = 0
+    for line in lines:
+        # an operation interrupted while being written is discarded
+        if not line.endswith('\n'):
+            break
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            break
+        valid_size += len(line.encode())
+    if valid_size < log_file.stat().st_size:
+        with open(str(log_file), 'r+') as f:
+            f.truncate(valid_size)
+    if len(records) == 0:
+        return []
+    header = records[0]
+    if header.get('unit_ids') != [int(unit_id) for unit_id in unit_ids] or header.get('num_spikes') != num_spikes:
+        raise ValueError(str(log_file) + " is the curation log of a different sorting")
+    return [_decode_operation(record) for record in records[1:]]
+
+
+# The Unit class is a node in the curation tree. Each Unit contains its unit_id and children.
 class Unit(object):
     def __init__(self, unit_id):
         self.unit_id = unit_id
         self.children = []
-        self.spike_train = np.asarray([])
-
-    def set_spike_train(self, spike_train):
-        self.spike_train = spike_train
-
-    def get_spike_train(self):
-        return self.spike_train
 
     def add_child(self, child):
         self.children.append(child)
@@ -0,0 +1,73 @@
+import numpy as np
+
+
+# Spike features of a unit that are read from their source only when they are requested
+
+class LazyFeature(object):
+    '''A class that holds a handle to the spike features of a unit instead of
+    the features themselves. The source is either a callable that returns the
+    features (evaluated on access), or an array-like that supports indexing
+    along the first dimension (e.g. a numpy memmap or an h5py dataset). If
+    spike_indices is given, the features of the unit are the elements
+    spike_indices of the source, otherwise they are the whole source.
+
+    Parameters
+    ----------
+    source: callable or array_like
+        The source of the features.
+    spike_indices: array_like
+        The positions in the source of the features of each spike of the unit.
+    '''
+
+    def __init__(self, source, spike_indices=None):
+        self._source = source
+        self._spike_indices = None if spike_indices is None else np.asarray(spike_indices, dtype='int64')
+
+    def __len__(self):
+        if self._spike_indices is not None:
+            return len(self._spike_indices)
+        if callable(self._source):
+            return len(self._source())
+        return len(self._source)
+
+    def has_length(self):
+        '''Returns True if the number of spikes can be known without evaluating the source.
+        '''
+        return self._spike_indices is not None or not callable(self._source)
+
+    def get(self, positions=None):
+        '''Returns the features of the spikes at the given positions (all spikes if None).
+        '''
+        data = self._source() if callable(self._source) else self._source
+        idxs = self._spike_indices
+        if positions is not None:
+            positions = np.asarray(positions, dtype='int64')
+            idxs = positions if idxs is None else idxs[positions]
+        if idxs is None:
+            return np.asarray(data[:])
+        if isinstance(data, np.ndarray):
+            return data[idxs]
+        if len(idxs) == 0:
+            return np.asarray(data[0:0])
+        # other array-likes (e.g. h5py datasets) only support increasing indices
+        unique_idxs, inverse = np.unique(idxs, return_inverse=True)
+        return np.asarray(data[list(unique_idxs)])[inverse]
+
+    def take(self, positions):
+        '''Returns a LazyFeature with the features of the spikes at the given positions,
+        without reading them.
+        '''
+        positions = np.asarray(positions, dtype='int64')
+        if self._spike_indices is None:
+            return LazyFeature(self._source, positions)
+        return LazyFeature(self._source, self._spike_indices[positions])
+
+
+def concatenate_features(features, order=None):
+    '''Concatenates features (arrays or LazyFeatures) and reorders them by order.
+    '''
+    features = np.concatenate([feature.get() if isinstance(feature, LazyFeature) else np.asarray(feature)
+                               for feature in features])
+    if order is not None:
+        features = features[order]
+    return features
@@ -1,10 +1,14 @@
 from .RecordingExtractor import RecordingExtractor
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 
 class MultiRecordingExtractor(RecordingExtractor):
-    def __init__(self, recordings, epoch_names=None):
+    def __init__(self, recordings, epoch_names=None, n_jobs=1):
         RecordingExtractor.__init__(self)
+        self._n_jobs = n_jobs
+        # the thread pool used to read sections in parallel is created on first use and reused
+        self._executor = None
         if epoch_names is None:
             epoch_names = [str(i) for i in range(len(recordings))]
 
@@ -46,18 +50,19 @@ class MultiRecordingExtractor(RecordingExtractor):
         self._start_frames.append(ff)
         self._start_times.append(tt)
         self._num_frames = ff
+        # segment index used to locate frames and times with a binary search
+        self._segment_start_frames = np.array(self._start_frames[:-1])
+        self._segment_start_times = np.array(self._start_times[:-1])
 
         # Set the channel properties based on the first recording extractor
         self.copy_channel_properties(self._first_recording)
 
     def _find_section_for_frame(self, frame):
-        inds = np.where(np.array(self._start_frames[:-1]) <= frame)[0]
-        ind = inds[-1]
+        ind = max(int(np.searchsorted(self._segment_start_frames, frame, side='right')) - 1, 0)
         return self._RXs[ind], ind, frame - self._start_frames[ind]
 
     def _find_section_for_time(self, time):
-        inds = np.where(np.array(self._start_times[:-1]) <= time)[0]
-        ind = inds[-1]
+        ind = max(int(np.searchsorted(self._segment_start_times, time, side='right')) - 1, 0)
         return self._RXs[ind], ind, time - self._start_times[ind]
 
     def get_traces(self, channel_ids=None, start_frame=None, end_frame=None):
@@ -69,22 +74,39 @@ class MultiRecordingExtractor(RecordingExtractor):
         RX2, i_sec2, i_end_frame = self._find_section_for_frame(end_frame)
         if i_sec1 == i_sec2:
             return RX1.get_traces(channel_ids=channel_ids, start_frame=i_start_frame, end_frame=i_end_frame)
-        list = []
-        list.append(
-            self._RXs[i_sec1].get_traces(channel_ids=channel_ids, start_frame=i_start_frame,
-                                         end_frame=self._RXs[i_sec1].get_num_frames())
-        )
+        # (section, start frame in section, end frame in section, start frame in output)
+        reads = [(i_sec1, i_start_frame, self._RXs[i_sec1].get_num_frames(), 0)]
         for i_sec in range(i_sec1 + 1, i_sec2):
-            list.append(
-                self._RXs[i_sec].get_traces(channel_ids=channel_ids)
-            )
-        list.append(
-            self._RXs[i_sec2].get_traces(channel_ids=channel_ids, start_frame=0, end_frame=i_end_frame)
-        )
-        return np.concatenate(list, axis=1)
+            reads.append((i_sec, 0, self._RXs[i_sec].get_num_frames(), self._start_frames[i_sec] - start_frame))
+        if i_end_frame > 0:
+            reads.append((i_sec2, 0, i_end_frame, self._start_frames[i_sec2] - start_frame))
+
+        def read_section(read):
+            i_sec, sf, ef, _ = read
+            return self._RXs[i_sec].get_traces(channel_ids=channel_ids, start_frame=sf, end_frame=ef)
+
+        traces = None
+        if self._n_jobs > 1:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._n_jobs)
+            sections_traces = self._executor.map(read_section, reads)
+        else:
+            sections_traces = map(read_section, reads)
+        for read, section_traces in zip(reads, sections_traces):
+            if traces is None:
+                traces = np.empty((section_traces.shape[0], end_frame - start_frame), dtype=section_traces.dtype)
+            elif not np.can_cast(section_traces.dtype, traces.dtype):
+                traces = traces.astype(np.result_type(traces.dtype, section_traces.dtype))
+            offset = read[3]
+            traces[:, offset:offset + section_traces.shape[1]] = section_traces
+        return traces
+
+    def __del__(self):
+        if getattr(self, '_executor', None) is not None:
+            self._executor.shutdown(wait=False)
 
     def get_channel_ids(self):
-        return self._channel_ids
+        return list(self._channel_ids)
 
     def get_num_frames(self):
         return self._num_frames
@@ -93,9 +115,27 @@ class MultiRecordingExtractor(RecordingExtractor):
         return self._sampling_frequency
 
     def frame_to_time(self, frame):
-        RX, i_epoch, rel_frame = self._find_section_for_frame(frame)
-        return RX.frame_to_time(rel_frame) + self._start_times[i_epoch]
+        if np.ndim(frame) == 0:
+            RX, i_epoch, rel_frame = self._find_section_for_frame(frame)
+            return RX.frame_to_time(rel_frame) + self._start_times[i_epoch]
+        frames = np.asarray(frame)
+        inds = np.maximum(np.searchsorted(self._segment_start_frames, frames, side='right') - 1, 0)
+        times = np.empty(frames.shape, dtype='float64')
+        for ind in np.unique(inds):
+            mask = inds == ind
+            times[mask] = self._RXs[ind].frame_to_time(frames[mask] - self._start_frames[ind]) + \
+                          self._start_times[ind]
+        return times
 
     def time_to_frame(self, time):
-        RX, i_epoch, rel_time = self._find_section_for_time(time)
-        return RX.time_to_frame(rel_time) + self._start_frames[i_epoch]
+        if np.ndim(time) == 0:
+            RX, i_epoch, rel_time = self._find_section_for_time(time)
+            return RX.time_to_frame(rel_time) + self._start_frames[i_epoch]
+        times = np.asarray(time)
+        inds = np.maximum(np.searchsorted(self._segment_start_times, times, side='right') - 1, 0)
+        frames = np.empty(times.shape, dtype='float64')
+        for ind in np.unique(inds):
+            mask = inds == ind
+            frames[mask] = self._RXs[ind].time_to_frame(times[mask] - self._start_times[ind]) + \
+                           self._start_frames[ind]
+        return frames
@@ -26,13 +26,7 @@ class MultiSortingExtractor(SortingExtractor):
                     self._all_unit_ids.append(u_id)
                     self._unit_map[u_id] = {'sx': s_i, 'unit': unit_id}
                     u_id += 1
-            # set unit properties
-            for unit_id in self.get_unit_ids():
-                sx = self._unit_map[unit_id]['sx']
-                unit_id_sx = self._unit_map[unit_id]['unit']
-                properties = self._SXs[sx].get_unit_property_names(unit_id_sx)
-                for prop in properties:
-                    self.set_unit_property(unit_id, prop, self._SXs[sx].get_unit_property(unit_id_sx, prop))
+            # unit properties are read from the sortings when they are not set on this one
         else:
             for s_i, SX in enumerate(self._SXs):
                 unit_ids = SX.get_unit_ids()
@@ -41,26 +35,21 @@ class MultiSortingExtractor(SortingExtractor):
             self._all_unit_ids = list(set(self._all_unit_ids))
 
     def get_unit_ids(self):
-        return self._all_unit_ids
+        return list(self._all_unit_ids)
 
     def get_unit_spike_train(self, unit_id, start_frame=None, end_frame=None):
-        if start_frame is None:
-            start_frame = 0
-        if end_frame is None:
-            end_frame = np.Inf
-        if unit_id not in self.get_unit_ids():
+        if unit_id not in self._get_unit_index_map():
             raise ValueError("Non-valid unit_id")
 
         if self._allzeros:
             sx = self._unit_map[unit_id]['sx']
             unit_id_sx = self._unit_map[unit_id]['unit']
-            return self._SXs[sx].get_unit_spike_train(unit_id_sx)
+            return self._SXs[sx].get_unit_spike_train(unit_id_sx, start_frame=start_frame, end_frame=end_frame)
         else:
             spike_train = []
             for i, SX in enumerate(self._SXs):
-                if unit_id in SX.get_unit_ids():
-                    section_start_frame = max(0, start_frame - self._start_frames[i])
-                    section_end_frame = max(0, end_frame - self._start_frames[i])
+                if unit_id in SX._get_unit_index_map():
+                    section_start_frame, section_end_frame = self._get_section_frames(i, start_frame, end_frame)
                     section_spike_train = self._start_frames[i] + SX.get_unit_spike_train(unit_id=unit_id,
                                                                                           start_frame=section_start_frame,
                                                                                           end_frame=section_end_frame)
@@ -70,16 +59,45 @@ class MultiSortingExtractor(SortingExtractor):
             else:
                 return np.asarray(np.sort(np.concatenate(spike_train)))
 
+    def _get_section_frames(self, i, start_frame, end_frame):
+        # converts a frame window of this sorting to the frames of the i-th sorting
+        section_start_frame = None
+        section_end_frame = None
+        if start_frame is not None:
+            section_start_frame = max(0, start_frame - self._start_frames[i])
+        if end_frame is not None:
+            section_end_frame = max(0, end_frame - self._start_frames[i])
+        return section_start_frame, section_end_frame
+
     def get_unit_property(self, unit_id, property_name):
         if self._allzeros:
             if unit_id not in self._unit_map.keys():
                 raise ValueError("Non-valid unit_id")
+            if self._unit_properties.has(unit_id, property_name):
+                return self._unit_properties.get(unit_id, property_name)
             sx = self._unit_map[unit_id]['sx']
             unit_id_sx = self._unit_map[unit_id]['unit']
             return self._SXs[sx].get_unit_property(unit_id_sx, property_name)
         else:
             raise NotImplementedError()
 
+    def get_unit_property_names(self, unit_id=None):
+        if self._allzeros:
+            if unit_id is None:
+                property_names = set(SortingExtractor.get_unit_property_names(self))
+                for SX in self._SXs:
+                    property_names.update(SX.get_unit_property_names())
+                return sorted(property_names)
+            if unit_id not in self._unit_map.keys():
+                raise ValueError("Non-valid unit_id")
+            sx = self._unit_map[unit_id]['sx']
+            unit_id_sx = self._unit_map[unit_id]['unit']
+            property_names = set(SortingExtractor.get_unit_property_names(self, unit_id))
+            property_names.update(self._SXs[sx].get_unit_property_names(unit_id_sx))
+            return sorted(property_names)
+        else:
+            return SortingExtractor.get_unit_property_names(self, unit_id)
+
 
     def get_unit_spike_features(self, unit_id, feature_name, start_frame=None, end_frame=None):
         if self._allzeros:
@@ -89,7 +107,21 @@ class MultiSortingExtractor(SortingExtractor):
             unit_id_sx = self._unit_map[unit_id]['unit']
             return self._SXs[sx].get_unit_spike_features(unit_id_sx, feature_name, start_frame=start_frame, end_frame=end_frame)
         else:
-            raise NotImplementedError()
+            if unit_id not in self._get_unit_index_map():
+                raise ValueError("Non-valid unit_id")
+            # the features of each sorting are windowed and ordered like the spike train
+            spike_train = []
+            features = []
+            for i, SX in enumerate(self._SXs):
+                if unit_id in SX._get_unit_index_map():
+                    section_start_frame, section_end_frame = self._get_section_frames(i, start_frame, end_frame)
+                    spike_train.append(SX.get_unit_spike_train(unit_id=unit_id, start_frame=section_start_frame,
+                                                               end_frame=section_end_frame) + self._start_frames[i])
+                    features.append(np.asarray(SX.get_unit_spike_features(unit_id, feature_name,
+                                                                          start_frame=section_start_frame,
+                                                                          end_frame=section_end_frame)))
+            order = np.argsort(np.concatenate(spike_train), kind='mergesort')
+            return np.concatenate(features)[order]
 
 
     def get_unit_spike_feature_names(self, unit_id=None):
@@ -103,7 +135,7 @@ class MultiSortingExtractor(SortingExtractor):
                 feature_names = sorted(list(set(feature_names)))
                 return feature_names
             if isinstance(unit_id, (int, np.integer)):
-                if unit_id in self.get_unit_ids():
+                if unit_id in self._get_unit_index_map():
                     if unit_id not in self._unit_map.keys():
                         raise ValueError("Non-valid unit_id")
                     sx = self._unit_map[unit_id]['sx']
@@ -115,7 +147,21 @@ class MultiSortingExtractor(SortingExtractor):
             else:
                 raise ValueError("unit_id must be an int")
         else:
-            return self._unit_features
+            if unit_id is None:
+                feature_names = set()
+                for unit_id in self.get_unit_ids():
+                    feature_names.update(self.get_unit_spike_feature_names(unit_id))
+                return sorted(feature_names)
+            if unit_id not in self._get_unit_index_map():
+                raise ValueError("Non-valid unit_id")
+            # a feature is available if all the sortings that contain the unit have it
+            feature_names = None
+            for SX in self._SXs:
+                if unit_id in SX._get_unit_index_map():
+                    section_feature_names = set(SX.get_unit_spike_feature_names(unit_id))
+                    feature_names = section_feature_names if feature_names is None \
+                        else feature_names & section_feature_names
+            return sorted(feature_names)
 
     def set_unit_spike_features(self, unit_id, feature_name, value):
         if self._allzeros:
@@ -0,0 +1,99 @@
+# Columnar storage for the channel and unit properties of the extractors
+
+_MISSING = object()
+
+
+class PropertyTable(object):
+    '''A class that stores properties as columns: one list per property name,
+    indexed by the position of each id. Ids are added the first time a
+    property is set for them, so the table does not need to know all the ids
+    of the extractor in advance.
+    '''
+
+    def __init__(self):
+        self._ids = []
+        self._index = {}
+        self._columns = {}
+
+    def _get_positions(self, ids, add=False):
+        positions = []
+        for id in ids:
+            if id not in self._index:
+                if not add:
+                    positions.append(None)
+                    continue
+                self._index[id] = len(self._ids)
+                self._ids.append(id)
+                for column in self._columns.values():
+                    column.append(_MISSING)
+            positions.append(self._index[id])
+        return positions
+
+    def set(self, id, name, value):
+        '''Sets the value of the property name for the given id.
+        '''
+        self.set_many([id], name, [value])
+
+    def set_many(self, ids, name, values):
+        '''Sets the values of the property name for the given ids.
+        '''
+        if len(ids) != len(values):
+            raise ValueError("ids and values must have same length")
+        positions = self._get_positions(ids, add=True)
+        if name not in self._columns:
+            self._columns[name] = [_MISSING] * len(self._ids)
+        column = self._columns[name]
+        for position, value in zip(positions, values):
+            column[position] = value
+
+    def has(self, id, name):
+        '''Returns True if the property name has been set for the given id.
+        '''
+        if name not in self._columns or id not in self._index:
+            return False
+        return self._columns[name][self._index[id]] is not _MISSING
+
+    def get(self, id, name):
+        '''Returns the value of the property name for the given id. Raises a
+        KeyError if it has not been set.
+        '''
+        if not self.has(id, name):
+            raise KeyError(id)
+        return self._columns[name][self._index[id]]
+
+    def get_many(self, ids, name, default=_MISSING):
+        '''Returns the list of values of the property name for the given ids.
+        Missing values are replaced by default if it is given, otherwise a
+        KeyError is raised.
+        '''
+        column = self._columns.get(name)
+        values = []
+        for id, position in zip(ids, self._get_positions(ids)):
+            value = _MISSING if column is None or position is None else column[position]
+            if value is _MISSING:
+                if default is _MISSING:
+                    raise KeyError(id)
+                value = default
+            values.append(value)
+        return values
+
+    def get_names(self, ids):
+        '''Returns the sorted names of the properties set for at least one of the given ids.
+        '''
+        positions = [position for position in self._get_positions(ids) if position is not None]
+        names = []
+        for name, column in self._columns.items():
+            if any(column[position] is not _MISSING for position in positions):
+                names.append(name)
+        return sorted(names)
+
+    def remove(self, id, name=None):
+        '''Removes the property name (or all the properties if name is None) of the given id.
+        '''
+        if id not in self._index:
+            return
+        position = self._index[id]
+        names = list(self._columns.keys()) if name is None else [name]
+        for name in names:
+            if name in self._columns:
+                self._columns[name][position] = _MISSING
@@ -1,6 +1,9 @@
 from abc import ABC, abstractmethod
 import numpy as np
 import copy
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .PropertyTable import PropertyTable
 
 class RecordingExtractor(ABC):
     '''A class that contains functions for extracting important information
@@ -19,7 +22,10 @@ class RecordingExtractor(ABC):
 
     def __init__(self):
         self._epochs = {}
-        self._channel_properties = {}
+        self._channel_properties = PropertyTable()
+        self._channel_index_cache = None
+        # files the traces are read from, declared by file-based extractors (used by cache_to_folder)
+        self._source_files = []
 
     @abstractmethod
     def get_traces(self, channel_ids=None, start_frame=None, end_frame=None):
@@ -91,6 +97,29 @@ class RecordingExtractor(ABC):
         '''
         pass
 
+    def _get_channel_index_map(self):
+        '''Returns a dict mapping each channel id to its position in get_channel_ids().
+        The dict is built on first use. Extractors whose channel ids change after
+        construction must call _invalidate_channel_index_map when they do.
+        '''
+        index_map = getattr(self, '_channel_index_cache', None)
+        if index_map is None:
+            index_map = {channel_id: i for i, channel_id in enumerate(self.get_channel_ids())}
+            self._channel_index_cache = index_map
+        return index_map
+
+    def _invalidate_channel_index_map(self):
+        self._channel_index_cache = None
+
+    def _get_channel_indices(self, channel_ids):
+        '''Returns the positions in get_channel_ids() of the given channel ids.
+        '''
+        index_map = self._get_channel_index_map()
+        try:
+            return [index_map[channel_id] for channel_id in channel_ids]
+        except KeyError as e:
+            raise ValueError(str(e.args[0]) + " is not a valid channel_id")
+
     def get_num_channels(self):
         '''This function returns the number of channels in the recording.
 
@@ -108,34 +137,36 @@ class RecordingExtractor(ABC):
 
         Parameters
         ----------
-        frame: float
-            The frame to be converted to a time.
+        frame: float or array_like
+            The frame (or array of frames) to be converted to a time.
 
         Returns
         -------
-        time: float
+        time: float or numpy.ndarray
             The corresponding time in seconds.
         '''
         # Default implementation
-        return frame / self.get_sampling_frequency()
+        return np.asarray(frame) / self.get_sampling_frequency() if np.ndim(frame) > 0 \
+            else frame / self.get_sampling_frequency()
 
     def time_to_frame(self, time):
         '''This function converts a user-inputted time (in seconds) to a frame index.
 
         Parameters
         -------
-        time: float
-            The time (in seconds) to be converted to frame index.
+        time: float or array_like
+            The time (or array of times, in seconds) to be converted to frame index.
 
         Returns
         -------
-        frame: float
+        frame: float or numpy.ndarray
             The corresponding frame index.
         '''
         # Default implementation
-        return time * self.get_sampling_frequency()
+        return np.asarray(time) * self.get_sampling_frequency() if np.ndim(time) > 0 \
+            else time * self.get_sampling_frequency()
 
-    def get_snippets(self, *, reference_frames, snippet_len, channel_ids=None):
+    def get_snippets(self, *, reference_frames, snippet_len, channel_ids=None, max_chunk_frames=10000):
         '''This function returns data snippets from the given channels that
         are starting on the given frames and are the length of the given snippet
         lengths before and after.
@@ -153,6 +184,11 @@ class RecordingExtractor(ABC):
         channel_ids: array_like
             A list or array of channel ids (ints) from which each trace will be
             extracted.
+        max_chunk_frames: int
+            Snippets that are close in time are extracted together from a single
+            call to get_traces. This is the maximum number of frames read in one
+            call (default 10000). A single snippet is always read in one call,
+            even if it is longer than max_chunk_frames.
 
         Returns
         ----------
@@ -164,46 +200,131 @@ class RecordingExtractor(ABC):
         '''
         # Default implementation
         if isinstance(snippet_len, (tuple, list, np.ndarray)):
-            snippet_len_before = snippet_len[0]
-            snippet_len_after = snippet_len[1]
+            snippet_len_before = int(snippet_len[0])
+            snippet_len_after = int(snippet_len[1])
         else:
             snippet_len_before = int((snippet_len + 1) / 2)
-            snippet_len_after = snippet_len - snippet_len_before
+            snippet_len_after = int(snippet_len - snippet_len_before)
 
         if channel_ids is None:
             channel_ids = self.get_channel_ids()
 
+        reference_frames = np.asarray(reference_frames)
         num_snippets = len(reference_frames)
         num_channels = len(channel_ids)
         num_frames = self.get_num_frames()
         snippet_len_total = snippet_len_before + snippet_len_after
-        # snippets = []
         snippets = np.zeros((num_snippets, num_channels, snippet_len_total))
-        #TODO extract all waveforms in a chunk
-        pad_first = False
-        pad_last = False
-        pad_samples_first = 0
-        pad_samples_last = 0
-        snippet_idxs = np.array([], dtype=int)
-        for i in range(num_snippets):
-            snippet_chunk = np.zeros((num_channels, snippet_len_total))
-            if (0 <= reference_frames[i]) and (reference_frames[i] < num_frames):
-                snippet_range = np.array(
-                    [int(reference_frames[i]) - snippet_len_before, int(reference_frames[i]) + snippet_len_after])
-                snippet_buffer = np.array([0, snippet_len_total])
-                # The following handles the out-of-bounds cases
-                if snippet_range[0] < 0:
-                    snippet_buffer[0] -= snippet_range[0]
-                    snippet_range[0] -= snippet_range[0]
-                if snippet_range[1] >= num_frames:
-                    snippet_buffer[1] -= snippet_range[1] - num_frames
-                    snippet_range[1] -= snippet_range[1] - num_frames
-                snippet_chunk[:, snippet_buffer[0]:snippet_buffer[1]] = self.get_traces(channel_ids=channel_ids,
-                                                                                       start_frame=snippet_range[0],
-                                                                                       end_frame=snippet_range[1])
-            snippets[i] = snippet_chunk
+        if num_snippets == 0 or snippet_len_total <= 0:
+            return snippets
+
+        # snippets with a reference frame out of the recording are left as zeros
+        valid_idxs = np.where((0 <= reference_frames) & (reference_frames < num_frames))[0]
+        snippet_starts = reference_frames[valid_idxs].astype('int64') - snippet_len_before
+        order = np.argsort(snippet_starts, kind='stable')
+        valid_idxs = valid_idxs[order]
+        snippet_starts = snippet_starts[order]
+        # the part of each snippet that lies inside the recording
+        read_starts = np.maximum(snippet_starts, 0)
+        read_ends = np.minimum(snippet_starts + snippet_len_total, num_frames)
+
+        # group snippets in windows of at most max_chunk_frames and read each window once
+        offsets = np.arange(snippet_len_total)
+        i_start = 0
+        while i_start < len(valid_idxs):
+            chunk_start = read_starts[i_start]
+            i_end = np.searchsorted(read_ends, chunk_start + max_chunk_frames, side='right')
+            i_end = max(i_end, i_start + 1)
+            chunk_end = read_ends[i_end - 1]
+            traces = self.get_traces(channel_ids=channel_ids, start_frame=chunk_start, end_frame=chunk_end)
+            frames = snippet_starts[i_start:i_end, np.newaxis] + offsets
+            in_bounds = (frames >= 0) & (frames < num_frames)
+            frame_idxs = np.clip(frames - chunk_start, 0, traces.shape[1] - 1)
+            chunk_snippets = np.transpose(np.asarray(traces)[:, frame_idxs], (1, 0, 2))
+            chunk_snippets[np.broadcast_to(~in_bounds[:, np.newaxis, :], chunk_snippets.shape)] = 0
+            snippets[valid_idxs[i_start:i_end]] = chunk_snippets
+            i_start = i_end
         return snippets
 
+    def iter_chunks(self, chunk_size=None, margin=0, channel_ids=None, start_frame=None, end_frame=None, n_jobs=1):
+        '''This function is a generator that iterates over the traces of the
+        recording in consecutive chunks of frames, so that recordings of any
+        duration can be processed with bounded memory. For each chunk it yields
+        the start frame (inclusive), the end frame (exclusive), and the traces
+        of the chunk.
+
+        Parameters
+        ----------
+        chunk_size: int
+            The number of frames of each chunk (the last chunk can be shorter).
+            If None (default), chunks of one second are used.
+        margin: int
+            The number of extra frames added before and after each chunk (e.g. for
+            filtering). The yielded traces then cover [start_frame - margin, end_frame + margin)
+            and frames out of the recording are filled with zeros. Default 0.
+        channel_ids: array_like
+            A list or 1D array of channel ids (ints) from which the traces will be
+            extracted.
+        start_frame: int
+            The frame at which the iteration starts (inclusive). Default 0.
+        end_frame: int
+            The frame at which the iteration stops (exclusive). Default is the number of frames.
+        n_jobs: int
+            If greater than 1, the next chunks are read ahead in a thread pool of n_jobs
+            workers while the current chunk is being processed. At most n_jobs + 1 chunks
+            are held in memory. Default 1 (no prefetching).
+
+        Yields
+        ----------
+        start_frame: int
+            The start frame of the chunk (inclusive), without the margin.
+        end_frame: int
+            The end frame of the chunk (exclusive), without the margin.
+        traces: numpy.ndarray
+            A 2D array that contains the traces of the chunk.
+            Dimensions are: (num_channels x (end_frame - start_frame + 2 * margin))
+        '''
+        if start_frame is None:
+            start_frame = 0
+        if end_frame is None:
+            end_frame = self.get_num_frames()
+        if chunk_size is None:
+            chunk_size = max(int(self.get_sampling_frequency()), 1)
+        chunk_size = int(chunk_size)
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive int")
+        margin = int(margin)
+        chunk_frames = [(int(sf), int(min(sf + chunk_size, end_frame)))
+                        for sf in range(int(start_frame), int(end_frame), chunk_size)]
+
+        if n_jobs is None or n_jobs <= 1:
+            for sf, ef in chunk_frames:
+                yield sf, ef, self._get_chunk_traces(channel_ids, sf, ef, margin)
+        else:
+            with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+                pending = deque()
+                for sf, ef in chunk_frames:
+                    pending.append((sf, ef, executor.submit(self._get_chunk_traces, channel_ids, sf, ef, margin)))
+                    if len(pending) > n_jobs:
+                        sf0, ef0, future = pending.popleft()
+                        yield sf0, ef0, future.result()
+                while pending:
+                    sf0, ef0, future = pending.popleft()
+                    yield sf0, ef0, future.result()
+
+    def _get_chunk_traces(self, channel_ids, start_frame, end_frame, margin):
+        if margin == 0:
+            return self.get_traces(channel_ids=channel_ids, start_frame=start_frame, end_frame=end_frame)
+        read_start = max(start_frame - margin, 0)
+        read_end = min(end_frame + margin, self.get_num_frames())
+        traces = self.get_traces(channel_ids=channel_ids, start_frame=read_start, end_frame=read_end)
+        if read_start == start_frame - margin and read_end == end_frame + margin:
+            return traces
+        chunk = np.zeros((traces.shape[0], end_frame - start_frame + 2 * margin), dtype=traces.dtype)
+        pad_before = read_start - (start_frame - margin)
+        chunk[:, pad_before:pad_before + traces.shape[1]] = traces
+        return chunk
+
     def set_channel_locations(self, channel_ids, locations):
         '''This function sets the location properties of each specified channel
         id with the corresponding locations of the passed in locations list.
@@ -240,13 +361,7 @@ class RecordingExtractor(ABC):
             Returns a list of corresonding locations (floats) for the given
             channel_ids
         '''
-        if channel_ids is None:
-            channel_ids = self.get_channel_ids()
-        locations = []
-        for channel_id in channel_ids:
-            location = self.get_channel_property(channel_id, 'location')
-            locations.append(location)
-        return locations
+        return self.get_channels_property(channel_ids=channel_ids, property_name='location')
 
     def set_channel_groups(self, channel_ids, groups):
         '''This function sets the group property of each specified channel
@@ -283,13 +398,7 @@ class RecordingExtractor(ABC):
             Returns a list of corresonding groups (ints) for the given
             channel_ids
         '''
-        if channel_ids is None:
-            channel_ids = self.get_channel_ids()
-        groups = []
-        for channel_id in channel_ids:
-            group = self.get_channel_property(channel_id, 'group')
-            groups.append(group)
-        return groups
+        return self.get_channels_property(channel_ids=channel_ids, property_name='group')
 
     def set_channel_property(self, channel_id, property_name, value):
         '''This function adds a property dataset to the given channel under the
@@ -306,11 +415,9 @@ class RecordingExtractor(ABC):
             formats as specified by the user.
         '''
         if isinstance(channel_id, (int, np.integer)):
-            if channel_id in self.get_channel_ids():
-                if channel_id not in self._channel_properties:
-                    self._channel_properties[channel_id] = {}
+            if channel_id in self._get_channel_index_map():
                 if isinstance(property_name, str):
-                    self._channel_properties[channel_id][property_name] = value
+                    self._channel_properties.set(channel_id, property_name, value)
                 else:
                     raise ValueError(str(property_name) + " must be a string")
             else:
@@ -318,6 +425,31 @@ class RecordingExtractor(ABC):
         else:
             raise ValueError(str(channel_id) + " must be an int")
 
+    def set_channels_property(self, *, channel_ids=None, property_name, values):
+        '''Sets channel property data for a list of channels
+
+        Parameters
+        ----------
+        channel_ids: list
+            The list of channel ids for which the property will be set
+            Defaults to get_channel_ids()
+        property_name: str
+            The name of the property
+        values: list
+            The list of values to be set
+        '''
+        if channel_ids is None:
+            channel_ids = self.get_channel_ids()
+        if not isinstance(property_name, str):
+            raise ValueError(str(property_name) + " must be a string")
+        if len(channel_ids) != len(values):
+            raise ValueError("channel_ids and values must have same length")
+        index_map = self._get_channel_index_map()
+        for channel_id in channel_ids:
+            if channel_id not in index_map:
+                raise ValueError(str(channel_id) + " is not a valid channel_id")
+        self._channel_properties.set_many(channel_ids, property_name, values)
+
     def get_channel_property(self, channel_id, property_name):
         '''This function returns the data stored under the property name from
         the given channel.
@@ -336,12 +468,10 @@ class RecordingExtractor(ABC):
             formats as specified by the user.
         '''
         if isinstance(channel_id, (int, np.integer)):
-            if channel_id in self.get_channel_ids():
-                if channel_id not in self._channel_properties:
-                    self._channel_properties[channel_id] = {}
+            if channel_id in self._get_channel_index_map():
                 if isinstance(property_name, str):
-                    if property_name in list(self._channel_properties[channel_id].keys()):
-                        return self._channel_properties[channel_id][property_name]
+                    if self._channel_properties.has(channel_id, property_name):
+                        return self._channel_properties.get(channel_id, property_name)
                     else:
                         raise ValueError(str(property_name) + " has not been added to channel " + str(channel_id))
                 else:
@@ -351,6 +481,30 @@ class RecordingExtractor(ABC):
         else:
             raise ValueError(str(channel_id) + " must be an int")
 
+    def get_channels_property(self, *, channel_ids=None, property_name):
+        '''Returns a list of values stored under the property name corresponding
+        to a list of channels
+
+        Parameters
+        ----------
+        channel_ids: list
+            The channel ids for which the property will be returned
+            Defaults to get_channel_ids()
+        property_name: str
+            The name of the property
+        Returns
+        ----------
+        values
+            The list of values
+        '''
+        if channel_ids is None:
+            channel_ids = self.get_channel_ids()
+        try:
+            return self._channel_properties.get_many(channel_ids, property_name)
+        except KeyError:
+            # let get_channel_property raise the appropriate error
+            return [self.get_channel_property(channel_id, property_name) for channel_id in channel_ids]
+
     def get_channel_property_names(self, channel_id=None):
         '''Get a list of property names for a given channel, or for all channels if channel_id is None
          Parameters
@@ -364,19 +518,10 @@ class RecordingExtractor(ABC):
             The list of property names
         '''
         if channel_id is None:
-            property_names = []
-            for channel_id in self.get_channel_ids():
-                curr_property_names = self.get_channel_property_names(channel_id=channel_id)
-                for curr_property_name in curr_property_names:
-                    property_names.append(curr_property_name)
-            property_names = sorted(list(set(property_names)))
-            return property_names
+            return self._channel_properties.get_names(self.get_channel_ids())
         if isinstance(channel_id, (int, np.integer)):
-            if channel_id in self.get_channel_ids():
-                if channel_id not in self._channel_properties:
-                    self._channel_properties[channel_id] = {}
-                property_names = sorted(self._channel_properties[channel_id].keys())
-                return property_names
+            if channel_id in self._get_channel_index_map():
+                return self._channel_properties.get_names([channel_id])
             else:
                 raise ValueError(str(channel_id) + " is not a valid channel_id")
         else:
@@ -395,17 +540,18 @@ class RecordingExtractor(ABC):
         '''
         if channel_ids is None:
             channel_ids = recording.get_channel_ids()
-        if isinstance(channel_ids, int):
-            curr_property_names = recording.get_channel_property_names(channel_id=channel_ids)
-            for curr_property_name in curr_property_names:
-                value = recording.get_channel_property(channel_id=channel_ids, property_name=curr_property_name)
-                self.set_channel_property(channel_id=channel_ids, property_name=curr_property_name, value=value)
-        else:
-            for channel_id in channel_ids:
-                curr_property_names = recording.get_channel_property_names(channel_id=channel_id)
-                for curr_property_name in curr_property_names:
-                    value = recording.get_channel_property(channel_id=channel_id, property_name=curr_property_name)
-                    self.set_channel_property(channel_id=channel_id, property_name=curr_property_name, value=value)
+        if isinstance(channel_ids, (int, np.integer)):
+            channel_ids = [channel_ids]
+        for property_name in recording.get_channel_property_names():
+            try:
+                values = recording.get_channels_property(channel_ids=channel_ids, property_name=property_name)
+                self.set_channels_property(channel_ids=channel_ids, property_name=property_name, values=values)
+            except ValueError:
+                # the property is not set for all channels
+                for channel_id in channel_ids:
+                    if property_name in recording.get_channel_property_names(channel_id=channel_id):
+                        value = recording.get_channel_property(channel_id=channel_id, property_name=property_name)
+                        self.set_channel_property(channel_id=channel_id, property_name=property_name, value=value)
 
     def add_epoch(self, epoch_name, start_frame, end_frame):
         '''This function adds an epoch to your recording extractor that tracks
@@ -1,6 +1,9 @@
 from abc import ABC, abstractmethod
 import numpy as np
 import copy
+from .PropertyTable import PropertyTable
+from .LazyFeature import LazyFeature
+from collections import OrderedDict
 
 
 class SortingExtractor(ABC):
@@ -17,8 +20,14 @@ class SortingExtractor(ABC):
     installation_mesg = ""  # error message when not installed
 
     def __init__(self):
-        self._unit_properties = {}
+        self._unit_properties = PropertyTable()
         self._unit_features = {}
+        self._unit_index_cache = None
+        self._features_cache = OrderedDict()
+        self._features_cache_bytes = 0
+        self._features_cache_max_bytes = 0
+        # files the spike trains are read from, declared by file-based extractors (used by cache_to_folder)
+        self._source_files = []
 
     @abstractmethod
     def get_unit_ids(self):
@@ -31,6 +40,28 @@ class SortingExtractor(ABC):
         '''
         pass
 
+    def _get_unit_index_map(self):
+        '''Returns a dict mapping each unit id to its position in get_unit_ids().
+        The dict is built on first use. Extractors whose unit ids change after
+        construction must call _invalidate_unit_index_map when they do.
+        '''
+        index_map = getattr(self, '_unit_index_cache', None)
+        if index_map is None:
+            index_map = {unit_id: i for i, unit_id in enumerate(self.get_unit_ids())}
+            self._unit_index_cache = index_map
+        return index_map
+
+    def _invalidate_unit_index_map(self):
+        self._unit_index_cache = None
+
+    def _get_unit_index(self, unit_id):
+        '''Returns the position in get_unit_ids() of the given unit id.
+        '''
+        index_map = self._get_unit_index_map()
+        if unit_id not in index_map:
+            raise ValueError(str(unit_id) + " is not a valid unit_id")
+        return index_map[unit_id]
+
     @abstractmethod
     def get_unit_spike_train(self, unit_id, start_frame=None, end_frame=None):
         '''This function extracts spike frames from the specified unit.
@@ -63,6 +94,90 @@ class SortingExtractor(ABC):
         '''
         pass
 
+    @staticmethod
+    def window_spike_train(spike_train, start_frame=None, end_frame=None):
+        '''This function returns the spike frames of a sorted spike train that
+        fall in [start_frame, end_frame). The window bounds are found with a
+        binary search, so the cost does not depend on the length of the spike
+        train. Sorting extractors should use it in get_unit_spike_train.
+
+        Parameters
+        ----------
+        spike_train: array_like
+            A 1D array of spike frames sorted in increasing order.
+        start_frame: int
+            The frame above which a spike frame is returned  (inclusive).
+        end_frame: int
+            The frame below which a spike frame is returned  (exclusive).
+        Returns
+        ----------
+        spike_train: numpy.ndarray
+            A copy of the spike frames within the given range, so that extractors can
+            keep spike_train in memory and callers can modify the returned array.
+        '''
+        spike_train = np.asarray(spike_train)
+        i_start = 0
+        i_end = len(spike_train)
+        if start_frame is not None:
+            i_start = np.searchsorted(spike_train, start_frame, side='left')
+        if end_frame is not None:
+            i_end = np.searchsorted(spike_train, end_frame, side='left')
+        return np.array(spike_train[i_start:max(i_start, i_end)])
+
+    def get_all_spike_trains(self, unit_ids=None, start_frame=None, end_frame=None):
+        '''This function returns the spike trains of many units in one call.
+        Extractors that hold all spikes in memory can override it to avoid
+        the per-unit lookups of get_unit_spike_train.
+
+        Parameters
+        ----------
+        unit_ids: array_like
+            The unit ids for which the spike trains are returned. If None, all units are used.
+        start_frame: int
+            The frame above which a spike frame is returned  (inclusive).
+        end_frame: int
+            The frame below which a spike frame is returned  (exclusive).
+        Returns
+        ----------
+        spike_trains: list
+            A list with the spike train (numpy.ndarray) of each unit, in the order of unit_ids.
+        '''
+        if unit_ids is None:
+            unit_ids = self.get_unit_ids()
+        return [self.get_unit_spike_train(unit_id, start_frame=start_frame, end_frame=end_frame)
+                for unit_id in unit_ids]
+
+    def get_spike_vector(self, unit_ids=None, start_frame=None, end_frame=None):
+        '''This function returns all the spikes of the given units as a single
+        vector of spike frames sorted by time, and the index (in unit_ids) of
+        the unit of each spike. Spikes occurring at the same frame are ordered
+        as the units in unit_ids.
+
+        Parameters
+        ----------
+        unit_ids: array_like
+            The unit ids for which the spikes are returned. If None, all units are used.
+        start_frame: int
+            The frame above which a spike frame is returned  (inclusive).
+        end_frame: int
+            The frame below which a spike frame is returned  (exclusive).
+        Returns
+        ----------
+        times: numpy.ndarray
+            A 1D array with the frames of all spikes, sorted in increasing order.
+        unit_indices: numpy.ndarray
+            A 1D array with the index in unit_ids of the unit of each spike.
+        '''
+        if unit_ids is None:
+            unit_ids = self.get_unit_ids()
+        spike_trains = self.get_all_spike_trains(unit_ids=unit_ids, start_frame=start_frame, end_frame=end_frame)
+        if len(spike_trains) == 0:
+            return np.array([], dtype='int64'), np.array([], dtype='int64')
+        times = np.concatenate([np.asarray(st) for st in spike_trains])
+        unit_indices = np.repeat(np.arange(len(spike_trains)), [len(st) for st in spike_trains])
+        order = np.argsort(times, kind='mergesort')
+        return times[order], unit_indices[order]
+
     def set_unit_spike_features(self, unit_id, feature_name, value):
         '''This function adds a unit features data set under the given features
         name to the given unit.
@@ -77,17 +192,45 @@ class SortingExtractor(ABC):
             The data associated with the given feature name. Could be many
             formats as specified by the user.
         '''
+        if isinstance(value, LazyFeature):
+            self._set_unit_spike_features(unit_id, feature_name, value)
+        else:
+            self._set_unit_spike_features(unit_id, feature_name, np.asarray(value))
+
+    def set_lazy_unit_spike_features(self, unit_id, feature_name, source, spike_indices=None):
+        '''This function adds unit features that are read from their source only when
+        they are requested with get_unit_spike_features (e.g. features stored in a
+        memory-mapped file or in an hdf5 dataset).
+
+        Parameters
+        ----------
+        unit_id: int
+            The unit id for which the features will be set
+        feature_name: str
+            The name of the feature to be stored
+        source: callable or array_like
+            Either a callable that returns the features (evaluated on access), or an
+            array-like that supports indexing along the first dimension (e.g. a numpy
+            memmap or an h5py dataset).
+        spike_indices: array_like
+            The positions in the source of the features of each spike of the unit. If
+            None, the whole source contains the features of the unit.
+        '''
+        self._set_unit_spike_features(unit_id, feature_name, LazyFeature(source, spike_indices))
+
+    def _set_unit_spike_features(self, unit_id, feature_name, value):
         if isinstance(unit_id, (int, np.integer)):
-            if unit_id in self.get_unit_ids():
+            if unit_id in self._get_unit_index_map():
+                if not isinstance(feature_name, str):
+                    raise ValueError("feature_name must be a string")
+                # the length of lazy features given by a callable is only known once they are read
+                if not (isinstance(value, LazyFeature) and not value.has_length()) and \
+                        len(value) != len(self.get_unit_spike_train(unit_id)):
+                    raise ValueError("feature values should have the same length as the spike train")
                 if unit_id not in self._unit_features.keys():
                     self._unit_features[unit_id] = {}
-                if isinstance(feature_name, str) and len(value) == len(self.get_unit_spike_train(unit_id)):
-                    self._unit_features[unit_id][feature_name] = np.asarray(value)
-                else:
-                    if not isinstance(feature_name, str):
-                        raise ValueError("feature_name must be a string")
-                    else:
-                        raise ValueError("feature values should have the same length as the spike train")
+                self._unit_features[unit_id][feature_name] = value
+                self._remove_cached_features(unit_id, feature_name)
             else:
                 raise ValueError(str(unit_id) + " is not a valid unit_id")
         else:
@@ -125,16 +268,18 @@ class SortingExtractor(ABC):
             specified unit given the range of start and end frames.
         '''
         if isinstance(unit_id, (int, np.integer)):
-            if unit_id in self.get_unit_ids():
+            if unit_id in self._get_unit_index_map():
                 if unit_id not in self._unit_features.keys():
                     self._unit_features[unit_id] = {}
                 if isinstance(feature_name, str):
                     if feature_name in self._unit_features[unit_id].keys():
-                        if start_frame is None:
-                            start_frame = 0
-                        if end_frame is None:
-                            end_frame = len(self.get_unit_spike_train(unit_id))
-                        return self._unit_features[unit_id][feature_name][start_frame:end_frame]
+                        features = self._unit_features[unit_id][feature_name]
+                        positions = self._get_spike_positions(unit_id, start_frame, end_frame)
+                        if isinstance(features, LazyFeature):
+                            return self._get_lazy_features(unit_id, feature_name, features, positions)
+                        if positions is None:
+                            return features
+                        return features[positions]
                     else:
                         raise ValueError(str(feature_name) + " has not been added to unit " + str(unit_id))
                 else:
@@ -144,6 +289,95 @@ class SortingExtractor(ABC):
         else:
             raise ValueError(str(unit_id) + " must be an int")
 
+    def get_all_spike_features(self, feature_name, unit_ids=None, start_frame=None, end_frame=None):
+        '''This function returns the spike trains and the spike features of the given
+        units within the given frame window, so that a window of features (e.g.
+        amplitudes of an epoch) can be analyzed across all units at once.
+
+        Parameters
+        ----------
+        feature_name: string
+            The name of the feature to be returned.
+        unit_ids: array_like
+            The unit ids for which the features are returned. If None, all units are used.
+        start_frame: int
+            The frame above which a spike frame is returned  (inclusive).
+        end_frame: int
+            The frame below which a spike frame is returned  (exclusive).
+        Returns
+        ----------
+        spike_trains: list
+            A list with the spike train of each unit in the frame window.
+        spike_features: list
+            A list with the features of the spikes of each spike train.
+        '''
+        if unit_ids is None:
+            unit_ids = self.get_unit_ids()
+        spike_trains = self.get_all_spike_trains(unit_ids=unit_ids, start_frame=start_frame, end_frame=end_frame)
+        spike_features = [self.get_unit_spike_features(unit_id, feature_name, start_frame=start_frame,
+                                                       end_frame=end_frame) for unit_id in unit_ids]
+        return spike_trains, spike_features
+
+    def _get_spike_positions(self, unit_id, start_frame=None, end_frame=None):
+        # positions, in the spike train of the unit, of the spikes in [start_frame, end_frame)
+        # (a slice, or an index array for extractors whose spike trains are not sorted)
+        if start_frame is None and end_frame is None:
+            return None
+        spike_train = np.asarray(self.get_unit_spike_train(unit_id))
+        i_start = 0 if start_frame is None else np.searchsorted(spike_train, start_frame, side='left')
+        i_end = len(spike_train) if end_frame is None else np.searchsorted(spike_train, end_frame, side='left')
+        return slice(int(i_start), int(max(i_start, i_end)))
+
+    def _get_lazy_features(self, unit_id, feature_name, features, positions):
+        key = (unit_id, feature_name)
+        if key in self._features_cache:
+            self._features_cache.move_to_end(key)
+            cached = self._features_cache[key]
+            return cached if positions is None else cached[positions]
+        if self._features_cache_max_bytes <= 0:
+            if positions is None:
+                return features.get()
+            return features.get(_positions_to_indices(positions))
+        values = features.get()
+        if values.nbytes <= self._features_cache_max_bytes:
+            self._features_cache[key] = values
+            self._features_cache_bytes += values.nbytes
+            while self._features_cache_bytes > self._features_cache_max_bytes:
+                _, evicted = self._features_cache.popitem(last=False)
+                self._features_cache_bytes -= evicted.nbytes
+        return values if positions is None else values[positions]
+
+    def _remove_cached_features(self, unit_id, feature_name=None):
+        for key in list(self._features_cache.keys()):
+            if key[0] == unit_id and (feature_name is None or key[1] == feature_name):
+                self._features_cache_bytes -= self._features_cache.pop(key).nbytes
+
+    def _get_lazy_unit_spike_features(self, unit_id, feature_name, start_frame=None, end_frame=None):
+        # returns the lazy features of the unit (restricted to the frame window), or None if they are not lazy
+        features = self._unit_features.get(unit_id, {}).get(feature_name)
+        if not isinstance(features, LazyFeature):
+            return None
+        positions = self._get_spike_positions(unit_id, start_frame, end_frame)
+        if positions is None:
+            return features
+        return features.take(_positions_to_indices(positions))
+
+    def set_features_cache_size(self, max_bytes):
+        '''This function sets the memory budget of the cache of lazy spike features
+        (see set_lazy_unit_spike_features). When it is 0 (default), lazy features are
+        read from their source at each access, otherwise the features of the most
+        recently accessed units are kept in memory up to max_bytes.
+
+        Parameters
+        ----------
+        max_bytes: int
+            The maximum memory (in bytes) used by the cached features
+        '''
+        self._features_cache_max_bytes = max_bytes
+        while self._features_cache_bytes > self._features_cache_max_bytes and len(self._features_cache) > 0:
+            _, evicted = self._features_cache.popitem(last=False)
+            self._features_cache_bytes -= evicted.nbytes
+
     def get_unit_spike_feature_names(self, unit_id=None):
         '''This function returns the names of spike features for a single
         unit or across all units (depending on the given unit_id).
@@ -166,7 +400,7 @@ class SortingExtractor(ABC):
             feature_names = sorted(list(set(feature_names)))
             return feature_names
         if isinstance(unit_id, (int, np.integer)):
-            if unit_id in self.get_unit_ids():
+            if unit_id in self._get_unit_index_map():
                 if unit_id not in self._unit_features:
                     self._unit_features[unit_id] = {}
                 feature_names = sorted(self._unit_features[unit_id].keys())
@@ -191,11 +425,9 @@ class SortingExtractor(ABC):
             formats as specified by the user.
         '''
         if isinstance(unit_id, (int, np.integer)):
-            if unit_id in self.get_unit_ids():
-                if unit_id not in self._unit_properties:
-                    self._unit_properties[unit_id] = {}
+            if unit_id in self._get_unit_index_map():
                 if isinstance(property_name, str):
-                    self._unit_properties[unit_id][property_name] = value
+                    self._unit_properties.set(unit_id, property_name, value)
                 else:
                     raise ValueError(str(property_name) + " must be a string")
             else:
@@ -218,8 +450,15 @@ class SortingExtractor(ABC):
         '''
         if unit_ids is None:
             unit_ids = self.get_unit_ids()
-        for i, unit in enumerate(unit_ids):
-            self.set_unit_property(unit_id=unit, property_name=property_name, value=values[i])
+        if not isinstance(property_name, str):
+            raise ValueError(str(property_name) + " must be a string")
+        if len(unit_ids) != len(values):
+            raise ValueError("unit_ids and values must have same length")
+        index_map = self._get_unit_index_map()
+        for unit_id in unit_ids:
+            if unit_id not in index_map:
+                raise ValueError(str(unit_id) + " is not a valid unit_id")
+        self._unit_properties.set_many(unit_ids, property_name, values)
 
     def add_unit_property(self, unit_id, property_name, value):
         '''DEPRECATED! This function adds a unit property data set under the given property
@@ -237,9 +476,9 @@ class SortingExtractor(ABC):
         '''
         print('WARNING: add_unit_property is deprecated. Use set_unit_property instead.')
         if isinstance(unit_id, (int, np.integer)):
-            if unit_id in self.get_unit_ids():
+            if unit_id in self._get_unit_index_map():
                 if isinstance(property_name, str):
-                    self._unit_properties[unit_id][property_name] = value
+                    self._unit_properties.set(unit_id, property_name, value)
                 else:
                     raise ValueError(str(property_name) + " must be a string")
             else:
@@ -264,12 +503,10 @@ class SortingExtractor(ABC):
             formats as specified by the user.
         '''
         if isinstance(unit_id, (int, np.integer)):
-            if unit_id in self.get_unit_ids():
-                if unit_id not in self._unit_properties:
-                    self._unit_properties[unit_id] = {}
+            if unit_id in self._get_unit_index_map():
                 if isinstance(property_name, str):
-                    if property_name in list(self._unit_properties[unit_id].keys()):
-                        return self._unit_properties[unit_id][property_name]
+                    if self._unit_properties.has(unit_id, property_name):
+                        return self._unit_properties.get(unit_id, property_name)
                     else:
                         raise ValueError(str(property_name) + " has not been added to unit " + str(unit_id))
                 else:
@@ -297,8 +534,11 @@ class SortingExtractor(ABC):
         '''
         if unit_ids is None:
             unit_ids = self.get_unit_ids()
-        values = [self.get_unit_property(unit_id=unit, property_name=property_name) for unit in unit_ids]
-        return values
+        try:
+            return self._unit_properties.get_many(unit_ids, property_name)
+        except KeyError:
+            # let get_unit_property raise the appropriate error
+            return [self.get_unit_property(unit_id=unit, property_name=property_name) for unit in unit_ids]
 
     def get_unit_property_names(self, unit_id=None):
         '''Get a list of property names for a given unit, or for all units if unit_id is None
@@ -314,19 +554,10 @@ class SortingExtractor(ABC):
             The list of property names from the specified unit(s)
         '''
         if unit_id is None:
-            property_names = []
-            for unit_id in self.get_unit_ids():
-                curr_property_names = self.get_unit_property_names(unit_id)
-                for curr_property_name in curr_property_names:
-                    property_names.append(curr_property_name)
-            property_names = sorted(list(set(property_names)))
-            return property_names
+            return self._unit_properties.get_names(self.get_unit_ids())
         if isinstance(unit_id, (int, np.integer)):
-            if unit_id in self.get_unit_ids():
-                if unit_id not in self._unit_properties:
-                    self._unit_properties[unit_id] = {}
-                property_names = sorted(self._unit_properties[unit_id].keys())
-                return property_names
+            if unit_id in self._get_unit_index_map():
+                return self._unit_properties.get_names([unit_id])
             else:
                 raise ValueError(str(unit_id) + " is not a valid unit_id")
         else:
@@ -345,17 +576,18 @@ class SortingExtractor(ABC):
         '''
         if unit_ids is None:
             unit_ids = sorting.get_unit_ids()
-        if isinstance(unit_ids, int):
-            curr_property_names = sorting.get_unit_property_names(unit_id=unit_ids)
-            for curr_property_name in curr_property_names:
-                value = sorting.get_unit_property(unit_id=unit_ids, property_name=curr_property_name)
-                self.set_unit_property(unit_id=unit_ids, property_name=curr_property_name, value=value)
-        else:
-            for unit_id in unit_ids:
-                curr_property_names = sorting.get_unit_property_names(unit_id=unit_id)
-                for curr_property_name in curr_property_names:
-                    value = sorting.get_unit_property(unit_id=unit_id, property_name=curr_property_name)
-                    self.set_unit_property(unit_id=unit_id, property_name=curr_property_name, value=value)
+        if isinstance(unit_ids, (int, np.integer)):
+            unit_ids = [unit_ids]
+        for property_name in sorting.get_unit_property_names():
+            try:
+                values = sorting.get_units_property(unit_ids=unit_ids, property_name=property_name)
+                self.set_units_property(unit_ids=unit_ids, property_name=property_name, values=values)
+            except ValueError:
+                # the property is not set for all units
+                for unit_id in unit_ids:
+                    if property_name in sorting.get_unit_property_names(unit_id=unit_id):
+                        value = sorting.get_unit_property(unit_id=unit_id, property_name=property_name)
+                        self.set_unit_property(unit_id=unit_id, property_name=property_name, value=value)
 
     def copy_unit_spike_features(self, sorting, unit_ids=None):
         '''Copy unit spike features from another sorting extractor to the current
@@ -371,17 +603,22 @@ class SortingExtractor(ABC):
         '''
         if unit_ids is None:
             unit_ids = sorting.get_unit_ids()
-        if isinstance(unit_ids, int):
-            curr_feature_names = sorting.get_unit_spike_feature_names(unit_id=unit_ids)
-            for curr_feature_name in curr_feature_names:
-                value = sorting.get_unit_spike_features(unit_id=unit_ids, feature_name=curr_feature_name)
-                self.set_unit_spike_features(unit_id=unit_ids, feature_name=curr_feature_name, value=value)
-        else:
-            for unit_id in unit_ids:
-                curr_feature_names = sorting.get_unit_spike_feature_names(unit_id=unit_id)
-                for curr_feature_name in curr_feature_names:
-                    value = sorting.get_unit_spike_features(unit_id=unit_id, feature_name=curr_feature_name)
-                    self.set_unit_spike_features(unit_id=unit_id, feature_name=curr_feature_name, value=value)
+        if isinstance(unit_ids, (int, np.integer)):
+            unit_ids = [unit_ids]
+        for unit_id in unit_ids:
+            self._copy_unit_spike_features(sorting, unit_id, unit_id)
+
+    def _copy_unit_spike_features(self, sorting, sorting_unit_id, unit_id, start_frame=None, end_frame=None):
+        # lazy features are propagated as handles, the other features are shared without copy
+        for feature_name in sorting.get_unit_spike_feature_names(unit_id=sorting_unit_id):
+            lazy_features = sorting._get_lazy_unit_spike_features(sorting_unit_id, feature_name,
+                                                                   start_frame=start_frame, end_frame=end_frame)
+            if lazy_features is not None:
+                self.set_unit_spike_features(unit_id=unit_id, feature_name=feature_name, value=lazy_features)
+            else:
+                value = sorting.get_unit_spike_features(unit_id=sorting_unit_id, feature_name=feature_name,
+                                                        start_frame=start_frame, end_frame=end_frame)
+                self.set_unit_spike_features(unit_id=unit_id, feature_name=feature_name, value=value)
 
     @classmethod
     def gui_params(self):
@@ -406,3 +643,9 @@ class SortingExtractor(ABC):
         '''
         raise NotImplementedError("The write_sorting function is not \
                                   implemented for this extractor")
+
+
+def _positions_to_indices(positions):
+    if isinstance(positions, slice):
+        return np.arange(positions.start, positions.stop)
+    return positions
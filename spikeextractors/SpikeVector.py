@@ -0,0 +1,120 @@
+import numpy as np
+
+
+# Columnar representation of a spike sorting output (times, labels) shared by the sorting extractors
+
+class SpikeVector(object):
+    '''A class that stores all the spikes of a sorting output as flat arrays
+    of spike frames and labels. The spikes are sorted once by unit and by time
+    (one argsort), so that the spike train of a unit is a contiguous slice and
+    time-windowed queries are binary searches within that slice. The stored
+    arrays are read-only, and the query methods return copies of them.
+
+    Parameters
+    ----------
+    times: array_like
+        The spike frames of all spikes.
+    labels: array_like
+        The unit label of each spike (same length as times).
+    unit_ids: array_like
+        The unit ids to expose. If None (default), the unique labels are used.
+        Units without spikes are allowed and have empty spike trains.
+    '''
+
+    def __init__(self, times, labels, unit_ids=None):
+        times = np.asarray(times).ravel()
+        labels = np.asarray(labels).ravel()
+        if len(times) != len(labels):
+            raise ValueError("times and labels must have the same length")
+        if unit_ids is None:
+            unit_ids = np.unique(labels)
+        self._order = np.lexsort((times, labels))
+        self._times = times[self._order]
+        self._labels = labels[self._order]
+        self._unit_ids = list(unit_ids)
+        self._unit_index = {unit_id: i for i, unit_id in enumerate(self._unit_ids)}
+        self._unit_starts = np.searchsorted(self._labels, self._unit_ids, side='left')
+        self._unit_ends = np.searchsorted(self._labels, self._unit_ids, side='right')
+        self._time_sorted = None
+        for array in (self._order, self._times, self._labels):
+            array.flags.writeable = False
+
+    def get_unit_ids(self):
+        return list(self._unit_ids)
+
+    def get_num_spikes(self):
+        return len(self._times)
+
+    def get_unit_bounds(self, unit_id, start_frame=None, end_frame=None):
+        '''Returns the bounds (i_start, i_end) of the spikes of the given unit,
+        within the given frame window, in the sorted spike arrays.
+        '''
+        if unit_id not in self._unit_index:
+            raise ValueError(str(unit_id) + " is not a valid unit_id")
+        i_unit = self._unit_index[unit_id]
+        unit_start = self._unit_starts[i_unit]
+        unit_end = self._unit_ends[i_unit]
+        unit_times = self._times[unit_start:unit_end]
+        i_start = unit_start
+        i_end = unit_end
+        if end_frame is not None:
+            i_end = unit_start + np.searchsorted(unit_times, end_frame, side='left')
+        if start_frame is not None:
+            i_start = min(unit_start + np.searchsorted(unit_times, start_frame, side='left'), i_end)
+        return int(i_start), int(i_end)
+
+    def get_unit_spike_train(self, unit_id, start_frame=None, end_frame=None):
+        '''Returns the sorted spike frames of the given unit in [start_frame, end_frame).
+        '''
+        i_start, i_end = self.get_unit_bounds(unit_id, start_frame, end_frame)
+        return self._times[i_start:i_end].copy()
+
+    def get_unit_spike_indices(self, unit_id, start_frame=None, end_frame=None):
+        '''Returns the positions, in the times and labels arrays used to build the
+        SpikeVector, of the spikes returned by get_unit_spike_train. They can be used
+        to index per-spike arrays (e.g. amplitudes) stored in the same order.
+        '''
+        i_start, i_end = self.get_unit_bounds(unit_id, start_frame, end_frame)
+        return self._order[i_start:i_end].copy()
+
+    def get_spike_vector(self, unit_ids=None, start_frame=None, end_frame=None):
+        '''Returns all the spikes of the given units in [start_frame, end_frame), sorted
+        by time, as a (times, unit_indices) pair. unit_indices are positions in unit_ids,
+        and spikes at the same frame are ordered as the units in unit_ids.
+        '''
+        if self._time_sorted is None:
+            unit_indices = np.full(len(self._times), -1, dtype='int64')
+            for i, (i_start, i_end) in enumerate(zip(self._unit_starts, self._unit_ends)):
+                unit_indices[i_start:i_end] = i
+            time_order = np.argsort(self._times, kind='mergesort')
+            self._time_sorted = (self._times[time_order], unit_indices[time_order])
+            for array in self._time_sorted:
+                array.flags.writeable = False
+        times, unit_indices = self._time_sorted
+        i_start = 0
+        i_end = len(times)
+        if start_frame is not None:
+            i_start = np.searchsorted(times, start_frame, side='left')
+        if end_frame is not None:
+            i_end = max(i_start, np.searchsorted(times, end_frame, side='left'))
+        times = times[i_start:i_end]
+        unit_indices = unit_indices[i_start:i_end]
+        if unit_ids is not None:
+            remap = np.full(len(self._unit_ids) + 1, -1, dtype='int64')
+            for i, unit_id in enumerate(unit_ids):
+                if unit_id not in self._unit_index:
+                    raise ValueError(str(unit_id) + " is not a valid unit_id")
+                remap[self._unit_index[unit_id]] = i
+            unit_indices = remap[unit_indices]
+            internal_indices = [self._unit_index[unit_id] for unit_id in unit_ids]
+            if np.any(np.diff(internal_indices) <= 0):
+                # spikes at the same frame must follow the order of the passed unit_ids
+                keep = unit_indices >= 0
+                times = times[keep]
+                unit_indices = unit_indices[keep]
+                order = np.lexsort((unit_indices, times))
+                return times[order], unit_indices[order]
+        keep = unit_indices >= 0
+        if not np.all(keep):
+            return times[keep], unit_indices[keep]
+        return times.copy(), unit_indices.copy()
@@ -24,7 +24,7 @@ class SubRecordingExtractor(RecordingExtractor):
         self._original_channel_id_lookup = {}
         for i in range(len(self._channel_ids)):
             self._original_channel_id_lookup[self._renamed_channel_ids[i]] = self._channel_ids[i]
-        self.copy_channel_properties(parent_recording, channel_ids=self._renamed_channel_ids)
+        # channel properties are read from the parent recording when they are not set on this one
 
     def get_traces(self, channel_ids=None, start_frame=None, end_frame=None):
         if start_frame is None:
@@ -39,7 +39,7 @@ class SubRecordingExtractor(RecordingExtractor):
         return self._parent_recording.get_traces(channel_ids=original_ch_ids, start_frame=sf, end_frame=ef)
 
     def get_channel_ids(self):
-        return self._renamed_channel_ids
+        return list(self._renamed_channel_ids)
 
     def get_num_frames(self):
         return self._end_frame - self._start_frame
@@ -59,14 +59,36 @@ class SubRecordingExtractor(RecordingExtractor):
         frame2 = frame1 - self._start_frame
         return frame2
 
-    def get_snippets(self, *, reference_frames, snippet_len, channel_ids=None):
+    def get_channel_property(self, channel_id, property_name):
+        if channel_id in self._original_channel_id_lookup and \
+                not self._channel_properties.has(channel_id, property_name):
+            try:
+                return self._parent_recording.get_channel_property(self._original_channel_id_lookup[channel_id],
+                                                                   property_name)
+            except ValueError:
+                pass
+        return RecordingExtractor.get_channel_property(self, channel_id, property_name)
+
+    def get_channels_property(self, *, channel_ids=None, property_name):
         if channel_ids is None:
             channel_ids = self.get_channel_ids()
-        cf = self._start_frame + np.array(reference_frames)
-        original_ch_ids = []
-        original_ch_ids = self.get_original_channel_ids(channel_ids)
-        return self._parent_recording.get_snippets(reference_frames=reference_frames, snippet_len=snippet_len,
-                                                  channel_ids=original_ch_ids)
+        if not any(self._channel_properties.has(channel_id, property_name) for channel_id in channel_ids):
+            return self._parent_recording.get_channels_property(channel_ids=self.get_original_channel_ids(channel_ids),
+                                                                property_name=property_name)
+        return [self.get_channel_property(channel_id, property_name) for channel_id in channel_ids]
+
+    def get_channel_property_names(self, channel_id=None):
+        if channel_id is None:
+            property_names = set(RecordingExtractor.get_channel_property_names(self))
+            for original_channel_id in self._channel_ids:
+                property_names.update(self._parent_recording.get_channel_property_names(original_channel_id))
+            return sorted(property_names)
+        if channel_id not in self._original_channel_id_lookup:
+            raise ValueError(str(channel_id) + " is not a valid channel_id")
+        property_names = set(RecordingExtractor.get_channel_property_names(self, channel_id))
+        property_names.update(self._parent_recording.get_channel_property_names(
+            self._original_channel_id_lookup[channel_id]))
+        return sorted(property_names)
 
     def copy_channel_properties(self, recording, channel_ids=None):
         if channel_ids is None:
@@ -91,7 +113,7 @@ class SubRecordingExtractor(RecordingExtractor):
 
     def get_original_channel_ids(self, channel_ids):
         if isinstance(channel_ids, (int, np.integer)):
-            if channel_ids in self.get_channel_ids():
+            if channel_ids in self._original_channel_id_lookup:
                 original_ch_ids = self._original_channel_id_lookup[channel_ids]
             else:
                 raise ValueError("Non-valid channel_id")
@@ -99,7 +121,7 @@ class SubRecordingExtractor(RecordingExtractor):
             original_ch_ids = []
             for channel_id in channel_ids:
                 if isinstance(channel_id, (int, np.integer)):
-                    if channel_id in self.get_channel_ids():
+                    if channel_id in self._original_channel_id_lookup:
                         original_ch_id = self._original_channel_id_lookup[channel_id]
                         original_ch_ids.append(original_ch_id)
                     else:
@@ -24,33 +24,59 @@ class SubSortingExtractor(SortingExtractor):
         self._original_unit_id_lookup = {}
         for i in range(len(self._unit_ids)):
             self._original_unit_id_lookup[self._renamed_unit_ids[i]] = self._unit_ids[i]
-        self.copy_unit_properties(parent_sorting, unit_ids=self._renamed_unit_ids)
+        # unit properties are read from the parent sorting when they are not set on this one
         self.copy_unit_spike_features(parent_sorting, unit_ids=self._renamed_unit_ids)
 
     def get_unit_ids(self):
-        return self._renamed_unit_ids
+        return list(self._renamed_unit_ids)
 
     def get_unit_spike_train(self, unit_id, start_frame=None, end_frame=None):
-        if start_frame is None:
-            start_frame = 0
-        if end_frame is None:
-            end_frame = np.Inf
         if (isinstance(unit_id, (int, np.integer))):
-            if (unit_id in self.get_unit_ids()):
+            if unit_id in self._original_unit_id_lookup:
                 original_unit_id = self._original_unit_id_lookup[unit_id]
             else:
                 raise ValueError("Non-valid unit_id")
         else:
             raise ValueError("unit_id must be an int")
-        sf = self._start_frame + start_frame
-        ef = self._start_frame + end_frame
-        if sf < self._start_frame:
-            sf = self._start_frame
-        if ef > self._end_frame:
-            ef = self._end_frame
+        sf = self._start_frame
+        ef = self._end_frame
+        if start_frame is not None:
+            sf = max(sf, self._start_frame + start_frame)
+        if end_frame is not None:
+            ef = min(ef, self._start_frame + end_frame)
+        if np.isinf(ef):
+            ef = None
         return self._parent_sorting.get_unit_spike_train(unit_id=original_unit_id, start_frame=sf,
                                                          end_frame=ef) - self._start_frame
 
+    def get_unit_property(self, unit_id, property_name):
+        if unit_id in self._original_unit_id_lookup and not self._unit_properties.has(unit_id, property_name):
+            try:
+                return self._parent_sorting.get_unit_property(self._original_unit_id_lookup[unit_id], property_name)
+            except ValueError:
+                pass
+        return SortingExtractor.get_unit_property(self, unit_id, property_name)
+
+    def get_units_property(self, *, unit_ids=None, property_name):
+        if unit_ids is None:
+            unit_ids = self.get_unit_ids()
+        if not any(self._unit_properties.has(unit_id, property_name) for unit_id in unit_ids):
+            return self._parent_sorting.get_units_property(unit_ids=self.get_original_unit_ids(unit_ids),
+                                                           property_name=property_name)
+        return [self.get_unit_property(unit_id, property_name) for unit_id in unit_ids]
+
+    def get_unit_property_names(self, unit_id=None):
+        if unit_id is None:
+            property_names = set(SortingExtractor.get_unit_property_names(self))
+            for original_unit_id in self._unit_ids:
+                property_names.update(self._parent_sorting.get_unit_property_names(original_unit_id))
+            return sorted(property_names)
+        if unit_id not in self._original_unit_id_lookup:
+            raise ValueError(str(unit_id) + " is not a valid unit_id")
+        property_names = set(SortingExtractor.get_unit_property_names(self, unit_id))
+        property_names.update(self._parent_sorting.get_unit_property_names(self._original_unit_id_lookup[unit_id]))
+        return sorted(property_names)
+
     def copy_unit_properties(self, sorting, unit_ids=None):
         if unit_ids is None:
             unit_ids = self.get_unit_ids()
@@ -75,27 +101,21 @@ class SubSortingExtractor(SortingExtractor):
     def copy_unit_spike_features(self, sorting, unit_ids=None):
         if unit_ids is None:
             unit_ids = self.get_unit_ids()
-        if isinstance(unit_ids, int):
-            sorting_unit_id = unit_ids
+        if isinstance(unit_ids, (int, np.integer)):
+            unit_ids = [unit_ids]
+        for unit_id in unit_ids:
             if sorting is self._parent_sorting:
-                sorting_unit_id = self.get_original_unit_ids(unit_ids)
-            curr_feature_names = sorting.get_unit_spike_feature_names(unit_id=sorting_unit_id)
-            for curr_feature_name in curr_feature_names:
-                value = sorting.get_unit_spike_features(unit_id=sorting_unit_id, feature_name=curr_feature_name)
-                self.set_unit_spike_features(unit_id=unit_ids, feature_name=curr_feature_name, value=value)
-        else:
-            for unit_id in unit_ids:
-                sorting_unit_id = unit_id
-                if sorting is self._parent_sorting:
-                    sorting_unit_id = self.get_original_unit_ids(unit_id)
-                curr_feature_names = sorting.get_unit_spike_feature_names(unit_id=sorting_unit_id)
-                for curr_feature_name in curr_feature_names:
-                    value = sorting.get_unit_spike_features(unit_id=sorting_unit_id, feature_name=curr_feature_name)
-                    self.set_unit_spike_features(unit_id=unit_id, feature_name=curr_feature_name, value=value)
+                # only the features of the spikes in the frame window of this sub sorting are kept
+                start_frame = None if self._start_frame == 0 else self._start_frame
+                end_frame = None if np.isinf(self._end_frame) else self._end_frame
+                self._copy_unit_spike_features(sorting, self.get_original_unit_ids(unit_id), unit_id,
+                                               start_frame=start_frame, end_frame=end_frame)
+            else:
+                self._copy_unit_spike_features(sorting, unit_id, unit_id)
 
     def get_original_unit_ids(self, unit_ids):
         if isinstance(unit_ids, (int, np.integer)):
-            if unit_ids in self.get_unit_ids():
+            if unit_ids in self._original_unit_id_lookup:
                 original_unit_ids = self._original_unit_id_lookup[unit_ids]
             else:
                 raise ValueError("Non-valid unit_id")
@@ -103,7 +123,7 @@ class SubSortingExtractor(SortingExtractor):
             original_unit_ids = []
             for unit_id in unit_ids:
                 if isinstance(unit_id, (int, np.integer)):
-                    if unit_id in self.get_unit_ids():
+                    if unit_id in self._original_unit_id_lookup:
                         original_unit_id = self._original_unit_id_lookup[unit_id]
                         original_unit_ids.append(original_unit_id)
                     else:
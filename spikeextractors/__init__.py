@@ -1,13 +1,15 @@
 from .RecordingExtractor import RecordingExtractor
 from .SortingExtractor import SortingExtractor
+from .SpikeVector import SpikeVector
 from .SubSortingExtractor import SubSortingExtractor
 from .SubRecordingExtractor import SubRecordingExtractor
 from .MultiRecordingExtractor import MultiRecordingExtractor
 from .MultiSortingExtractor import MultiSortingExtractor
 from .CurationSortingExtractor import CurationSortingExtractor
+from .CachedRecordingExtractor import CachedRecordingExtractor
 
 from .extractorlist import *
 
 from . import example_datasets
 from .extraction_tools import load_probe_file, save_probe_file, read_binary, write_binary_dat_format, \
-    get_sub_extractors_by_property
+    get_sub_extractors_by_property, get_unit_waveforms, cache_to_folder, load_cached
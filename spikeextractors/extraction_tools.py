@@ -4,8 +4,12 @@ from .SortingExtractor import SortingExtractor
 from .SubRecordingExtractor import SubRecordingExtractor
 from .SubSortingExtractor import SubSortingExtractor
 import csv
+import hashlib
+import json
 import os
+import time
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 
 def read_python(path):
@@ -60,13 +64,15 @@ def load_probe_file(recording, probe_file, channel_map=None, channel_groups=None
                     if key_prop == 'channels':
                         ordered_channels = np.concatenate((ordered_channels, prop_val))
 
-            if list(ordered_channels) == recording.get_channel_ids():
+            recording_channels = set(recording.get_channel_ids())
+            if list(ordered_channels) == list(recording.get_channel_ids()):
                 subrecording = recording
             else:
-                if not np.all([chan in recording.get_channel_ids() for chan in ordered_channels]):
+                if not np.all([chan in recording_channels for chan in ordered_channels]):
                     print('Some channel in PRB file are not in original recording')
-                present_ordered_channels = [chan for chan in ordered_channels if chan in recording.get_channel_ids()]
+                present_ordered_channels = [chan for chan in ordered_channels if chan in recording_channels]
                 subrecording = SubRecordingExtractor(recording, channel_ids=present_ordered_channels)
+            subrecording_channels = set(subrecording.get_channel_ids())
             for cgroup_id in groups:
                 cgroup = probe_dict['channel_groups'][cgroup_id]
                 if 'channels' not in cgroup.keys() and len(groups) > 1:
@@ -79,14 +85,14 @@ def load_probe_file(recording, probe_file, channel_map=None, channel_groups=None
                 for key_prop, prop_val in cgroup.items():
                     if key_prop == 'channels':
                         for i_ch, prop in enumerate(prop_val):
-                            if prop in subrecording.get_channel_ids():
+                            if prop in subrecording_channels:
                                 subrecording.set_channel_property(prop, 'group', int(cgroup_id))
                     elif key_prop == 'geometry' or key_prop == 'location':
                         if isinstance(prop_val, dict):
                             if len(prop_val.keys()) != channels_in_group:
                                 print('geometry in PRB does not have the same length as channel in group')
                             for (i_ch, prop) in prop_val.items():
-                                if i_ch in subrecording.get_channel_ids():
+                                if i_ch in subrecording_channels:
                                     subrecording.set_channel_property(i_ch, 'location', prop)
                         elif isinstance(prop_val, (list, np.ndarray)) and len(prop_val) == channels_in_group:
                             if 'channels' not in cgroup.keys():
@@ -96,21 +102,21 @@ def load_probe_file(recording, probe_file, channel_map=None, channel_groups=None
                             if len(prop_val) != channels_in_group:
                                 print('geometry in PRB does not have the same length as channel in group')
                             for (i_ch, prop) in zip(channels_id_in_group, prop_val):
-                                if i_ch in subrecording.get_channel_ids():
+                                if i_ch in subrecording_channels:
                                     subrecording.set_channel_property(i_ch, 'location', prop)
                     else:
                         if isinstance(prop_val, dict) and len(prop_val.keys()) == channels_in_group:
                             for (i_ch, prop) in prop_val.items():
-                                if i_ch in subrecording.get_channel_ids():
+                                if i_ch in subrecording_channels:
                                     subrecording.set_channel_property(i_ch, key_prop, prop)
                         elif isinstance(prop_val, (list, np.ndarray)) and len(prop_val) == channels_in_group:
                             for (i_ch, prop) in zip(subrecording.get_channel_ids(), prop_val):
-                                if i_ch in subrecording.get_channel_ids():
+                                if i_ch in subrecording_channels:
                                     subrecording.set_channel_property(i_ch, key_prop, prop)
                 # create dummy locations
                 if 'geometry' not in cgroup.keys() and 'location' not in cgroup.keys():
-                    for i, chan in enumerate(subrecording.get_channel_ids()):
-                        subrecording.set_channel_property(chan, 'location', [0, i])
+                    subrecording.set_channels_property(property_name='location',
+                                                       values=[[0, i] for i in range(subrecording.get_num_channels())])
         else:
             raise AttributeError("'.prb' file should contain the 'channel_groups' field")
 
@@ -130,13 +136,10 @@ def load_probe_file(recording, probe_file, channel_map=None, channel_groups=None
                 loaded_pos.append(pos)
             assert len(subrecording.get_channel_ids()) == row_count, "The .csv file must contain as many " \
                                                                      "rows as the number of channels in the recordings"
-            for i_ch, pos in zip(subrecording.get_channel_ids(), loaded_pos):
-                if i_ch in subrecording.get_channel_ids():
-                    subrecording.set_channel_property(i_ch, 'location', list(np.array(pos).astype(float)))
+            subrecording.set_channels_property(property_name='location',
+                                               values=[list(np.array(pos).astype(float)) for pos in loaded_pos])
             if channel_groups is not None and len(channel_groups) == len(subrecording.get_channel_ids()):
-                for i_ch, chg in zip(subrecording.get_channel_ids(), channel_groups):
-                    if i_ch in subrecording.get_channel_ids():
-                        subrecording.set_channel_property(i_ch, 'group', chg)
+                subrecording.set_channels_property(property_name='group', values=list(channel_groups))
     else:
         raise NotImplementedError("Only .csv and .prb probe files can be loaded.")
 
@@ -221,8 +224,11 @@ def read_binary(file, numchan, dtype, frames_first=True, offset=0):
     return samples
 
 
-def write_binary_dat_format(recording, save_path, time_axis=0, dtype=None, chunksize=None):
+def write_binary_dat_format(recording, save_path, time_axis=0, dtype=None, chunksize=None, n_jobs=1, scale=None,
+                            verbose=False):
     '''Saves the traces of a recording extractor in binary .dat format.
+    The output file is preallocated as a memory map and filled chunk by chunk,
+    so the recording is never loaded in memory as a whole.
 
     Parameters
     ----------
@@ -234,46 +240,106 @@ def write_binary_dat_format(recording, save_path, time_axis=0, dtype=None, chunk
         If 0 then traces are transposed to ensure (nb_sample, nb_channel) in the file.
         If 1, the traces shape (nb_channel, nb_sample) is kept in the file.
     dtype: dtype
-        Type of the saved data. Default float32
+        Type of the saved data. If None (default), the dtype of the traces is kept.
+        When dtype is an integer type, the (scaled) traces are rounded and clipped
+        to the range of dtype.
     chunksize: None or int
-        If not None then the copy done by chunk size.
-        Thi avoid to much memory consumption for big files.
+        Number of frames of each chunk that is read and written at once.
+        If None, chunks of one second are used.
+    n_jobs: int
+        Number of threads that read and write chunks in parallel (default 1).
+    scale: float
+        If not None, the traces are multiplied by scale before being converted to dtype.
+    verbose: bool
+        If True, the writing throughput is printed.
+
     Returns
     -------
+    save_path: Path
+        The path to the saved file
     '''
     save_path = Path(save_path)
     if save_path.suffix == '':
         # when suffix is already raw/bin/dat do not change it.
         save_path = save_path.parent / (save_path.name + '.dat')
-
+    if time_axis not in (0, 1):
+        raise ValueError("'time_axis' must be 0 or 1")
+
+    n_sample = recording.get_num_frames()
+    n_chan = recording.get_num_channels()
+    if dtype is None:
+        dtype = recording.get_traces(start_frame=0, end_frame=min(1, n_sample)).dtype
+    dtype = np.dtype(dtype)
     if chunksize is None:
-        traces = recording.get_traces()
-        if dtype is not None:
-            traces = traces.astype(dtype)
-        if time_axis == 0:
-            traces = traces.T
-        with save_path.open('wb') as f:
-            traces.tofile(f)
+        chunksize = max(int(recording.get_sampling_frequency()), 1)
+    if n_sample == 0 or n_chan == 0:
+        save_path.open('wb').close()
+        return save_path
+
+    t_start = time.perf_counter()
+    if time_axis == 0:
+        data = np.memmap(str(save_path), dtype=dtype, mode='w+', shape=(n_sample, n_chan))
     else:
-        assert time_axis ==0, 'chunked writting work only with time_axis 0'
-        n_sample = recording.get_num_frames()
-        n_chan = recording.get_num_channels()
-        n_chunk = n_sample // chunksize
-        if n_sample % chunksize > 0:
-            n_chunk += 1
-        with save_path.open('wb') as f:
-            for i in range(n_chunk):
-                traces = recording.get_traces(start_frame=i*chunksize,
-                                            end_frame=min((i+1)*chunksize, n_sample))
-                if dtype is not None:
-                    traces = traces.astype(dtype)
-                if time_axis == 0:
-                    traces = traces.T
-                f.write(traces.tobytes())
+        data = np.memmap(str(save_path), dtype=dtype, mode='w+', shape=(n_chan, n_sample))
 
+    def _write_chunk(start_frame, end_frame, traces):
+        traces = convert_traces(traces, dtype, scale)
+        if time_axis == 0:
+            data[start_frame:end_frame, :] = traces.T
+        else:
+            data[:, start_frame:end_frame] = traces
+
+    def _read_and_write_chunk(start_frame):
+        end_frame = min(start_frame + chunksize, n_sample)
+        _write_chunk(start_frame, end_frame, recording.get_traces(start_frame=start_frame, end_frame=end_frame))
+
+    if n_jobs is None or n_jobs <= 1:
+        for start_frame, end_frame, traces in recording.iter_chunks(chunk_size=chunksize):
+            _write_chunk(start_frame, end_frame, traces)
+    else:
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            list(executor.map(_read_and_write_chunk, range(0, n_sample, chunksize)))
+    data.flush()
+    del data
+
+    if verbose:
+        elapsed = time.perf_counter() - t_start
+        n_bytes = n_sample * n_chan * dtype.itemsize
+        print('Wrote ' + str(save_path) + ': ' + str(round(n_bytes / 1e6, 2)) + ' MB in ' + str(round(elapsed, 2))
+              + ' s (' + str(round(n_bytes / 1e6 / max(elapsed, 1e-9), 2)) + ' MB/s)')
     return save_path
 
 
+def convert_traces(traces, dtype, scale=None):
+    '''Converts traces to the given dtype, e.g. before writing them to a file.
+
+    Parameters
+    ----------
+    traces: np.array
+        The traces to be converted
+    dtype: dtype
+        The dtype of the converted traces
+    scale: float
+        If not None, the traces are multiplied by scale before the conversion.
+
+    Returns
+    -------
+    traces: np.array
+        The converted traces. Float traces converted to an integer dtype are rounded, and values
+        out of the range of the integer dtype are clipped.
+    '''
+    traces = np.asarray(traces)
+    if scale is not None:
+        traces = traces * scale
+    if np.issubdtype(dtype, np.integer) and not np.issubdtype(traces.dtype, np.integer):
+        info = np.iinfo(dtype)
+        traces = np.clip(np.rint(traces), info.min, info.max)
+    elif np.issubdtype(dtype, np.integer) and traces.dtype != dtype:
+        info = np.iinfo(dtype)
+        traces = np.clip(traces, info.min, info.max)
+    return traces.astype(dtype, copy=False)
+
+
 def get_sub_extractors_by_property(extractor, property_name, return_property_list=False):
     '''Divides Recording or Sorting Extractor based on the property_name (e.g. group)
 
@@ -297,8 +363,7 @@ def get_sub_extractors_by_property(extractor, property_name, return_property_lis
         else:
             sub_list = []
             recording = extractor
-            properties = np.array([recording.get_channel_property(chan, property_name)
-                                   for chan in recording.get_channel_ids()])
+            properties = np.array(recording.get_channels_property(property_name=property_name))
             prop_list = np.unique(properties)
             for prop in prop_list:
                 prop_idx = np.where(prop == properties)
@@ -314,8 +379,7 @@ def get_sub_extractors_by_property(extractor, property_name, return_property_lis
         else:
             sub_list = []
             sorting = extractor
-            properties = np.array([sorting.get_unit_property(unit, property_name)
-                                   for unit in sorting.get_unit_ids()])
+            properties = np.array(sorting.get_units_property(property_name=property_name))
             prop_list = np.unique(properties)
             for prop in prop_list:
                 prop_idx = np.where(prop == properties)
@@ -329,6 +393,362 @@ def get_sub_extractors_by_property(extractor, property_name, return_property_lis
         raise ValueError("'extractor' must be a RecordingExtractor or a SortingExtractor")
 
 
+def get_unit_waveforms(recording, sorting, unit_ids=None, ms_before=0.5, ms_after=2., channel_ids=None,
+                       grouping_property=None, max_spikes_per_unit=None, chunk_size=None, n_jobs=1,
+                       memmap_folder=None, seed=0, return_idxs=False, dtype='float64', verbose=False):
+    '''Extracts the waveforms of all the spikes of the given units in a single pass over the
+    recording. The spikes of all units are sorted by time, the recording is read once in
+    chunks, and the snippets of each chunk are scattered into the waveform arrays of the units.
+
+    Parameters
+    ----------
+    recording: RecordingExtractor
+        The recording extractor from which the waveforms are extracted
+    sorting: SortingExtractor
+        The sorting extractor with the spike trains of the units
+    unit_ids: array_like
+        The unit ids for which the waveforms are extracted. If None, all units are used.
+    ms_before: float
+        Time (in ms) of the waveform before the spike frame (default 0.5)
+    ms_after: float
+        Time (in ms) of the waveform after the spike frame (default 2)
+    channel_ids: array_like or dict
+        The channel ids of the waveforms: either a list (the same channels for all units) or
+        a dictionary with the list of channel ids of each unit. If None, all channels are used
+        (or the channels of the unit group if grouping_property is given).
+    grouping_property: str
+        If not None (and channel_ids is None), the waveforms of a unit are extracted on the channels
+        whose grouping_property (e.g. 'group') equals the grouping_property of the unit. Units
+        without this property use all channels.
+    max_spikes_per_unit: int
+        If not None, the waveforms of at most max_spikes_per_unit randomly selected spikes are
+        extracted for each unit.
+    chunk_size: None or int
+        Number of frames of each chunk of the recording that is read at once.
+        If None, chunks of one second are used.
+    n_jobs: int
+        Number of threads that read the chunks of the recording ahead (default 1).
+    memmap_folder: str or Path
+        If not None, the waveforms of each unit are written to a memory-mapped .npy file
+        (waveforms_<unit_id>.npy) in this folder, instead of being held in memory.
+    seed: int
+        The random seed used to select the spikes when max_spikes_per_unit is given.
+    return_idxs: bool
+        If True, the indices (in the spike train of each unit) of the extracted spikes are also returned.
+    dtype: dtype
+        The dtype of the waveforms (default float64, as the snippets of get_snippets). The dtype of
+        the recording (e.g. int16) can be used to reduce the memory of the waveforms.
+    verbose: bool
+        If True, the progress is printed.
+
+    Returns
+    -------
+    waveforms: list
+        The waveforms of each unit, as arrays of shape (num_spikes, num_channels, num_frames).
+    spike_idxs: list
+        The indices of the extracted spikes in the spike train of each unit (if return_idxs is True).
+    '''
+    if unit_ids is None:
+        unit_ids = sorting.get_unit_ids()
+    fs = recording.get_sampling_frequency()
+    frames_before = int(ms_before / 1000. * fs)
+    frames_after = int(ms_after / 1000. * fs)
+    snippet_len = frames_before + frames_after
+    num_frames = recording.get_num_frames()
+    all_channel_ids = recording.get_channel_ids()
+
+    # channels of each unit, as rows of the traces read for all units
+    channel_groups = None
+    unit_channel_ids = []
+    for unit_id in unit_ids:
+        if isinstance(channel_ids, dict):
+            unit_channels = channel_ids.get(unit_id, all_channel_ids)
+        elif channel_ids is not None:
+            unit_channels = channel_ids
+        elif grouping_property is not None and grouping_property in sorting.get_unit_property_names(unit_id):
+            if channel_groups is None:
+                channel_groups = recording.get_channels_property(property_name=grouping_property)
+            group = sorting.get_unit_property(unit_id, grouping_property)
+            unit_channels = [ch for ch, channel_group in zip(all_channel_ids, channel_groups) if channel_group == group]
+        else:
+            unit_channels = all_channel_ids
+        unit_channel_ids.append(list(unit_channels))
+    needed_channels = set(ch for unit_channels in unit_channel_ids for ch in unit_channels)
+    read_channel_ids = [ch for ch in all_channel_ids if ch in needed_channels]
+    read_rows = {ch: i for i, ch in enumerate(read_channel_ids)}
+    unit_rows = []
+    for unit_channels in unit_channel_ids:
+        if unit_channels == read_channel_ids:
+            unit_rows.append(slice(None))
+        else:
+            unit_rows.append([read_rows[ch] for ch in unit_channels])
+
+    # spikes of all units sorted by time, with the unit and the position in the unit waveforms of each spike
+    rng = np.random.RandomState(seed)
+    spike_idxs = []
+    spike_times = []
+    for spike_train in sorting.get_all_spike_trains(unit_ids=unit_ids):
+        spike_train = np.asarray(spike_train)
+        if max_spikes_per_unit is not None and len(spike_train) > max_spikes_per_unit:
+            idxs = np.sort(rng.choice(len(spike_train), max_spikes_per_unit, replace=False))
+        else:
+            idxs = np.arange(len(spike_train))
+        spike_idxs.append(idxs)
+        spike_times.append(spike_train[idxs].astype('int64'))
+    num_spikes = [len(idxs) for idxs in spike_idxs]
+    times = np.concatenate(spike_times) if len(spike_times) > 0 else np.array([], dtype='int64')
+    unit_positions = np.repeat(np.arange(len(unit_ids)), num_spikes)
+    waveform_positions = np.concatenate([np.arange(n) for n in num_spikes]) if len(num_spikes) > 0 \
+        else np.array([], dtype='int64')
+    order = np.argsort(times, kind='mergesort')
+    times = times[order]
+    unit_positions = unit_positions[order]
+    waveform_positions = waveform_positions[order]
+
+    dtype = np.dtype(dtype)
+    if memmap_folder is not None:
+        memmap_folder = Path(memmap_folder)
+        memmap_folder.mkdir(parents=True, exist_ok=True)
+    waveforms = []
+    for unit_id, n, unit_channels in zip(unit_ids, num_spikes, unit_channel_ids):
+        shape = (n, len(unit_channels), snippet_len)
+        if memmap_folder is not None:
+            waveforms.append(np.lib.format.open_memmap(str(memmap_folder / ('waveforms_' + str(unit_id) + '.npy')),
+                                                       mode='w+', dtype=dtype, shape=shape))
+        else:
+            waveforms.append(np.zeros(shape, dtype=dtype))
+
+    # spikes out of the recording are left as zeros
+    in_recording = np.where((times >= 0) & (times < num_frames))[0]
+    if len(in_recording) > 0 and snippet_len > 0:
+        margin = max(frames_before, frames_after)
+        offsets = np.arange(snippet_len) - frames_before + margin
+        for chunk_start, chunk_end, traces in recording.iter_chunks(chunk_size=chunk_size, margin=margin,
+                                                                    channel_ids=read_channel_ids,
+                                                                    start_frame=times[in_recording[0]],
+                                                                    end_frame=times[in_recording[-1]] + 1,
+                                                                    n_jobs=n_jobs):
+            i_start, i_end = np.searchsorted(times, [chunk_start, chunk_end], side='left')
+            if i_start == i_end:
+                continue
+            frames = (times[i_start:i_end] - chunk_start)[:, np.newaxis] + offsets
+            snippets = np.transpose(np.asarray(traces)[:, frames], (1, 0, 2))
+            chunk_units = unit_positions[i_start:i_end]
+            for u in np.unique(chunk_units):
+                sel = np.where(chunk_units == u)[0]
+                waveforms[u][waveform_positions[i_start + sel]] = snippets[sel][:, unit_rows[u]]
+            if verbose:
+                print('Extracted waveforms of ' + str(i_end) + '/' + str(len(times)) + ' spikes')
+    for wf in waveforms:
+        if isinstance(wf, np.memmap):
+            wf.flush()
+    if return_idxs:
+        return waveforms, spike_idxs
+    return waveforms
+
+
+def cache_to_folder(extractor, folder, chunksize=None, n_jobs=1, force=False, key=None):
+    '''Materializes a recording or sorting extractor (e.g. a chain of sub and multi
+    extractors, or a slow file format) in a folder, and returns the extractor that
+    reads the cached data. The traces of a recording are streamed in chunks to a raw
+    binary file, which is read back as a memory map. The spikes of a sorting are
+    saved in npz format. Channel/unit properties and epochs are saved in json.
+
+    The cache is keyed on a fingerprint of the source extractor, so if the folder
+    already contains the cache of the same extractor, the conversion is skipped.
+    The fingerprint contains the metadata and properties of the extractor and either
+    the given key, or the path, size and modification time of the source files declared
+    by the extractor (or by the extractors it is built on). If some data does not come
+    from declared files (e.g. numpy extractors), all the data is hashed instead, which
+    reads it.
+
+    Parameters
+    ----------
+    extractor: RecordingExtractor or SortingExtractor
+        The extractor to be cached
+    folder: str or Path
+        The folder in which the cache is saved
+    chunksize: None or int
+        Number of frames of each chunk of traces that is read and written at once.
+        If None, chunks of one second are used.
+    n_jobs: int
+        Number of threads that read and write chunks of traces in parallel (default 1).
+    force: bool
+        If True, the cache is rewritten even if the fingerprint matches.
+    key: None or str
+        If given, it is used to identify the source data instead of its files or its data
+        (it must change when the data changes).
+
+    Returns
+    -------
+    cached_extractor: BinDatRecordingExtractor or NpzSortingExtractor
+        The extractor that reads the cached data
+    '''
+    folder = Path(folder)
+    info_file = folder / 'cache_info.json'
+    fingerprint = _get_fingerprint(extractor, key)
+    if not force and info_file.is_file():
+        with info_file.open() as f:
+            cache_info = json.load(f)
+        if cache_info.get('fingerprint') == fingerprint:
+            return load_cached(folder)
+
+    folder.mkdir(parents=True, exist_ok=True)
+    if info_file.is_file():
+        # the cache is valid only once the info file is written
+        info_file.unlink()
+    if isinstance(extractor, RecordingExtractor):
+        traces_file = write_binary_dat_format(extractor, folder / 'traces.raw', time_axis=0, chunksize=chunksize,
+                                              n_jobs=n_jobs)
+        cache_info = dict(
+            extractor_type='recording',
+            file_name=traces_file.name,
+            sampling_frequency=extractor.get_sampling_frequency(),
+            num_channels=extractor.get_num_channels(),
+            dtype=str(_get_traces_dtype(extractor)),
+            channel_ids=extractor.get_channel_ids(),
+            properties=_get_properties(extractor, extractor.get_channel_ids(), extractor.get_channel_property_names,
+                                       extractor.get_channel_property),
+            epochs={epoch_name: extractor.get_epoch_info(epoch_name) for epoch_name in extractor.get_epoch_names()},
+        )
+    elif isinstance(extractor, SortingExtractor):
+        from .extractorlist import NpzSortingExtractor
+        NpzSortingExtractor.write_sorting(extractor, str(folder / 'spikes.npz'))
+        cache_info = dict(
+            extractor_type='sorting',
+            file_name='spikes.npz',
+            unit_ids=extractor.get_unit_ids(),
+            properties=_get_properties(extractor, extractor.get_unit_ids(), extractor.get_unit_property_names,
+                                       extractor.get_unit_property),
+        )
+    else:
+        raise ValueError("'extractor' must be a RecordingExtractor or a SortingExtractor")
+    cache_info['source'] = extractor.__class__.__name__
+    cache_info['fingerprint'] = fingerprint
+    with info_file.open('w') as f:
+        json.dump(cache_info, f, cls=_NumpyEncoder, indent=4)
+    return load_cached(folder)
+
+
+def load_cached(folder):
+    '''Loads an extractor cached with cache_to_folder.
+
+    Parameters
+    ----------
+    folder: str or Path
+        The folder in which the cache is saved
+
+    Returns
+    -------
+    cached_extractor: BinDatRecordingExtractor or NpzSortingExtractor
+        The extractor that reads the cached data
+    '''
+    from .extractorlist import BinDatRecordingExtractor, NpzSortingExtractor
+    folder = Path(folder)
+    info_file = folder / 'cache_info.json'
+    if not info_file.is_file():
+        raise ValueError(str(folder) + " is not a cache folder")
+    with info_file.open() as f:
+        cache_info = json.load(f, object_hook=_decode_numpy)
+
+    if cache_info['extractor_type'] == 'recording':
+        extractor = BinDatRecordingExtractor(folder / cache_info['file_name'], cache_info['sampling_frequency'],
+                                             cache_info['num_channels'], cache_info['dtype'],
+                                             recording_channels=cache_info['channel_ids'])
+        for property_name, property_values in cache_info['properties'].items():
+            extractor.set_channels_property(channel_ids=property_values['ids'], property_name=property_name,
+                                            values=property_values['values'])
+        for epoch_name, epoch_info in cache_info['epochs'].items():
+            extractor.add_epoch(epoch_name, epoch_info['start_frame'], epoch_info['end_frame'])
+    else:
+        extractor = NpzSortingExtractor(str(folder / cache_info['file_name']))
+        for property_name, property_values in cache_info['properties'].items():
+            extractor.set_units_property(unit_ids=property_values['ids'], property_name=property_name,
+                                         values=property_values['values'])
+    return extractor
+
+
+def _get_traces_dtype(recording):
+    return recording.get_traces(start_frame=0, end_frame=min(1, recording.get_num_frames())).dtype
+
+
+def _get_properties(extractor, ids, get_property_names, get_property):
+    # properties are stored as columns: {property_name: {'ids': [...], 'values': [...]}}
+    properties = {}
+    for id in ids:
+        for property_name in get_property_names(id):
+            column = properties.setdefault(property_name, {'ids': [], 'values': []})
+            column['ids'].append(id)
+            column['values'].append(get_property(id, property_name))
+    return properties
+
+
+def _get_fingerprint(extractor, key=None):
+    # hashes the metadata and properties of the extractor, and the key, the source files or all the data
+    sha = hashlib.sha1()
+    sha.update(extractor.__class__.__name__.encode())
+    if isinstance(extractor, RecordingExtractor):
+        metadata = [extractor.get_channel_ids(), extractor.get_num_frames(), extractor.get_sampling_frequency(),
+                    _get_properties(extractor, extractor.get_channel_ids(), extractor.get_channel_property_names,
+                                    extractor.get_channel_property),
+                    {epoch_name: extractor.get_epoch_info(epoch_name) for epoch_name in extractor.get_epoch_names()}]
+    elif isinstance(extractor, SortingExtractor):
+        metadata = [extractor.get_unit_ids(),
+                    _get_properties(extractor, extractor.get_unit_ids(), extractor.get_unit_property_names,
+                                    extractor.get_unit_property)]
+    else:
+        raise ValueError("'extractor' must be a RecordingExtractor or a SortingExtractor")
+    sha.update(json.dumps(metadata, cls=_NumpyEncoder, sort_keys=True).encode())
+    if key is not None:
+        sha.update(('key:' + str(key)).encode())
+        return sha.hexdigest()
+    files = set()
+    if _get_source_files(extractor, files, set()):
+        for file in sorted(files):
+            stat = os.stat(file)
+            sha.update(json.dumps([file, stat.st_size, stat.st_mtime_ns]).encode())
+    elif isinstance(extractor, RecordingExtractor):
+        for _, _, traces in extractor.iter_chunks(chunk_size=int(extractor.get_sampling_frequency())):
+            sha.update(np.ascontiguousarray(traces).tobytes())
+    else:
+        times, unit_indices = extractor.get_spike_vector()
+        sha.update(np.ascontiguousarray(times, dtype='int64').tobytes())
+        sha.update(np.ascontiguousarray(unit_indices, dtype='int64').tobytes())
+    return sha.hexdigest()
+
+
+def _get_source_files(extractor, files, visited):
+    # adds to files the source files declared by the extractor (in _source_files) and by the extractors
+    # it is built on, and returns True if all the data comes from declared files
+    visited.add(id(extractor))
+    source_files = [Path(f).absolute() for f in getattr(extractor, '_source_files', [])]
+    parents = []
+    for value in vars(extractor).values():
+        for item in (value if isinstance(value, (list, tuple)) else [value]):
+            if isinstance(item, (RecordingExtractor, SortingExtractor)) and id(item) not in visited:
+                parents.append(item)
+    parents_have_files = [_get_source_files(parent, files, visited) for parent in parents]
+    if len(source_files) > 0:
+        files.update(str(f) for f in source_files)
+        return all([f.is_file() for f in source_files])
+    return len(parents) > 0 and all(parents_have_files)
+
+
+class _NumpyEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, np.ndarray):
+            return {'__ndarray__': obj.tolist(), 'dtype': str(obj.dtype)}
+        if isinstance(obj, np.generic):
+            return obj.item()
+        return json.JSONEncoder.default(self, obj)
+
+
+def _decode_numpy(obj):
+    if '__ndarray__' in obj:
+        return np.array(obj['__ndarray__'], dtype=obj['dtype'])
+    return obj
+
+
 def _export_prb_file(recording, file_name, format=None, adjacency_distance=None, graph=False, geometry=True, radius=100,
                      dimensions='all'):
     '''Exports .prb file
@@ -366,8 +786,7 @@ def _export_prb_file(recording, file_name, format=None, adjacency_distance=None,
 
     if geometry:
         if 'location' in recording.get_channel_property_names():
-            positions = np.array([recording.get_channel_property(chan, 'location')
-                                  for chan in recording.get_channel_ids()])
+            positions = np.array(recording.get_channel_locations())
             if dimensions is not None:
                 positions = positions[:, dimensions]
         else:
@@ -378,7 +797,7 @@ def _export_prb_file(recording, file_name, format=None, adjacency_distance=None,
         positions = None
 
     if 'group' in recording.get_channel_property_names():
-        groups = np.array([recording.get_channel_property(chan, 'group') for chan in recording.get_channel_ids()])
+        groups = np.array(recording.get_channel_groups())
         channel_groups = np.unique([groups])
     else:
         print("'group' property is not available and it will not be saved.")
@@ -15,6 +15,7 @@ from .extractors.spykingcircussortingextractor.spykingcircussortingextractor imp
 from .extractors.spikeglxrecordingextractor.spikeglxrecordingextractor import SpikeGLXRecordingExtractor
 from .extractors.tridescloussortingextractor.tridescloussortingextractor import TridesclousSortingExtractor
 from .extractors.npzsortingextractor.npzsortingextractor import NpzSortingExtractor
+from .extractors.compressedrecordingextractor.compressedrecordingextractor import CompressedRecordingExtractor
 
 
 recording_extractor_full_list = [
@@ -26,7 +27,8 @@ recording_extractor_full_list = [
     IntanRecordingExtractor,
     BinDatRecordingExtractor,
     SpikeGLXRecordingExtractor,
-    PhyRecordingExtractor
+    PhyRecordingExtractor,
+    CompressedRecordingExtractor,
 ]
 
 installed_recording_extractor_list = [rx for rx in recording_extractor_full_list if rx.installed]
@@ -25,6 +25,7 @@ class BinDatRecordingExtractor(RecordingExtractor):
     def __init__(self, datfile, samplerate, numchan, dtype, recording_channels=None, frames_first=True, geom=None, offset=0, invert=False):
         RecordingExtractor.__init__(self)
         self._datfile = Path(datfile)
+        self._source_files = [self._datfile]
         self._frame_first = frames_first
         self._timeseries = read_binary(self._datfile, numchan, dtype, frames_first, offset)
         self._samplerate = float(samplerate)
@@ -42,7 +43,7 @@ class BinDatRecordingExtractor(RecordingExtractor):
                 self.set_channel_property(m, 'location', self._geom[m, :])
 
     def get_channel_ids(self):
-        return self._channels
+        return list(self._channels)
 
     def get_num_frames(self):
         return self._timeseries.shape[1]
@@ -58,7 +59,7 @@ class BinDatRecordingExtractor(RecordingExtractor):
         if channel_ids is None:
             channel_ids = list(range(self._timeseries.shape[0]))
         else:
-            channel_ids = [self._channels.index(ch) for ch in channel_ids]
+            channel_ids = self._get_channel_indices(channel_ids)
         recordings = self._timeseries[:, start_frame:end_frame][channel_ids, :]
         return recordings
 
@@ -1,4 +1,5 @@
 from spikeextractors import RecordingExtractor
+from spikeextractors.extraction_tools import convert_traces
 
 import numpy as np
 import ctypes
@@ -20,16 +21,17 @@ class BiocamRecordingExtractor(RecordingExtractor):
     ]
     installation_mesg = "To use the BiocamRecordingExtractor install h5py: \n\n pip install h5py\n\n"  # error message when not installed
 
-    def __init__(self, recording_file, verbose=False, mea_pitch=42):
+    def __init__(self, recording_file, verbose=False, mea_pitch=42, rdcc_nbytes=None, rdcc_nslots=None):
         assert HAVE_BIOCAM, "To use the BiocamRecordingExtractor install h5py: \n\n pip install h5py\n\n"
         RecordingExtractor.__init__(self)
         self._mea_pitch = mea_pitch
         self._recording_file = recording_file
+        self._source_files = [recording_file]
         self._rf, self._nFrames, self._samplingRate, self._nRecCh, self._chIndices, \
         self._file_format, self._signalInv, self._positions, self._read_function = openBiocamFile(
-            self._recording_file, self._mea_pitch, verbose)
-        for m in range(self._nRecCh):
-            self.set_channel_property(m, 'location', self._positions[m])
+            self._recording_file, self._mea_pitch, verbose, rdcc_nbytes=rdcc_nbytes, rdcc_nslots=rdcc_nslots)
+        self.set_channels_property(channel_ids=self.get_channel_ids(), property_name='location',
+                                   values=list(self._positions))
 
     def __del__(self):
         self._rf.close()
@@ -49,13 +51,36 @@ class BiocamRecordingExtractor(RecordingExtractor):
         if end_frame is None:
             end_frame = self.get_num_frames()
         if channel_ids is None:
-            channel_ids = range(self.get_num_channels())
-        data = self._read_function(
-            self._rf, start_frame, end_frame, self.get_num_channels())
-        return data[:, channel_ids].T
+            channels = None
+        else:
+            channels = self._get_channel_indices(channel_ids)
+        data = self._read_function(self._rf, start_frame, end_frame, self.get_num_channels(), channels)
+        return np.ascontiguousarray(data.T)
 
     @staticmethod
-    def write_recording(recording, save_path):
+    def write_recording(recording, save_path, chunk_size=None, n_jobs=1, scale=None):
+        '''Saves the traces of a recording extractor in the Biocam (brw, version 101) format,
+        as int16. The recording is read in chunks (prefetched by n_jobs threads) and written
+        to a chunked hdf5 dataset.
+
+        The traces are not rescaled to the int16 range: float traces are rounded, and values out
+        of the int16 range are clipped. Traces with a small range (e.g. in mV) or a large range
+        should be scaled with the scale argument, otherwise precision is lost.
+
+        Parameters
+        ----------
+        recording: RecordingExtractor
+            The recording extractor object to be saved
+        save_path: str
+            The path to the file.
+        chunk_size: None or int
+            Number of frames of each chunk that is read and written at once.
+            If None, chunks of one second are used.
+        n_jobs: int
+            Number of threads that read the chunks of the recording ahead (default 1).
+        scale: float
+            If not None, the traces are multiplied by scale before being converted to int16.
+        '''
         # Convert to uV:
         # AnalogValue = MVOffset + DigitalValue * ADCCountsToMV
         # Where ADCCountsToMV is defined as:
@@ -69,13 +94,16 @@ class BiocamRecordingExtractor(RecordingExtractor):
         assert HAVE_BIOCAM, "To use the BiocamRecordingExtractor install h5py: \n\n pip install h5py\n\n"
         M = recording.get_num_channels()
         N = recording.get_num_frames()
+        if chunk_size is None:
+            chunk_size = max(int(recording.get_sampling_frequency()), 1)
         rf = h5py.File(save_path, 'w')
         g = rf.create_group('3BData')
-        dr = rf.create_dataset('3BData/Raw', (M*N,), dtype=int)
-        dt = 50000
-        for i in range(N//dt):
-            dr[M*i*dt:M*(i+1)*dt] = recording.get_traces(slice(0, M), i*dt, (i+1)*dt).T.flatten()
-        dr[M*(N//dt)*dt:] = recording.get_traces(slice(0, M), (N//dt)*dt, N).T.flatten()
+        # hdf5 chunks of ~1 MB that hold whole frames
+        h5_chunk_frames = min(max(2 ** 19 // max(M, 1), 1), max(N, 1))
+        dr = rf.create_dataset('3BData/Raw', (M*N,), dtype='int16',
+                               chunks=(M * h5_chunk_frames,) if M * N > 0 else None)
+        for start_frame, end_frame, traces in recording.iter_chunks(chunk_size=chunk_size, n_jobs=n_jobs):
+            dr[M*start_frame:M*end_frame] = convert_traces(traces, np.int16, scale).T.ravel()
         g.attrs['Version'] = 101
         rf.create_dataset('3BRecInfo/3BRecVars/MinVolt', data=[0])
         rf.create_dataset('3BRecInfo/3BRecVars/MaxVolt', data=[1])
@@ -83,18 +111,23 @@ class BiocamRecordingExtractor(RecordingExtractor):
         rf.create_dataset('3BRecInfo/3BRecVars/SamplingRate', data=[recording.get_sampling_frequency()])
         rf.create_dataset('3BRecInfo/3BRecVars/SignalInversion', data=[1])
         rf.create_dataset('3BRecInfo/3BMeaChip/NCols', data=[M])
-        r = [recording.get_channel_property(i,'location')[-2] for i in range(recording.get_num_channels())]
-        c = [recording.get_channel_property(i,'location')[-1] for i in range(recording.get_num_channels())]
-        d = np.ndarray((1,len(r)),dtype=[('Row', '<i2'), ('Col', '<i2')])
-        d['Row'] = r
-        d['Col'] = c
+        locations = recording.get_channel_locations()
+        d = np.ndarray((1, M), dtype=[('Row', '<i2'), ('Col', '<i2')])
+        d['Row'] = [location[-2] for location in locations]
+        d['Col'] = [location[-1] for location in locations]
         rf.create_dataset('3BRecInfo/3BMeaStreams/Raw/Chs', data=d)
         rf.close()
 
 
-def openBiocamFile(filename,  mea_pitch, verbose=False):
-    """Open a Biocam hdf5 file, read and return the recording info, pick te correct method to access raw data, and return this to the caller."""
-    rf = h5py.File(filename, 'r')
+def openBiocamFile(filename,  mea_pitch, verbose=False, rdcc_nbytes=None, rdcc_nslots=None):
+    """Open a Biocam hdf5 file, read and return the recording info, pick te correct method to access raw data, and return this to the caller.
+    rdcc_nbytes and rdcc_nslots configure the raw data chunk cache of h5py (the h5py defaults are used if None)."""
+    cache_kwargs = {}
+    if rdcc_nbytes is not None:
+        cache_kwargs['rdcc_nbytes'] = int(rdcc_nbytes)
+    if rdcc_nslots is not None:
+        cache_kwargs['rdcc_nslots'] = int(rdcc_nslots)
+    rf = h5py.File(filename, 'r', **cache_kwargs)
     # Read recording variables
     recVars = rf.require_group('3BRecInfo/3BRecVars/')
     # bitDepth = recVars['BitDepth'].value[0]
@@ -138,18 +171,46 @@ def openBiocamFile(filename,  mea_pitch, verbose=False):
     return (rf, nFrames, samplingRate, nRecCh, chIndices, file_format, signalInv, rawIndices, read_function)
 
 
-def readHDF5t_100(rf, t0, t1, nch):
+def _get_channel_selection(channels, nch):
+    # returns the sorted unique channels to read and the position of each requested channel among them,
+    # or None if it is cheaper to read all the channels
+    if channels is None:
+        return None
+    unique_channels, positions = np.unique(channels, return_inverse=True)
+    if len(unique_channels) == nch:
+        return None
+    return unique_channels, positions
+
+
+def readHDF5t_100(rf, t0, t1, nch, channels=None):
     if t0 <= t1:
-        return rf['3BData/Raw'][t0:t1]
+        selection = _get_channel_selection(channels, nch)
+        if selection is None:
+            d = rf['3BData/Raw'][t0:t1]
+            return d if channels is None else d[:, channels]
+        unique_channels, positions = selection
+        # hyperslab read of the requested channels only
+        d = rf['3BData/Raw'][t0:t1, list(unique_channels)]
+        return d[:, positions]
     else:  # Reversed read
         raise Exception('Reading backwards? Not sure about this.')
         return rf['3BData/Raw'][t1:t0]
 
 
-def readHDF5t_101(rf, t0, t1, nch):
+def readHDF5t_101(rf, t0, t1, nch, channels=None):
     if t0 <= t1:
-        d = rf['3BData/Raw'][nch * t0:nch * t1].reshape((t1-t0, nch), order='C')
-        return d
+        selection = _get_channel_selection(channels, nch)
+        # the samples are interleaved by frame, so a channel is a strided hyperslab. Strided reads
+        # pay off when only a few channels are requested, otherwise the whole block is read once
+        if selection is None or t1 == t0 or len(selection[0]) * 16 > nch:
+            d = rf['3BData/Raw'][nch * t0:nch * t1].reshape((t1-t0, nch), order='C')
+            return d if channels is None else d[:, channels]
+        unique_channels, positions = selection
+        raw = rf['3BData/Raw']
+        d = np.empty((t1 - t0, len(unique_channels)), dtype=raw.dtype)
+        for i, ch in enumerate(unique_channels):
+            d[:, i] = raw[nch * t0 + ch:nch * (t1 - 1) + ch + 1:nch]
+        return d[:, positions]
     else:  # Reversed read
         raise Exception('Reading backwards? Not sure about this.')
         d = rf['3BData/Raw'][nch * t1:nch * t0].reshape((t1-t0, nch), order='C')
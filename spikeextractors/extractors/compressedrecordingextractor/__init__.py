@@ -0,0 +1 @@
+from .compressedrecordingextractor import CompressedRecordingExtractor
@@ -230,7 +230,8 @@ class ExdirSortingExtractor(SortingExtractor):
                 if 'UnitTimes' in channel.keys():
                     for unit, unit_times in channel['UnitTimes'].items():
                         self._unit_ids.append(current_unit)
-                        self._spike_trains.append((unit_times['times'].data.rescale('s')*sample_rate).magnitude)
+                        self._invalidate_unit_index_map()
+                        self._spike_trains.append(np.sort((unit_times['times'].data.rescale('s')*sample_rate).magnitude))
                         self.set_unit_property(current_unit, 'group', group)
                         self.set_unit_property(current_unit, 'exdir_unit', unit)
 
@@ -242,16 +243,11 @@ class ExdirSortingExtractor(SortingExtractor):
                         current_unit += 1
 
     def get_unit_ids(self):
-        return self._unit_ids
+        return list(self._unit_ids)
 
     def get_unit_spike_train(self, unit_id, start_frame=None, end_frame=None):
-        if start_frame is None:
-            start_frame = 0
-        if end_frame is None:
-            end_frame = np.Inf
-        times = self._spike_trains[self._unit_ids.index(unit_id)]
-        inds = np.where((start_frame <= times) & (times < end_frame))
-        return np.rint(times[inds]).astype(int)
+        times = self._spike_trains[self._get_unit_index(unit_id)]
+        return np.rint(self.window_spike_train(times, start_frame, end_frame)).astype(int)
 
     @staticmethod
     def write_sorting(sorting, exdir_file, recording=None, sample_rate=None, save_waveforms=False, verbose=False):
@@ -267,6 +263,8 @@ class ExdirSortingExtractor(SortingExtractor):
         exdir_group = exdir.File(exdir_file, plugins=exdir.plugins.quantities)
         ephys = exdir_group.require_group('processing').require_group('electrophysiology')
         ephys.attrs['sample_rate'] = sample_rate
+        unit_ids = sorting.get_unit_ids()
+        spike_trains = dict(zip(unit_ids, sorting.get_all_spike_trains(unit_ids=unit_ids)))
 
         if 'group' in sorting.get_unit_property_names():
             channel_groups = np.unique([sorting.get_unit_property(unit, 'group') for unit in sorting.get_unit_ids()])
@@ -285,7 +283,7 @@ class ExdirSortingExtractor(SortingExtractor):
             except Exception as e:
                 pass
             unittimes = ch_group.require_group('UnitTimes')
-            unit_stop_time = np.max([(np.max(sorting.get_unit_spike_train(u).astype(float) / sample_rate).rescale('s'))
+            unit_stop_time = np.max([(np.max(spike_trains[u].astype(float) / sample_rate).rescale('s'))
                                      for u in sorting.get_unit_ids()]) * pq.s
             recording_stop_time = None
             if recording is not None:
@@ -307,27 +305,24 @@ class ExdirSortingExtractor(SortingExtractor):
                 ch_group.attrs['stop_time'] = recording_stop_time if recording_stop_time > unit_stop_time \
                     else unit_stop_time
 
-            nums = np.array([])
-            timestamps = np.array([])
-            waveforms = np.array([])
+            nums = []
+            timestamps = []
+            waveforms = []
             for unit in sorting.get_unit_ids():
                 unit_group = unittimes.require_group(str(unit))
                 unit_group.require_dataset('times',
-                                           data=(sorting.get_unit_spike_train(unit).astype(float)
+                                           data=(spike_trains[unit].astype(float)
                                                  / sample_rate).rescale('s'))
                 unit_group.attrs['cluster_group'] = 'unsorted'
                 unit_group.attrs['group_id'] = chan
                 unit_group.attrs['name'] = 'unit #' + str(unit)
 
-                timestamps = np.concatenate((timestamps, (sorting.get_unit_spike_train(unit).astype(float)
-                                                          / sample_rate).rescale('s')))
-                nums = np.concatenate((nums, [unit] * len(sorting.get_unit_spike_train(unit))))
+                timestamps.append((spike_trains[unit].astype(float) / sample_rate).rescale('s').magnitude)
+                nums.append(np.full(len(spike_trains[unit]), unit))
 
                 if 'waveforms' in sorting.get_unit_spike_feature_names(unit):
-                    if len(waveforms) == 0:
-                        waveforms = sorting.get_unit_spike_features(unit, 'waveforms')
-                    else:
-                        waveforms = np.vstack((waveforms, sorting.get_unit_spike_features(unit, 'waveforms')))
+                    waveforms.append(sorting.get_unit_spike_features(unit, 'waveforms'))
+            nums, timestamps, waveforms = _concatenate_unit_data(nums, timestamps, waveforms)
 
             if save_waveforms:
                 if verbose:
@@ -383,7 +378,7 @@ class ExdirSortingExtractor(SortingExtractor):
                     print("Group: ", chan)
                 ch_group = ephys.require_group('channel_group_' + str(chan))
                 unittimes = ch_group.require_group('UnitTimes')
-                unit_stop_time = np.max([(np.max(sorting.get_unit_spike_train(u).astype(float) / sample_rate).rescale('s'))
+                unit_stop_time = np.max([(np.max(spike_trains[u].astype(float) / sample_rate).rescale('s'))
                                          for u in sorting.get_unit_ids()]) * pq.s
                 recording_stop_time = None
                 if recording is not None:
@@ -407,30 +402,27 @@ class ExdirSortingExtractor(SortingExtractor):
                         else unit_stop_time
                     ch_group.attrs['stop_time'] = recording_stop_time if recording_stop_time > unit_stop_time \
                         else unit_stop_time
-                nums = np.array([])
-                timestamps = np.array([])
-                waveforms = np.array([])
+                nums = []
+                timestamps = []
+                waveforms = []
                 for unit in sorting.get_unit_ids():
                     if sorting.get_unit_property(unit, 'group') == chan:
                         if verbose:
                             print("Unit: ", unit)
                         unit_group = unittimes.require_group(str(unit))
                         unit_group.require_dataset('times',
-                                                   data=(sorting.get_unit_spike_train(unit).astype(float)
+                                                   data=(spike_trains[unit].astype(float)
                                                          / sample_rate).rescale('s'))
                         unit_group.attrs['cluster_group'] = 'unsorted'
                         unit_group.attrs['group_id'] = chan
                         unit_group.attrs['name'] = 'unit #' + str(unit)
 
-                        timestamps = np.concatenate((timestamps, (sorting.get_unit_spike_train(unit).astype(float)
-                                                         / sample_rate).rescale('s')))
-                        nums = np.concatenate((nums, [unit]*len(sorting.get_unit_spike_train(unit))))
+                        timestamps.append((spike_trains[unit].astype(float) / sample_rate).rescale('s').magnitude)
+                        nums.append(np.full(len(spike_trains[unit]), unit))
 
                         if 'waveforms' in sorting.get_unit_spike_feature_names(unit):
-                            if len(waveforms) == 0:
-                                waveforms = sorting.get_unit_spike_features(unit, 'waveforms')
-                            else:
-                                waveforms = np.vstack((waveforms, sorting.get_unit_spike_features(unit, 'waveforms')))
+                            waveforms.append(sorting.get_unit_spike_features(unit, 'waveforms'))
+                nums, timestamps, waveforms = _concatenate_unit_data(nums, timestamps, waveforms)
                 if save_waveforms:
                     if verbose:
                         print("Saving EventWaveforms")
@@ -467,3 +459,10 @@ class ExdirSortingExtractor(SortingExtractor):
                 ns.attrs['num_samples'] = len(nums)
                 cn = clustering.require_dataset('cluster_nums', data=np.array(sorting.get_unit_ids()))
                 cn.attrs['num_samples'] = len(sorting.get_unit_ids())
+
+
+def _concatenate_unit_data(nums, timestamps, waveforms):
+    nums = np.concatenate(nums) if len(nums) > 0 else np.array([])
+    timestamps = np.concatenate(timestamps) if len(timestamps) > 0 else np.array([])
+    waveforms = np.concatenate(waveforms) if len(waveforms) > 0 else np.array([])
+    return nums, timestamps, waveforms
@@ -1,4 +1,4 @@
-from spikeextractors import SortingExtractor
+from spikeextractors import SortingExtractor, SpikeVector
 import numpy as np
 
 try:
@@ -20,50 +20,68 @@ class HS2SortingExtractor(SortingExtractor):
         assert HAVE_HS2SX, "To use the HS2SortingExtractor install h5py: \n\n pip install h5py\n\n"
         SortingExtractor.__init__(self)
         self._recording_file = recording_file
+        self._source_files = [recording_file]
         self._rf = h5py.File(self._recording_file, mode='r')
-        self._unit_ids = set(self._rf['cluster_id'][()])
+        self._spike_vector = SpikeVector(self._rf['times'][()], self._rf['cluster_id'][()])
+        self._unit_ids = self._spike_vector.get_unit_ids()
         if 'centres' in self._rf.keys():
             self._unit_locs = self._rf['centres'][()]  # cache for faster access
-            for unit_id in self._unit_ids:
-                self.set_unit_property(unit_id, 'unit_location', self._unit_locs[unit_id])
+            self.set_units_property(unit_ids=self._unit_ids, property_name='unit_location',
+                                    values=list(self._unit_locs[self._unit_ids]))
+        # spike features are read from the file only when they are requested
         if 'data' in self._rf.keys():
-            d = self._rf['data'][()]
+            d = self._get_dataset_array('data')
+            d = d[:2].T if isinstance(d, np.ndarray) else _SpikeLocations(d)
             for unit_id in self._unit_ids:
-                self.set_unit_spike_features(unit_id, 'spike_locations', d[:2, self.get_unit_indices(unit_id)].T)
+                self.set_lazy_unit_spike_features(unit_id, 'spike_locations', d,
+                                                  spike_indices=self.get_unit_indices(unit_id))
         if 'ch' in self._rf.keys():
+            ch = self._get_dataset_array('ch')
             for unit_id in self._unit_ids:
-                self.set_unit_spike_features(unit_id, 'spike_max_channels', np.asarray(self._rf['ch'])[self.get_unit_indices(unit_id)])
+                self.set_lazy_unit_spike_features(unit_id, 'spike_max_channels', ch,
+                                                  spike_indices=self.get_unit_indices(unit_id))
+
+    def _get_dataset_array(self, name):
+        # contiguous uncompressed datasets are memory-mapped from their offset in the file,
+        # the others are returned as h5py datasets
+        dataset = self._rf[name]
+        offset = dataset.id.get_offset()
+        if dataset.chunks is None and offset is not None:
+            return np.memmap(self._recording_file, dtype=dataset.dtype, mode='r', offset=offset, shape=dataset.shape)
+        return dataset
 
     def get_unit_indices(self, x):
-        return np.where(self._rf['cluster_id'][()] == x)[0]
+        return self._spike_vector.get_unit_spike_indices(x)
 
     def get_unit_ids(self):
         return list(self._unit_ids)
 
     def get_unit_spike_train(self, unit_id, start_frame=None, end_frame=None):
-        if start_frame is None:
-            start_frame = 0
-        if end_frame is None:
-            end_frame = np.Inf
-        times = self._rf['times'][()][self.get_unit_indices(unit_id)]
-        inds = np.where((start_frame <= times) & (times < end_frame))
-        return times[inds]
+        return self._spike_vector.get_unit_spike_train(unit_id, start_frame=start_frame, end_frame=end_frame)
+
+    def get_spike_vector(self, unit_ids=None, start_frame=None, end_frame=None):
+        return self._spike_vector.get_spike_vector(unit_ids=unit_ids, start_frame=start_frame, end_frame=end_frame)
 
     @staticmethod
     def write_sorting(sorting, save_path):
         assert HAVE_HS2SX, "To use the HS2SortingExtractor install h5py: \n\n pip install h5py\n\n"
         unit_ids = sorting.get_unit_ids()
-        times_list = []
-        labels_list = []
-        for i in range(len(unit_ids)):
-            unit = unit_ids[i]
-            times = sorting.get_unit_spike_train(unit_id=unit)
-            times_list.append(times)
-            labels_list.append(np.ones(times.shape, dtype=int) * unit)
-        all_times = np.concatenate(times_list)
-        all_labels = np.concatenate(labels_list)
+        all_times, unit_indices = sorting.get_spike_vector(unit_ids=unit_ids)
+        all_labels = np.asarray(unit_ids, dtype=int)[unit_indices]
         rf = h5py.File(save_path, mode='w')
         # for now only create the entries required by any RecordingExtractor
         rf.create_dataset("times", data=all_times)
         rf.create_dataset("cluster_id", data=all_labels)
         rf.close()
+
+
+class _SpikeLocations(object):
+    # the first two rows of an h5py 'data' dataset, transposed, read only for the requested spikes
+    def __init__(self, dataset):
+        self._dataset = dataset
+
+    def __len__(self):
+        return self._dataset.shape[1]
+
+    def __getitem__(self, idxs):
+        return self._dataset[:2, idxs].T
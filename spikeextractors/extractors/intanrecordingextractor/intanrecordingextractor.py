@@ -27,6 +27,7 @@ class IntanRecordingExtractor(RecordingExtractor):
         assert Path(recording_file).suffix == '.rhs' or Path(recording_file).suffix == '.rhd', \
             "Only '.rhd' and '.rhs' files are supported"
         self._recording_file = recording_file
+        self._source_files = [recording_file]
         self._recording = pyintan.File(recording_file, verbose)
 
     def get_channel_ids(self):
@@ -1,4 +1,4 @@
-from spikeextractors import SortingExtractor
+from spikeextractors import SortingExtractor, SpikeVector
 import numpy as np
 from pathlib import Path
 
@@ -15,47 +15,31 @@ class KiloSortSortingExtractor(SortingExtractor):
         SortingExtractor.__init__(self)
         kilosort_folder = Path(kilosort_folder)
         spike_times = np.load(str(kilosort_folder / 'spike_times.npy'))
-        spike_templates = np.load(str(kilosort_folder /'spike_templates.npy'))
+        # spike_templates is only read when there are no curated clusters
         if (kilosort_folder / 'spike_clusters.npy').is_file():
-            spike_clusters = np.load(str(kilosort_folder / 'spike_clusters.npy'))
+            clusters_file = kilosort_folder / 'spike_clusters.npy'
         else:
-            spike_clusters = spike_templates
+            clusters_file = kilosort_folder / 'spike_templates.npy'
+        spike_clusters = np.load(str(clusters_file))
+        self._source_files = [kilosort_folder / 'spike_times.npy', clusters_file]
 
-        self._spiketrains = []
-        clust_id = np.unique(spike_clusters)
-        self._unit_ids = list(clust_id)
-        spike_times.astype(int)
-
-        self._spiketrais = []
-        for clust in self._unit_ids:
-            idx = np.where(spike_clusters == clust)[0]
-            self._spiketrains.append(spike_times[idx])
+        self._spike_vector = SpikeVector(spike_times, spike_clusters)
 
     def get_unit_ids(self):
-        return list(self._unit_ids)
+        return list(self._spike_vector.get_unit_ids())
 
     def get_unit_spike_train(self, unit_id, start_frame=None, end_frame=None):
-        if start_frame is None:
-            start_frame = 0
-        if end_frame is None:
-            end_frame = np.Inf
-        times = self._spiketrains[self.get_unit_ids().index(unit_id)]
-        inds = np.where((start_frame <= times) & (times < end_frame))
-        return times[inds]
+        return self._spike_vector.get_unit_spike_train(unit_id, start_frame=start_frame, end_frame=end_frame)
+
+    def get_spike_vector(self, unit_ids=None, start_frame=None, end_frame=None):
+        return self._spike_vector.get_spike_vector(unit_ids=unit_ids, start_frame=start_frame, end_frame=end_frame)
 
     @staticmethod
     def write_sorting(sorting, save_path):
         save_path = Path(save_path)
-        spike_times = np.array([])
-        spike_templates = np.array([])
-        for id in sorting.get_unit_ids():
-            st = sorting.get_unit_spike_train(id)
-            cl = [id] * len(sorting.get_unit_spike_train(id))
-            spike_times = np.concatenate((spike_times, np.array(st)))
-            spike_templates = np.concatenate((spike_templates, np.array(cl)))
-        sorting_idxs = np.argsort(spike_times)
-        spike_times = spike_times[sorting_idxs]
-        spike_clusters = spike_templates[sorting_idxs]
+        unit_ids = sorting.get_unit_ids()
+        spike_times, unit_indices = sorting.get_spike_vector(unit_ids=unit_ids)
+        spike_clusters = np.asarray(unit_ids)[unit_indices]
         if not save_path.is_dir():
             save_path.mkdir()
         np.save(str(save_path / 'spike_times.npy'), spike_times.astype(int))
@@ -1,4 +1,4 @@
-from spikeextractors import SortingExtractor
+from spikeextractors import SortingExtractor, SpikeVector
 from spikeextractors.extraction_tools import read_python
 import numpy as np
 from pathlib import Path
@@ -16,43 +16,77 @@ class KlustaSortingExtractor(SortingExtractor):
     installed = HAVE_KLSX  # check at class level if installed or not
     _gui_params = [
         {'name': 'kwikfile', 'type': 'path', 'title': "Path to file"},
+        {'name': 'lazy', 'type': 'bool', 'title': "If True, spike times are read from the file when "
+                                                  "they are first requested"},
     ]
     installation_mesg = "To use the KlustaSortingExtractor install h5py: \n\n pip install h5py\n\n"  # error message when not installed
 
-    def __init__(self, kwikfile):
+    def __init__(self, kwikfile, lazy=False):
         assert HAVE_KLSX, "To use the KlustaSortingExtractor install h5py: \n\n pip install h5py\n\n"
         SortingExtractor.__init__(self)
         kwikfile = Path(kwikfile).absolute()
-        F = h5py.File(kwikfile)
-        channel_groups = F.get('channel_groups')
-        self._spiketrains = []
-        self._unit_ids = []
-        for cgroup in channel_groups:
-            group_id = int(cgroup)
-            try:
-                cluster_ids = channel_groups[cgroup]['clusters']['main']
-            except Exception as e:
-                print('Unable to extract clusters from', kwikfile)
-                continue
-            for cluster_id in channel_groups[cgroup]['clusters']['main']:
-                clusters = np.array(channel_groups[cgroup]['spikes']['clusters']['main'])
-                idx = np.nonzero(clusters == int(cluster_id))
-                st = np.array(channel_groups[cgroup]['spikes']['time_samples'])[idx]
-                self._spiketrains.append(st)
-                self._unit_ids.append(int(cluster_id))
-                self.set_unit_property(int(cluster_id), 'group', group_id)
+        self._source_files = [kwikfile]
+        self._F = h5py.File(str(kwikfile), 'r')
+        # in lazy mode, the file is kept open until all channel groups are loaded or close is called
+        try:
+            channel_groups = self._F.get('channel_groups')
+            self._cgroups = []
+            self._spike_vectors = []
+            self._unit_ids = []
+            self._unit_groups = {}
+            group_ids = []
+            for cgroup in channel_groups:
+                group_id = int(cgroup)
+                try:
+                    cluster_ids = [int(cluster_id) for cluster_id in channel_groups[cgroup]['clusters']['main']]
+                except Exception as e:
+                    print('Unable to extract clusters from', kwikfile)
+                    continue
+                for cluster_id in cluster_ids:
+                    self._unit_groups[cluster_id] = len(self._cgroups)
+                self._unit_ids += cluster_ids
+                group_ids += [group_id] * len(cluster_ids)
+                self._cgroups.append((cgroup, cluster_ids))
+                self._spike_vectors.append(None)
+            self.set_units_property(unit_ids=self._unit_ids, property_name='group', values=group_ids)
+            if not lazy:
+                for i in range(len(self._cgroups)):
+                    self._load_group(i)
+        finally:
+            if not lazy:
+                self.close()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        '''Closes the kwik file, if it is still open (with lazy=True). The spike trains of the channel
+        groups that have not been read yet are not available after the file is closed.
+        '''
+        if getattr(self, '_F', None) is not None:
+            self._F.close()
+            self._F = None
+
+    def _load_group(self, i):
+        # the spikes of a channel group are read once and sorted by cluster with a single argsort
+        if self._spike_vectors[i] is None:
+            if self._F is None:
+                raise ValueError("The kwik file has been closed")
+            cgroup, cluster_ids = self._cgroups[i]
+            spikes = self._F['channel_groups'][cgroup]['spikes']
+            self._spike_vectors[i] = SpikeVector(spikes['time_samples'][()], spikes['clusters']['main'][()],
+                                                 unit_ids=cluster_ids)
+            if all(spike_vector is not None for spike_vector in self._spike_vectors):
+                self.close()
+        return self._spike_vectors[i]
 
     def get_unit_ids(self):
         return list(self._unit_ids)
 
     def get_unit_spike_train(self, unit_id, start_frame=None, end_frame=None):
-        if start_frame is None:
-            start_frame = 0
-        if end_frame is None:
-            end_frame = np.Inf
-        times = self._spiketrains[self.get_unit_ids().index(unit_id)]
-        inds = np.where((start_frame <= times) & (times < end_frame))
-        return times[inds]
+        if unit_id not in self._unit_groups:
+            raise ValueError(str(unit_id) + " is not a valid unit_id")
+        return self._load_group(self._unit_groups[unit_id]).get_unit_spike_train(unit_id, start_frame, end_frame)
 
     @staticmethod
     def write_sorting(sorting, save_path):
@@ -65,37 +99,37 @@ class KlustaSortingExtractor(SortingExtractor):
         else:
             save_path.mkdir()
             save_path = save_path / 'klusta.kwik'
-        F = h5py.File(save_path, 'w')
-        F.attrs.create('kwik_version', data=2)
         if 'group' in sorting.get_unit_property_names():
-            cgroups = np.unique([sorting.get_unit_property(unit, 'group') for unit in sorting.get_unit_ids()])
+            unit_groups = np.asarray(sorting.get_units_property(property_name='group'))
+            cgroups = np.unique(unit_groups)
         else:
+            unit_groups = None
             cgroups = [0]
+        unit_ids = np.asarray(sorting.get_unit_ids(), dtype=int)
+        # all spikes are read in one call and split by channel group
+        time_samples, unit_indices = sorting.get_spike_vector()
+        time_samples = np.asarray(time_samples).astype(int)
 
-        channel_groups = F.create_group('channel_groups')
-
-        for cgroup in cgroups:
-            channel_group = channel_groups.create_group(str(cgroup))
-            time_samples = np.array([])
-            cluster_main = np.array([])
-            if 'group' in sorting.get_unit_property_names():
-                idxs = [unit for unit in sorting.get_unit_ids() if
-                        sorting.get_unit_property(unit, 'group') == cgroup]
-            else:
-                idxs = sorting.get_unit_ids()
-            clust = channel_group.create_group('clusters')
-            clust.create_dataset('main', data=idxs)
-            clust.create_dataset('original', data=idxs)
-            for id in idxs:
-                st = sorting.get_unit_spike_train(id)
-                cl = [id] * len(sorting.get_unit_spike_train(id))
-                time_samples = np.concatenate((time_samples, np.array(st)))
-                cluster_main = np.concatenate((cluster_main, np.array(cl)))
-            sorting_idxs = np.argsort(time_samples)
-            time_samples = time_samples[sorting_idxs].astype(int)
-            cluster_main = cluster_main[sorting_idxs].astype(int)
-            spikes = channel_group.create_group('spikes')
-            spikes.create_dataset('time_samples', data=time_samples)
-            clusters = spikes.create_group('clusters')
-            clusters.create_dataset('main', data=cluster_main)
-            clusters.create_dataset('original', data=cluster_main)
+        with h5py.File(str(save_path), 'w') as F:
+            F.attrs.create('kwik_version', data=2)
+            channel_groups = F.create_group('channel_groups')
+            for cgroup in cgroups:
+                channel_group = channel_groups.create_group(str(cgroup))
+                if unit_groups is not None:
+                    in_group = unit_groups == cgroup
+                    idxs = unit_ids[in_group]
+                    spike_mask = in_group[unit_indices]
+                    group_time_samples = time_samples[spike_mask]
+                    cluster_main = unit_ids[unit_indices[spike_mask]]
+                else:
+                    idxs = unit_ids
+                    group_time_samples = time_samples
+                    cluster_main = unit_ids[unit_indices]
+                clust = channel_group.create_group('clusters')
+                clust.create_dataset('main', data=idxs)
+                clust.create_dataset('original', data=idxs)
+                spikes = channel_group.create_group('spikes')
+                spikes.create_dataset('time_samples', data=group_time_samples)
+                clusters = spikes.create_group('clusters')
+                clusters.create_dataset('main', data=cluster_main)
+                clusters.create_dataset('original', data=cluster_main)
@@ -1,9 +1,9 @@
 from spikeextractors import RecordingExtractor
-from spikeextractors import SortingExtractor
+from spikeextractors import SortingExtractor, SpikeVector
 
 import json
 import numpy as np
-from .mdaio import DiskReadMda, readmda, writemda32, writemda64
+from .mdaio import DiskReadMda, DiskWriteMda, readmda, memmapmda, writemda32, writemda64, is_url as mdaio_is_url
 import os
 
 class MdaRecordingExtractor(RecordingExtractor):
@@ -35,13 +35,23 @@ class MdaRecordingExtractor(RecordingExtractor):
         geom0 = os.path.join(dataset_directory, 'geom.csv')
         self._geom_fname = _realize_file(path=geom0)
         self._geom = np.genfromtxt(self._geom_fname, delimiter=',')
-        X = DiskReadMda(self._timeseries_path)
-        if self._geom.shape[0] != X.N1():
+        if mdaio_is_url(self._timeseries_path):
+            # remote files are read by chunks through http range requests
+            self._timeseries = None
+            self._diskreadmda = DiskReadMda(self._timeseries_path)
+            num_channels, num_timepoints = self._diskreadmda.N1(), self._diskreadmda.N2()
+        else:
+            # the file is opened once, and the traces of each call are copied from the memory map
+            self._timeseries = memmapmda(self._timeseries_path)
+            self._source_files = [self._timeseries_path]
+            self._diskreadmda = None
+            num_channels, num_timepoints = self._timeseries.shape
+        if self._geom.shape[0] != num_channels:
             raise Exception(
                 'Incompatible dimensions between geom.csv and timeseries file {} <> {}'.format(self._geom.shape[0],
-                                                                                               X.N1()))
-        self._num_channels = X.N1()
-        self._num_timepoints = X.N2()
+                                                                                               num_channels))
+        self._num_channels = num_channels
+        self._num_timepoints = num_timepoints
         for m in range(self._num_channels):
             self.set_channel_property(m, 'location', self._geom[m, :])
 
@@ -59,19 +69,21 @@ class MdaRecordingExtractor(RecordingExtractor):
             start_frame = 0
         if end_frame is None:
             end_frame = self.get_num_frames()
+        if self._timeseries is None:
+            X = self._diskreadmda
+            recordings = X.readChunk(i1=0, i2=start_frame, N1=X.N1(), N2=end_frame - start_frame)
+            if channel_ids is not None:
+                recordings = recordings[channel_ids, :]
+            return recordings
         if channel_ids is None:
-            channel_ids = self.get_channel_ids()
-        X = DiskReadMda(self._timeseries_path)
-        recordings = X.readChunk(i1=0, i2=start_frame, N1=X.N1(), N2=end_frame - start_frame)
-        recordings = recordings[channel_ids, :]
-        return recordings
+            return np.array(self._timeseries[:, start_frame:end_frame], order='C')
+        return np.array(self._timeseries[channel_ids, start_frame:end_frame], order='C')
 
     @staticmethod
     def write_recording(recording, save_path, params=dict()):
         channel_ids = recording.get_channel_ids()
         M = len(channel_ids)
         N = recording.get_num_frames()
-        raw = recording.get_traces()
         location0 = recording.get_channel_property(channel_ids[0], 'location')
         nd = len(location0)
         geom = np.zeros((M, nd))
@@ -80,7 +92,9 @@ class MdaRecordingExtractor(RecordingExtractor):
             geom[ii, :] = list(location_ii)
         if not os.path.isdir(save_path):
             os.mkdir(save_path)
-        writemda32(raw, os.path.join(save_path, 'raw.mda'))
+        raw = DiskWriteMda(os.path.join(save_path, 'raw.mda'), (M, N), dt='float32')
+        for start_frame, _, traces in recording.iter_chunks(channel_ids=channel_ids):
+            raw.writeChunk(traces, i1=0, i2=start_frame)
         params["samplerate"] = recording.get_sampling_frequency()
         with open(os.path.join(save_path, 'params.json'),'w') as f:
             json.dump(params, f)
@@ -114,40 +128,26 @@ class MdaSortingExtractor(SortingExtractor):
         else:
             self._firings_path = _realize_file(path=firings_file)
         self._firings = readmda(self._firings_path)
-        self._times = self._firings[1, :]
-        self._labels = self._firings[2, :]
-        self._unit_ids = np.unique(self._labels).astype(int)
+        self._source_files = [self._firings_path]
+        times = np.rint(self._firings[1, :]).astype(int)
+        labels = self._firings[2, :]
+        self._unit_ids = np.unique(labels).astype(int)
+        self._spike_vector = SpikeVector(times, labels, unit_ids=self._unit_ids)
 
     def get_unit_ids(self):
-        return self._unit_ids
+        return list(self._unit_ids)
 
     def get_unit_spike_train(self, unit_id, start_frame=None, end_frame=None):
-        if start_frame is None:
-            start_frame = 0
-        if end_frame is None:
-            end_frame = np.Inf
-        inds = np.where((self._labels == unit_id) & (start_frame <= self._times) & (self._times < end_frame))
-        return np.rint(self._times[inds]).astype(int)
+        return self._spike_vector.get_unit_spike_train(unit_id, start_frame=start_frame, end_frame=end_frame)
+
+    def get_spike_vector(self, unit_ids=None, start_frame=None, end_frame=None):
+        return self._spike_vector.get_spike_vector(unit_ids=unit_ids, start_frame=start_frame, end_frame=end_frame)
 
     @staticmethod
     def write_sorting(sorting, save_path):
         unit_ids = sorting.get_unit_ids()
-        if len(unit_ids) > 0:
-            K = np.max(unit_ids)
-        else:
-            K = 0
-        times_list = []
-        labels_list = []
-        for i in range(len(unit_ids)):
-            unit = unit_ids[i]
-            times = sorting.get_unit_spike_train(unit_id=unit)
-            times_list.append(times)
-            labels_list.append(np.ones(times.shape) * unit)
-        all_times = _concatenate(times_list)
-        all_labels = _concatenate(labels_list)
-        sort_inds = np.argsort(all_times)
-        all_times = all_times[sort_inds]
-        all_labels = all_labels[sort_inds]
+        all_times, unit_indices = sorting.get_spike_vector(unit_ids=unit_ids)
+        all_labels = np.asarray(unit_ids)[unit_indices]
         L = len(all_times)
         firings = np.zeros((3, L))
         firings[1, :] = all_times
@@ -155,12 +155,6 @@ class MdaSortingExtractor(SortingExtractor):
         writemda64(firings, save_path)
 
 
-def _concatenate(list):
-    if len(list) == 0:
-        return np.array([])
-    return np.concatenate(list)
-
-
 def is_kbucket_url(path):
     return path.startswith('kbucket://') or path.startswith('sha1://')
 
@@ -122,6 +122,37 @@ class DiskReadMda:
             f.close()
             return None
 
+class DiskWriteMda:
+    def __init__(self,path,dims,dt='float64'):
+        self._path=path
+        self._header=MdaHeader(dt,dims)
+        _write_header(path,self._header)
+        with open(path,"r+b") as f:
+            f.truncate(self._header.header_size+self._header.num_bytes_per_entry*self._header.dimprod)
+    def N1(self):
+        return self._header.dims[0]
+    def N2(self):
+        return self._header.dims[1]
+    def writeChunk(self,X,i1=-1,i2=-1,i3=-1):
+        if (i2<0):
+            return self._write_chunk_1d(X.ravel(),i1)
+        elif (i3<0):
+            if X.shape[0] != self.N1():
+                print ("Unable to support N1 {} != {}".format(X.shape[0],self.N1()))
+                return False
+            return self._write_chunk_1d(np.reshape(X,X.size,order='F'),i1+self.N1()*i2)
+        else:
+            if X.shape[0] != self.N1() or X.shape[1] != self.N2():
+                print ("Unable to support N1/N2 {}/{} != {}/{}".format(X.shape[0],X.shape[1],self.N1(),self.N2()))
+                return False
+            return self._write_chunk_1d(np.reshape(X,X.size,order='F'),i1+self.N1()*i2+self.N1()*self.N2()*i3)
+    def _write_chunk_1d(self,X,i):
+        offset=self._header.header_size+self._header.num_bytes_per_entry*i
+        with open(self._path,"r+b") as f:
+            f.seek(offset)
+            f.write(X.astype(self._header.dt).tobytes())
+        return True
+
 def is_url(path):
     return path.startswith('http://') or path.startswith('https://')
 
@@ -295,6 +326,16 @@ def readmda(path):
         f.close()
         return None
 
+def memmapmda(path):
+    if (file_extension(path)=='.npy'):
+        return np.load(path,mmap_mode='r')
+    H=_read_header(path)
+    if (H is None):
+        print ("Problem reading header of: {}".format(path))
+        return None
+    # column-major order: the first dimension is contiguous on disk
+    return np.memmap(path,dtype=H.dt,mode='r',offset=H.header_size,shape=tuple(H.dims),order='F')
+
 def writemda32(X,fname):
     if (file_extension(fname)=='.npy'):
         return writenpy32(X,fname);
@@ -26,6 +26,7 @@ class MEArecRecordingExtractor(RecordingExtractor):
     def __init__(self, recording_path, locs_2d=True):
         RecordingExtractor.__init__(self)
         self._recording_path = recording_path
+        self._source_files = [recording_path]
         self._fs = None
         self._positions = None
         self._recordings = None
@@ -114,6 +115,7 @@ class MEArecSortingExtractor(SortingExtractor):
     def __init__(self, recording_path):
         SortingExtractor.__init__(self)
         self._recording_path = recording_path
+        self._source_files = [recording_path]
         self._num_units = None
         self._spike_trains = None
         self._unit_ids = None
@@ -146,16 +148,11 @@ class MEArecSortingExtractor(SortingExtractor):
         return self._num_units
 
     def get_unit_spike_train(self, unit_id, start_frame=None, end_frame=None):
-        if start_frame is None:
-            start_frame = 0
-        if end_frame is None:
-            end_frame = np.Inf
         if self._spike_trains is None:
             self._initialize()
-        times = (self._spike_trains[self.get_unit_ids().index(unit_id)].times.rescale('s') *
+        times = (self._spike_trains[self._get_unit_index(unit_id)].times.rescale('s') *
                  self._fs.rescale('Hz')).magnitude
-        inds = np.where((start_frame <= times) & (times < end_frame))
-        return np.rint(times[inds]).astype(int)
+        return np.rint(self.window_spike_train(times, start_frame, end_frame)).astype(int)
 
     @staticmethod
     def write_sorting(sorting, save_path, sampling_frequency):
@@ -179,10 +176,10 @@ class MEArecSortingExtractor(SortingExtractor):
         if save_path.suffix == '.h5' or save_path.suffix == '.hdf5':
             # create neo spike trains
             spiketrains = []
-            for u in sorting.get_unit_ids():
-                st = neo.SpikeTrain(times=sorting.get_unit_spike_train(u) / float(sampling_frequency) * pq.s,
-                                    t_start=np.min(sorting.get_unit_spike_train(u) / float(sampling_frequency)) * pq.s,
-                                    t_stop=np.max(sorting.get_unit_spike_train(u) / float(sampling_frequency)) * pq.s)
+            unit_ids = sorting.get_unit_ids()
+            for u, spike_train in zip(unit_ids, sorting.get_all_spike_trains(unit_ids=unit_ids)):
+                times = spike_train / float(sampling_frequency)
+                st = neo.SpikeTrain(times=times * pq.s, t_start=np.min(times) * pq.s, t_stop=np.max(times) * pq.s)
                 st.annotate(unit_id=u)
                 spiketrains.append(st)
 
@@ -1,4 +1,4 @@
-from spikeextractors import SortingExtractor
+from spikeextractors import SortingExtractor, SpikeVector
 from pathlib import Path
 
 import numpy as np
@@ -20,46 +20,37 @@ class NpzSortingExtractor(SortingExtractor):
     installation_mesg = "Always installed"
 
     def __init__(self, npz_filename):
+        SortingExtractor.__init__(self)
         self.npz_filename = npz_filename
+        self._source_files = [npz_filename]
         
         npz = np.load(npz_filename)
         
         self.unit_ids = npz['unit_ids']
+        self._unit_ids = list(self.unit_ids)
         self.spike_indexes = npz['spike_indexes']
         self.spike_labels = npz['spike_labels']
+        self._spike_vector = SpikeVector(self.spike_indexes, self.spike_labels, unit_ids=self.unit_ids)
         
         #~ self._sampling_frequency = float(npz['sampling_frequency'][0])
 
     def get_unit_ids(self):
-        return list(self.unit_ids)
+        return list(self._unit_ids)
 
     def get_unit_spike_train(self, unit_id, start_frame=None, end_frame=None):
-        spike_times = self.spike_indexes[self.spike_labels == unit_id]
-        if start_frame is not None:
-            spike_times = spike_times[spike_times >= start_frame]
-        if end_frame is not None:
-            spike_times = spike_times[spike_times < end_frame]
-        return spike_times
+        return self._spike_vector.get_unit_spike_train(unit_id, start_frame=start_frame, end_frame=end_frame)
+
+    def get_spike_vector(self, unit_ids=None, start_frame=None, end_frame=None):
+        return self._spike_vector.get_spike_vector(unit_ids=unit_ids, start_frame=start_frame, end_frame=end_frame)
     
     @staticmethod
     def write_sorting(sorting, save_file):
         d = {}
         units_ids = np.array(sorting.get_unit_ids())
         d['unit_ids'] = units_ids
-        spike_indexes = []
-        spike_labels = []
-        for unit_id in units_ids:
-            sp_ind = sorting.get_unit_spike_train(unit_id)
-            spike_indexes.append(sp_ind)
-            spike_labels.append(np.ones(sp_ind.size, dtype='int64')*unit_id)
-        
-        # order times
-        spike_indexes = np.concatenate(spike_indexes)
-        spike_labels = np.concatenate(spike_labels)
-        order = np.argsort(spike_indexes)
-        
-        d['spike_indexes'] = spike_indexes[order]
-        d['spike_labels'] = spike_labels[order]
+        spike_indexes, unit_indices = sorting.get_spike_vector(unit_ids=units_ids)
+        d['spike_indexes'] = spike_indexes
+        d['spike_labels'] = units_ids[unit_indices].astype('int64')
         
         #~ if sorting._sampling_frequency is not None:
             #~ d['sampling_frequency'] = np.array([self._sampling_frequency], dtype='float64')
@@ -15,13 +15,14 @@ class NumpyRecordingExtractor(RecordingExtractor):
         else:
             raise ValueError("'timeseries must be a .npy file name or a numpy array")
         self._samplerate = float(samplerate)
+        self._channel_ids = list(range(self._timeseries.shape[0]))
         self._geom = geom
         if geom is not None:
             for m in range(self._timeseries.shape[0]):
                 self.set_channel_property(m, 'location', self._geom[m, :])
 
     def get_channel_ids(self):
-        return list(range(self._timeseries.shape[0]))
+        return list(self._channel_ids)
 
     def get_num_frames(self):
         return self._timeseries.shape[1]
@@ -49,6 +50,7 @@ class NumpySortingExtractor(SortingExtractor):
     def __init__(self):
         SortingExtractor.__init__(self)
         self._units = {}
+        self._unit_ids = []
         # self._properties = {}
 
     def load_from_extractor(self, sorting):
@@ -63,16 +65,48 @@ class NumpySortingExtractor(SortingExtractor):
             self.add_unit(unit_id=int(unit), times=times0)
 
     def add_unit(self, unit_id, times):
-        self._units[unit_id] = dict(times=times)
+        '''This function adds a unit with the given spike times. The spike times are
+        kept in the given order, so spike features must be given in the same order.
+        The spike times are rounded to frames when the unit is added, so that time windows
+        select the same spikes in the spike train and in the spike features. Sorted spike
+        times are windowed with a binary search, unsorted ones with a mask.
+
+        Parameters
+        ----------
+        unit_id: int
+            The id of the unit
+        times: array_like
+            The spike frames of the unit
+        '''
+        if unit_id not in self._units:
+            self._unit_ids.append(unit_id)
+            self._invalidate_unit_index_map()
+        times = np.rint(np.asarray(times)).astype(int)
+        self._units[unit_id] = dict(times=times, sorted=bool(np.all(np.diff(times) >= 0)))
 
     def get_unit_ids(self):
-        return list(self._units.keys())
+        return list(self._unit_ids)
 
     def get_unit_spike_train(self, unit_id, start_frame=None, end_frame=None):
-        if start_frame is None:
-            start_frame = 0
-        if end_frame is None:
-            end_frame = np.Inf
-        times = self._units[unit_id]['times']
-        inds = np.where((start_frame <= times) & (times < end_frame))[0]
-        return np.rint(times[inds]).astype(int)
+        unit = self._units[unit_id]
+        if unit['sorted']:
+            times = self.window_spike_train(unit['times'], start_frame, end_frame)
+        else:
+            times = unit['times'][self._get_unsorted_positions(unit['times'], start_frame, end_frame)]
+        return times
+
+    def _get_spike_positions(self, unit_id, start_frame=None, end_frame=None):
+        if unit_id in self._units and not self._units[unit_id]['sorted']:
+            if start_frame is None and end_frame is None:
+                return None
+            return self._get_unsorted_positions(self._units[unit_id]['times'], start_frame, end_frame)
+        return SortingExtractor._get_spike_positions(self, unit_id, start_frame, end_frame)
+
+    @staticmethod
+    def _get_unsorted_positions(times, start_frame=None, end_frame=None):
+        mask = np.ones(len(times), dtype=bool)
+        if start_frame is not None:
+            mask &= times >= start_frame
+        if end_frame is not None:
+            mask &= times < end_frame
+        return np.flatnonzero(mask)
@@ -4,72 +4,116 @@ import os
 import numpy as np
 from datetime import datetime
 
+try:
+    from pynwb import NWBHDF5IO
+    from pynwb import NWBFile
+    from pynwb.ecephys import ElectricalSeries
+    try:
+        from hdmf.data_utils import AbstractDataChunkIterator, DataChunk
+        from hdmf.backends.hdf5.h5_utils import H5DataIO
+    except ImportError:
+        from pynwb.form.data_utils import AbstractDataChunkIterator, DataChunk
+        from pynwb.form.backends.hdf5.h5_utils import H5DataIO
+    HAVE_NWB = True
+except ImportError:
+    HAVE_NWB = False
 
-class CopyRecordingExtractor(se.RecordingExtractor):
-    def __init__(self, other):
+
+class NwbRecordingExtractor(se.RecordingExtractor):
+
+    extractor_name = 'NwbRecordingExtractor'
+    installed = HAVE_NWB  # check at class level if installed or not
+    installation_mesg = "To use the Nwb extractors, install pynwb: \n\n pip install pynwb\n\n"  # error message when not installed
+
+    def __init__(self, path, acquisition_name=None):
+        assert HAVE_NWB, "To use the Nwb extractors, install pynwb: \n\n pip install pynwb\n\n"
         se.RecordingExtractor.__init__(self)
-        self._other = other
-        self.copy_channel_properties(other)
+        self._path = path
+        self._source_files = [path]
+        self._acquisition_name = acquisition_name
+        # the file is kept open and the traces are read from the hdf5 dataset on demand
+        self._io = NWBHDF5IO(path, 'r')
+        nwbfile = self._io.read()
+        if acquisition_name is None:
+            a_names = list(nwbfile.acquisition.keys())
+            if len(a_names) > 1:
+                raise Exception('More than one acquisition found. You must specify acquisition_name.')
+            if len(a_names) == 0:
+                raise Exception('No acquisitions found in the .nwb file.')
+            acquisition_name = a_names[0]
+        ts = nwbfile.acquisition[acquisition_name]
+        self._nwb_timeseries = ts
+        self._data = ts.data
+        N, M = self._data.shape
+        if M != len(ts.electrodes):
+            raise Exception(
+                'Number of electrodes does not match the shape of the data {}<>{}'.format(M, len(ts.electrodes)))
+        self._num_frames = N
+        self._num_channels = M
+        geom = np.zeros((M, 3))
+        for m in range(M):
+            geom[m, :] = [ts.electrodes[m][1], ts.electrodes[m][2], ts.electrodes[m][3]]
+        if getattr(ts, 'timestamps', None) is not None and len(ts.timestamps) > 1:
+            timestamps = ts.timestamps[:2]
+            self._samplerate = 1 / (timestamps[1] - timestamps[0])  # there's probably a better way
+        else:
+            self._samplerate = ts.rate * 1000
+        self.set_channels_property(channel_ids=self.get_channel_ids(), property_name='location', values=list(geom))
+
+    def __del__(self):
+        if getattr(self, '_io', None) is not None:
+            self._io.close()
 
     def get_channel_ids(self):
-        return list(range(self._other.get_num_channels()))
+        return list(range(self._num_channels))
 
     def get_num_frames(self):
-        return self._other.get_num_frames()
+        return self._num_frames
 
     def get_sampling_frequency(self):
-        return self._other.get_sampling_frequency()
+        return self._samplerate
 
     def get_traces(self, channel_ids=None, start_frame=None, end_frame=None):
-        return self._other.get_traces(channel_ids=channel_ids, start_frame=start_frame, end_frame=end_frame)
-
-
-class NwbRecordingExtractor(CopyRecordingExtractor):
-    def __init__(self, path, acquisition_name=None):
-        try:
-            from pynwb import NWBHDF5IO
-            from pynwb import NWBFile
-            from pynwb.ecephys import ElectricalSeries
-        except ModuleNotFoundError:
-            raise ModuleNotFoundError("To use the Nwb extractors, install pynwb: \n\n"
-                                      "pip install pynwb\n\n")
-        self._path = path
-        self._acquisition_name = acquisition_name
-        with NWBHDF5IO(path, 'r') as io:
-            nwbfile = io.read()
-            if acquisition_name is None:
-                a_names = list(nwbfile.acquisition.keys())
-                if len(a_names) > 1:
-                    raise Exception('More than one acquisition found. You must specify acquisition_name.')
-                if len(a_names) == 0:
-                    raise Exception('No acquisitions found in the .nwb file.')
-                acquisition_name = a_names[0]
-            ts = nwbfile.acquisition[acquisition_name]
-            self._nwb_timeseries = ts
-            M = np.array(ts.data).shape[1]
-            if M != len(ts.electrodes):
-                raise Exception(
-                    'Number of electrodes does not match the shape of the data {}<>{}'.format(M, len(ts.electrodes)))
-            geom = np.zeros((M, 3))
-            for m in range(M):
-                geom[m, :] = [ts.electrodes[m][1], ts.electrodes[m][2], ts.electrodes[m][3]]
-            if hasattr(ts, 'timestamps') and ts.timestamps:
-                samplerate = 1 / (ts.timestamps[1] - ts.timestamps[0])  # there's probably a better way
+        if start_frame is None:
+            start_frame = 0
+        if end_frame is None:
+            end_frame = self.get_num_frames()
+        if channel_ids is None:
+            data = self._data[start_frame:end_frame, :]
+        else:
+            channel_idxs = self._get_channel_indices(channel_ids)
+            # hyperslab read of the requested channels (hdf5 selections must be increasing)
+            unique_idxs, positions = np.unique(channel_idxs, return_inverse=True)
+            if len(unique_idxs) == self._num_channels:
+                data = self._data[start_frame:end_frame, :][:, channel_idxs]
             else:
-                samplerate = ts.rate * 1000
-            data = np.copy(np.transpose(ts.data))
-            NRX = se.NumpyRecordingExtractor(timeseries=data, samplerate=samplerate, geom=geom)
-            CopyRecordingExtractor.__init__(self, NRX)
+                data = self._data[start_frame:end_frame, list(unique_idxs)][:, positions]
+        return np.ascontiguousarray(np.transpose(data))
 
     @staticmethod
-    def write_recording(recording, save_path, acquisition_name):
-        try:
-            from pynwb import NWBHDF5IO
-            from pynwb import NWBFile
-            from pynwb.ecephys import ElectricalSeries
-        except ModuleNotFoundError:
-            raise ModuleNotFoundError("To use the Nwb extractors, install pynwb: \n\n"
-                                      "pip install pynwb\n\n")
+    def write_recording(recording, save_path, acquisition_name, chunk_size=None, compression='gzip',
+                        compression_opts=None):
+        '''Saves a recording extractor as an acquisition of a new NWB file. The traces are
+        streamed chunk by chunk to the (compressed) hdf5 dataset, so the recording is never
+        loaded in memory as a whole.
+
+        Parameters
+        ----------
+        recording: RecordingExtractor
+            The recording extractor object to be saved
+        save_path: str
+            The path to the file.
+        acquisition_name: str
+            The name of the acquisition
+        chunk_size: None or int
+            Number of frames of each chunk that is read and written at once.
+            If None, chunks of one second are used.
+        compression: str or None
+            The hdf5 compression filter of the traces ('gzip' by default, None to disable it)
+        compression_opts: int
+            The options of the compression filter (e.g. the gzip level)
+        '''
+        assert HAVE_NWB, "To use the Nwb extractors, install pynwb: \n\n pip install pynwb\n\n"
         M = recording.get_num_channels()
         N = recording.get_num_frames()
 
@@ -119,7 +163,11 @@ class NwbRecordingExtractor(CopyRecordingExtractor):
         )
 
         rate = recording.get_sampling_frequency() / 1000
-        ephys_data = recording.get_traces().T
+        if chunk_size is None:
+            chunk_size = max(int(recording.get_sampling_frequency()), 1)
+        ephys_data = _TracesChunkIterator(recording, chunk_size)
+        if compression is not None:
+            ephys_data = H5DataIO(ephys_data, compression=compression, compression_opts=compression_opts)
 
         ephys_ts = ElectricalSeries(
             name=acquisition_name,
@@ -137,3 +185,36 @@ class NwbRecordingExtractor(CopyRecordingExtractor):
             os.remove(save_path)
         with NWBHDF5IO(save_path, 'w') as io:
             io.write(nwbfile)
+
+
+if HAVE_NWB:
+    class _TracesChunkIterator(AbstractDataChunkIterator):
+        # iterates over the traces of a recording in chunks of frames, in the (frames, channels) layout of NWB
+        def __init__(self, recording, chunk_size):
+            self._recording = recording
+            self._chunks = recording.iter_chunks(chunk_size=chunk_size)
+            self._shape = (recording.get_num_frames(), recording.get_num_channels())
+            self._dtype = recording.get_traces(start_frame=0, end_frame=min(1, self._shape[0])).dtype
+
+        def __iter__(self):
+            return self
+
+        def __next__(self):
+            start_frame, end_frame, traces = next(self._chunks)
+            return DataChunk(data=np.transpose(traces), selection=np.s_[start_frame:end_frame, :])
+
+        next = __next__
+
+        def recommended_chunk_shape(self):
+            return None
+
+        def recommended_data_shape(self):
+            return self._shape
+
+        @property
+        def dtype(self):
+            return self._dtype
+
+        @property
+        def maxshape(self):
+            return self._shape
@@ -74,14 +74,9 @@ class OpenEphysSortingExtractor(SortingExtractor):
         self._unit_ids = list([np.unique(st.clusters)[0] for st in self._spiketrains])
 
     def get_unit_ids(self):
-        return self._unit_ids
+        return list(self._unit_ids)
 
     def get_unit_spike_train(self, unit_id, start_frame=None, end_frame=None):
-        if start_frame is None:
-            start_frame = 0
-        if end_frame is None:
-            end_frame = np.Inf
         st = self._spiketrains[unit_id]
-        inds = np.where((start_frame <= (st.times * self._recording.sample_rate)) &
-                        ((st.times * self._recording.sample_rate) < end_frame))
-        return (st.times[inds] * self._recording.sample_rate).magnitude
+        times = (st.times * self._recording.sample_rate).magnitude
+        return self.window_spike_train(times, start_frame, end_frame)
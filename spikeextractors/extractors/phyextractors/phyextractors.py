@@ -1,6 +1,6 @@
-from spikeextractors import SortingExtractor, RecordingExtractor
+from spikeextractors import SortingExtractor, RecordingExtractor, SpikeVector
 from spikeextractors.extractors.bindatrecordingextractor import BinDatRecordingExtractor
-from spikeextractors.extraction_tools import read_python
+from spikeextractors.extraction_tools import read_python, get_unit_waveforms
 import numpy as np
 from pathlib import Path
 import csv
@@ -68,14 +68,12 @@ class PhySortingExtractor(SortingExtractor):
         phy_folder = Path(phy_folder)
 
         spike_times = np.load(phy_folder / 'spike_times.npy')
-        spike_templates = np.load(phy_folder / 'spike_templates.npy')
-        amplitudes = np.load(phy_folder / 'amplitudes.npy')
-        pc_features = np.load(phy_folder / 'pc_features.npy')
-
         if (phy_folder /'spike_clusters.npy').is_file():
-            spike_clusters = np.load(phy_folder / 'spike_clusters.npy')
+            clusters_file = phy_folder / 'spike_clusters.npy'
         else:
-            spike_clusters = spike_templates
+            clusters_file = phy_folder / 'spike_templates.npy'
+        spike_clusters = np.load(clusters_file)
+        self._source_files = [phy_folder / 'spike_times.npy', clusters_file]
 
         clust_id = np.unique(spike_clusters)
         self._unit_ids = list(clust_id)
@@ -95,7 +93,7 @@ class PhySortingExtractor(SortingExtractor):
                             property = tokens[1]
                         else:
                             tokens = row[0].split("\t")
-                            if int(tokens[0]) in self.get_unit_ids():
+                            if int(tokens[0]) in self._get_unit_index_map():
                                 if 'cluster_group' in str(f):
                                     self.set_unit_property(int(tokens[0]), 'quality', tokens[1])
                                 elif property == 'chan_grp':
@@ -112,7 +110,7 @@ class PhySortingExtractor(SortingExtractor):
                         if line_count == 0:
                             property = row[1]
                         else:
-                            if int(row[0]) in self.get_unit_ids():
+                            if int(row[0]) in self._get_unit_index_map():
                                 if 'cluster_group' in str(f):
                                     self.set_unit_property(int(row[0]), 'quality', row[1])
                                 elif property == 'ch_group':
@@ -143,13 +141,16 @@ class PhySortingExtractor(SortingExtractor):
 
         original_units = self._unit_ids
         self._unit_ids = included_units
-        # set features
-        self._spiketrains = []
-        for clust in self._unit_ids:
-            idx = np.where(spike_clusters == clust)[0]
-            self._spiketrains.append(spike_times[idx])
-            self.set_unit_spike_features(clust, 'amplitudes', amplitudes[idx])
-            self.set_unit_spike_features(clust, 'pc_features', pc_features[idx])
+        self._invalidate_unit_index_map()
+        self._spike_vector = SpikeVector(spike_times, spike_clusters, unit_ids=self._unit_ids)
+        # the (possibly very large) spike feature arrays are memory-mapped and only the spikes
+        # of a unit are read when its features are requested
+        for feature_name in ['amplitudes', 'pc_features', 'template_features']:
+            if (phy_folder / (feature_name + '.npy')).is_file():
+                features = np.load(str(phy_folder / (feature_name + '.npy')), mmap_mode='r')
+                for clust in self._unit_ids:
+                    self.set_lazy_unit_spike_features(clust, feature_name, features,
+                                                      spike_indices=self._spike_vector.get_unit_spike_indices(clust))
 
         if load_waveforms:
             datfile = [x for x in phy_folder.iterdir() if x.suffix == '.dat' or x.suffix == '.bin']
@@ -160,22 +161,18 @@ class PhySortingExtractor(SortingExtractor):
             if (phy_folder / 'channel_groups.npy').is_file():
                 channel_groups = np.load(phy_folder / 'channel_groups.npy')
                 assert len(channel_groups) == recording.get_num_channels()
-                for (ch, cg) in zip(recording.get_channel_ids(), channel_groups):
-                    recording.set_channel_property(ch, 'group', cg)
-                for u_i, u in enumerate(self.get_unit_ids()):
-                    if verbose:
-                        print('Computing waveform by group for unit', u)
-                    frames_before = int(0.5 / 1000. * recording.get_sampling_frequency())
-                    frames_after = int(2 / 1000. * recording.get_sampling_frequency())
-                    spiketrain = self.get_unit_spike_train(u)
+                recording.set_channels_property(channel_ids=recording.get_channel_ids(), property_name='group',
+                                                values=list(channel_groups))
+                channel_ids = {}
+                for u in self.get_unit_ids():
                     if 'group' in self.get_unit_property_names(u):
-                        group_idx = np.where(channel_groups == int(self.get_unit_property(u, 'group')))[0]
-                        wf = recording.get_snippets(reference_frames=spiketrain,
-                                                    snippet_len=[frames_before, frames_after],
-                                                    channel_ids=group_idx)
-                    else:
-                        wf = recording.get_snippets(reference_frames=spiketrain,
-                                                    snippet_len=[frames_before, frames_after])
+                        channel_ids[u] = list(np.where(channel_groups == int(self.get_unit_property(u, 'group')))[0])
+                if verbose:
+                    print('Computing waveforms by group')
+                waveforms = get_unit_waveforms(recording, self, ms_before=0.5, ms_after=2., channel_ids=channel_ids,
+                                               verbose=verbose)
+                for u, wf in zip(self.get_unit_ids(), waveforms):
+                    if u not in channel_ids:
                         max_chan = np.unravel_index(np.argmin(np.mean(wf, axis=0)), np.mean(wf, axis=0).shape)[0]
                         group = recording.get_channel_property(int(max_chan), 'group')
                         self.set_unit_property(u, 'group', group)
@@ -183,52 +180,43 @@ class PhySortingExtractor(SortingExtractor):
                         wf = wf[:, group_idx]
                     self.set_unit_spike_features(u, 'waveforms', wf)
             else:
-                for u_i, u in enumerate(self.get_unit_ids()):
-                    if verbose:
-                        print('Computing full waveform for unit', u)
-                    frames_before = 0.5 * recording.get_sampling_frequency()
-                    frames_after = 2 * recording.get_sampling_frequency()
-                    spiketrain = self.get_unit_spike_train(u)
-                    wf = recording.get_snippets(reference_frames=spiketrain,
-                                                snippet_len=[int(frames_before), int(frames_after)])
+                if verbose:
+                    print('Computing full waveforms')
+                waveforms = get_unit_waveforms(recording, self, ms_before=0.5, ms_after=2., verbose=verbose)
+                for u, wf in zip(self.get_unit_ids(), waveforms):
                     self.set_unit_spike_features(u, 'waveforms', wf)
 
     def get_unit_ids(self):
         return list(self._unit_ids)
 
     def get_unit_spike_train(self, unit_id, start_frame=None, end_frame=None):
-        if start_frame is None:
-            start_frame = 0
-        if end_frame is None:
-            end_frame = np.Inf
-        times = self._spiketrains[self.get_unit_ids().index(unit_id)]
-        inds = np.where((start_frame <= times) & (times < end_frame))
-        return times[inds]
+        return self._spike_vector.get_unit_spike_train(unit_id, start_frame=start_frame, end_frame=end_frame)
+
+    def get_spike_vector(self, unit_ids=None, start_frame=None, end_frame=None):
+        return self._spike_vector.get_spike_vector(unit_ids=unit_ids, start_frame=start_frame, end_frame=end_frame)
 
     @staticmethod
     def write_sorting(sorting, save_path):
         save_path = Path(save_path)
-        spike_times = np.array([])
-        spike_clusters = np.array([])
+        unit_ids = sorting.get_unit_ids()
+        spike_trains = sorting.get_all_spike_trains(unit_ids=unit_ids)
+        feature_names = sorting.get_unit_spike_feature_names()
         amplitudes = np.array([])
         pc_features = np.array([])
+        if len(spike_trains) > 0:
+            spike_times = np.concatenate(spike_trains)
+            spike_clusters = np.repeat(unit_ids, [len(st) for st in spike_trains])
+            if 'amplitudes' in feature_names:
+                amplitudes = np.concatenate([np.asarray(sorting.get_unit_spike_features(id, 'amplitudes'))
+                                             for id in unit_ids])
+            if 'pc_features' in feature_names:
+                pc_features = np.concatenate([np.asarray(sorting.get_unit_spike_features(id, 'pc_features'))
+                                              for id in unit_ids])
+        else:
+            spike_times = np.array([])
+            spike_clusters = np.array([])
 
-        for id in sorting.get_unit_ids():
-            st = sorting.get_unit_spike_train(id)
-            cl = [id] * len(sorting.get_unit_spike_train(id))
-            spike_times = np.concatenate((spike_times, np.array(st)))
-            spike_clusters = np.concatenate((spike_clusters, np.array(cl)))
-            if 'amplitudes' in sorting.get_unit_spike_feature_names():
-                amp = sorting.get_unit_spike_features(id, 'amplitudes')
-                amplitudes = np.concatenate((amplitudes, np.array(amp)))
-            if 'pc_features' in sorting.get_unit_spike_feature_names():
-                pc_feat = sorting.get_unit_spike_features(id, 'pc_features')
-                if len(pc_features) == 0:
-                    pc_features = pc_feat
-                else:
-                    pc_features = np.vstack((pc_features, np.array(pc_feat)))
-
-        sorting_idxs = np.argsort(spike_times)
+        sorting_idxs = np.argsort(spike_times, kind='mergesort')
         spike_times = spike_times[sorting_idxs]
         spike_clusters = spike_clusters[sorting_idxs]
 
@@ -20,6 +20,7 @@ class SpikeGLXRecordingExtractor(RecordingExtractor):
     def __init__(self, npx_file, x_pitch=None, y_pitch=None):
         RecordingExtractor.__init__(self)
         self._npxfile = Path(npx_file)
+        self._source_files = [self._npxfile]
         numchan = 385
         dtype = 'int16'
         root = str(self._npxfile.stem).split('.')[0]
@@ -44,7 +45,7 @@ class SpikeGLXRecordingExtractor(RecordingExtractor):
                 self.set_channel_property(m, 'location', locations[m])
 
     def get_channel_ids(self):
-        return self._channels
+        return list(self._channels)
 
     def get_num_frames(self):
         return self._timeseries.shape[1]
@@ -60,7 +61,7 @@ class SpikeGLXRecordingExtractor(RecordingExtractor):
         if channel_ids is None:
             channel_ids = list(range(self._timeseries.shape[0]))
         else:
-            channel_ids = [self._channels.index(ch) for ch in channel_ids]
+            channel_ids = self._get_channel_indices(channel_ids)
         recordings = self._timeseries[:, start_frame:end_frame][channel_ids, :]
         return recordings
 
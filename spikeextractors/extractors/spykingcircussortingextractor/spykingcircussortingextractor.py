@@ -1,6 +1,8 @@
 from spikeextractors import SortingExtractor
 import numpy as np
 from pathlib import Path
+from functools import partial
+import weakref
 
 try:
     import h5py
@@ -31,24 +33,68 @@ class SpykingCircusSortingExtractor(SortingExtractor):
                 break
         if results is None:
             raise Exception(spykingcircus_folder, " is not a spyking circus folder")
-        f_results = h5py.File(results)
-        self._spiketrains = []
-        self._unit_ids = []
-        for temp in f_results['spiketimes'].keys():
-            self._spiketrains.append(f_results['spiketimes'][temp].value)
-            self._unit_ids.append(int(temp.split('_')[-1]))
+        self._f_results = h5py.File(str(results), 'r')
+        self._source_files = [results]
+        # unit ids are read from the dataset names, the spike times of each template when they are first requested
+        # (the file is kept open until close is called)
+        try:
+            self._templates = {}
+            self._spiketrains = {}
+            self._unit_ids = []
+            for temp in self._f_results['spiketimes'].keys():
+                unit_id = int(temp.split('_')[-1])
+                self._templates[unit_id] = temp
+                self._unit_ids.append(unit_id)
+            if 'amplitudes' in self._f_results.keys():
+                for unit_id, temp in self._templates.items():
+                    if temp in self._f_results['amplitudes']:
+                        self.set_lazy_unit_spike_features(unit_id, 'amplitudes',
+                                                          partial(_read_amplitudes, weakref.ref(self), unit_id))
+        except Exception:
+            self.close()
+            raise
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        '''Closes the result file, if it is still open. The spike trains and amplitudes of the templates
+        that have not been read yet are not available after the file is closed.
+        '''
+        if getattr(self, '_f_results', None) is not None:
+            self._f_results.close()
+            self._f_results = None
 
     def get_unit_ids(self):
         return list(self._unit_ids)
 
     def get_unit_spike_train(self, unit_id, start_frame=None, end_frame=None):
-        if start_frame is None:
-            start_frame = 0
-        if end_frame is None:
-            end_frame = np.Inf
-        times = self._spiketrains[self.get_unit_ids().index(unit_id)]
-        inds = np.where((start_frame <= times) & (times < end_frame))
-        return times[inds]
+        if unit_id not in self._templates:
+            raise ValueError(str(unit_id) + " is not a valid unit_id")
+        if unit_id not in self._spiketrains:
+            self._spiketrains[unit_id] = self._read_spike_train(unit_id)
+        times, _ = self._spiketrains[unit_id]
+        return self.window_spike_train(times, start_frame, end_frame)
+
+    def _read_spike_train(self, unit_id):
+        # returns the sorted spike times and the sorting order (None if the times are already sorted)
+        if self._f_results is None:
+            raise ValueError("The result file has been closed")
+        times = self._f_results['spiketimes'][self._templates[unit_id]][()]
+        if np.all(np.diff(times) >= 0):
+            return times, None
+        order = np.argsort(times, kind='mergesort')
+        return times[order], order
+
+    def _read_amplitudes(self, unit_id):
+        self.get_unit_spike_train(unit_id)
+        _, order = self._spiketrains[unit_id]
+        if self._f_results is None:
+            raise ValueError("The result file has been closed")
+        amplitudes = self._f_results['amplitudes'][self._templates[unit_id]][()]
+        if order is not None:
+            amplitudes = amplitudes[order]
+        return amplitudes
 
     @staticmethod
     def write_sorting(sorting, save_path):
@@ -57,14 +103,31 @@ class SpykingCircusSortingExtractor(SortingExtractor):
         if save_path.is_dir():
             save_path = save_path / 'data.result.hdf5'
         elif save_path.suffix == '.hdf5':
-            if not str(save_path).endswith('result.hdf5') or not str(save_path).endswith('result-merged.hdf5'):
+            if not str(save_path).endswith('result.hdf5') and not str(save_path).endswith('result-merged.hdf5'):
                 raise AttributeError("'save_path' is either a folder or an hdf5 file "
                                      "ending with 'result.hdf5' or 'result-merged.hdf5")
         else:
             save_path.mkdir()
             save_path = save_path / 'data.result.hdf5'
-        F = h5py.File(save_path, 'w')
-        spiketimes = F.create_group('spiketimes')
+        with h5py.File(str(save_path), 'w') as F:
+            spiketimes = F.create_group('spiketimes')
+            amplitudes = F.create_group('amplitudes')
+            # the spike times and amplitudes of each unit are written one unit at a time
+            for id in sorting.get_unit_ids():
+                spike_train = np.asarray(sorting.get_unit_spike_train(id))
+                _create_compressed_dataset(spiketimes, 'temp_' + str(id), spike_train)
+                if 'amplitudes' in sorting.get_unit_spike_feature_names(id):
+                    _create_compressed_dataset(amplitudes, 'temp_' + str(id),
+                                               np.asarray(sorting.get_unit_spike_features(id, 'amplitudes')))
+
+
+def _read_amplitudes(sorting_ref, unit_id):
+    # the lazy features only hold a weak reference to the extractor, so that deleting it closes the file
+    return sorting_ref()._read_amplitudes(unit_id)
+
 
-        for id in sorting.get_unit_ids():
-            spiketimes.create_dataset('tmp_' + str(id), data=sorting.get_unit_spike_train(id))
+def _create_compressed_dataset(group, name, data):
+    if len(data) == 0:
+        group.create_dataset(name, data=data)
+    else:
+        group.create_dataset(name, data=data, chunks=True, compression='gzip')
@@ -41,8 +41,4 @@ class TridesclousSortingExtractor(SortingExtractor):
         spikes = self.dataio.get_spikes(seg_num=0, chan_grp=self.chan_grp, i_start=None, i_stop=None)
         spikes = spikes[spikes['cluster_label'] == unit_id]
         spike_times = spikes['index']
-        if start_frame is not None:
-            spike_times = spike_times[spike_times >= start_frame]
-        if end_frame is not None:
-            spike_times = spike_times[spike_times < end_frame]
-        return spike_times
+        return self.window_spike_train(spike_times, start_frame, end_frame)
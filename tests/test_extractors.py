@@ -1,9 +1,16 @@
 import numpy as np
 import os, sys
 import unittest
+from unittest import mock
 import tempfile
 import shutil
 
+try:
+    import h5py
+    HAVE_H5PY = True
+except ImportError:
+    HAVE_H5PY = False
+
 
 def append_to_path(dir0):  # A convenience function
     if dir0 not in sys.path:
@@ -82,17 +89,26 @@ class TestExtractors(unittest.TestCase):
         SX_mda = se.MdaSortingExtractor(path2)
         self._check_recording_return_types(RX_mda)
         self._check_recordings_equal(self.RX, RX_mda)
+        # the traces are writable copies of the file
+        traces = RX_mda.get_traces(channel_ids=[2, 0], start_frame=10, end_frame=100)
+        self.assertTrue(traces.flags.writeable and traces.flags.c_contiguous)
+        traces -= 1
+        self.assertTrue(np.array_equal(RX_mda.get_traces(channel_ids=[2, 0], start_frame=10, end_frame=100),
+                                       self.RX.get_traces(channel_ids=[2, 0], start_frame=10, end_frame=100)))
         self._check_sorting_return_types(SX_mda)
         self._check_sortings_equal(self.SX, SX_mda)
 
-    # old: don't do this test because pynwb causes a seg fault!
-    # don't do this test because pynwb interface has changed
-    # def test_nwb_extractor(self):
-    #    path1=self.test_dir+'/test.nwb'
-    #    se.NwbRecordingExtractor.write_recording(self.RX,path1,acquisition_name='test')
-    #    RX_nwb=se.NwbRecordingExtractor(path1,acquisition_name='test')
-    #    self._check_recording_return_types(RX_nwb)
-    #    self._check_recordings_equal(self.RX,RX_nwb)
+    @unittest.skipIf(not se.NwbRecordingExtractor.installed, "pynwb is not installed")
+    def test_nwb_extractor(self):
+        path1 = self.test_dir + '/test.nwb'
+        se.NwbRecordingExtractor.write_recording(self.RX, path1, acquisition_name='test', chunk_size=3000)
+        RX_nwb = se.NwbRecordingExtractor(path1, acquisition_name='test')
+        self._check_recording_return_types(RX_nwb)
+        self._check_recordings_equal(self.RX, RX_nwb)
+        # the traces are read lazily from the hdf5 dataset, also for unsorted and duplicate channels
+        self.assertTrue(np.array_equal(RX_nwb.get_traces(channel_ids=[3, 1, 3], start_frame=100, end_frame=900),
+                                       self.RX.get_traces(channel_ids=[3, 1, 3], start_frame=100, end_frame=900)))
+        del RX_nwb
 
     def _check_recording_return_types(self, RX):
         channel_ids = RX.get_channel_ids()
@@ -111,6 +127,41 @@ class TestExtractors(unittest.TestCase):
         RX_biocam = se.BiocamRecordingExtractor(path1)
         self._check_recording_return_types(RX_biocam)
         self._check_recordings_equal(self.RX, RX_biocam)
+        # channel subsets with duplicates are read as a whole block for few channels
+        self.assertTrue(np.array_equal(RX_biocam.get_traces(channel_ids=[3, 1, 3], start_frame=100, end_frame=900),
+                                       self.RX.get_traces(channel_ids=[3, 1, 3], start_frame=100, end_frame=900)))
+        del RX_biocam
+        path2 = self.test_dir + '/scaled.brw'
+        se.BiocamRecordingExtractor.write_recording(self.RX, path2, scale=0.5)
+        RX_biocam = se.BiocamRecordingExtractor(path2)
+        self.assertTrue(np.array_equal(RX_biocam.get_traces(), np.rint(self.RX.get_traces() * 0.5)))
+        del RX_biocam
+
+    @unittest.skipIf(not HAVE_H5PY, "h5py is not installed")
+    def test_biocam_extractor_channel_reads(self):
+        # with many channels, a few channels are read as strided hyperslabs (version 101)
+        # or as a hyperslab of columns (version 100)
+        X = (np.random.normal(0, 1, (32, 2000)) * 100).astype('int16')
+        geom = np.vstack((np.arange(32) // 8 + 1, np.arange(32) % 8 + 1)).T
+        RX = se.NumpyRecordingExtractor(timeseries=X, samplerate=30000, geom=geom)
+        path101 = self.test_dir + '/raw101.brw'
+        se.BiocamRecordingExtractor.write_recording(RX, path101)
+        path100 = self.test_dir + '/raw100.brw'
+        se.BiocamRecordingExtractor.write_recording(RX, path100)
+        with h5py.File(path100, 'a') as rf:
+            del rf['3BData/Raw']
+            rf.create_dataset('3BData/Raw', data=X.T, chunks=(100, 32))
+            rf['3BData'].attrs['Version'] = 100
+        for path, file_format in [(path101, 101), (path100, 100)]:
+            RX_biocam = se.BiocamRecordingExtractor(path)
+            self.assertEqual(RX_biocam._file_format, file_format)
+            self._check_recordings_equal(RX, RX_biocam)
+            for channel_ids in [[5], [5, 2, 5], [31, 0], list(range(32))[::-1]]:
+                self.assertTrue(np.array_equal(RX_biocam.get_traces(channel_ids=channel_ids, start_frame=150,
+                                                                    end_frame=1234),
+                                               X[channel_ids, 150:1234]))
+            self.assertEqual(RX_biocam.get_traces(channel_ids=[5, 2], start_frame=10, end_frame=10).shape, (2, 0))
+            del RX_biocam
 
     def test_mearec_extractors(self):
         path1 = self.test_dir + '/raw.h5'
@@ -126,12 +177,50 @@ class TestExtractors(unittest.TestCase):
         self._check_sorting_return_types(SX_mearec)
         self._check_sortings_equal(self.SX, SX_mearec)
 
+    @unittest.skipIf(not HAVE_H5PY, "h5py is not installed")
     def test_hs2_extractor(self):
         path1 = self.test_dir + '/firings_true.hdf5'
         se.HS2SortingExtractor.write_sorting(self.SX, path1)
         SX_hs2 = se.HS2SortingExtractor(path1)
         self._check_sorting_return_types(SX_hs2)
         self._check_sortings_equal(self.SX, SX_hs2)
+        num_spikes = len(SX_hs2.get_spike_vector()[0])
+        del SX_hs2
+        data = np.random.normal(0, 1, (3, num_spikes))
+        ch = np.random.randint(0, 4, num_spikes)
+        path2 = self.test_dir + '/firings_chunked.hdf5'
+        shutil.copy(path1, path2)
+        # contiguous datasets are memory-mapped, chunked (compressed) datasets are read through h5py
+        with h5py.File(path1, 'a') as rf:
+            rf.create_dataset('data', data=data)
+            rf.create_dataset('ch', data=ch, chunks=(16,), compression='gzip')
+        with h5py.File(path2, 'a') as rf:
+            rf.create_dataset('data', data=data, chunks=(3, 16), compression='gzip')
+            rf.create_dataset('ch', data=ch)
+        for path, memmapped in [(path1, ['data']), (path2, ['ch'])]:
+            # the datasets of the features are not read when the file is opened
+            read_datasets = []
+            getitem = h5py.Dataset.__getitem__
+
+            def recording_getitem(dataset, args, *kargs, **kwargs):
+                read_datasets.append(dataset.name)
+                return getitem(dataset, args, *kargs, **kwargs)
+
+            with mock.patch.object(h5py.Dataset, '__getitem__', recording_getitem):
+                SX_hs2 = se.HS2SortingExtractor(path)
+                self.assertNotIn('/data', read_datasets)
+                self.assertNotIn('/ch', read_datasets)
+                SX_hs2.get_unit_spike_features(SX_hs2.get_unit_ids()[0], 'spike_locations')
+                self.assertEqual('/data' in read_datasets, 'data' not in memmapped)
+            for name in ['data', 'ch']:
+                self.assertEqual(isinstance(SX_hs2._get_dataset_array(name), np.memmap), name in memmapped)
+            for unit_id in SX_hs2.get_unit_ids():
+                idxs = SX_hs2.get_unit_indices(unit_id)
+                self.assertTrue(np.array_equal(SX_hs2.get_unit_spike_features(unit_id, 'spike_locations'),
+                                               data[:2, idxs].T))
+                self.assertTrue(np.array_equal(SX_hs2.get_unit_spike_features(unit_id, 'spike_max_channels'),
+                                               ch[idxs]))
+            del SX_hs2
 
 
     # def test_exdir_extractors(self):
@@ -148,6 +237,30 @@ class TestExtractors(unittest.TestCase):
     #     self._check_sortings_equal(self.SX, SX_exdir)
 
 
+    def test_compressed_extractor(self):
+        path1 = self.test_dir + '/raw.cdat'
+        se.CompressedRecordingExtractor.write_recording(self.RX, path1, chunk_size=3000, channel_block_size=3)
+        RX_cmp = se.CompressedRecordingExtractor(path1, n_jobs=2)
+        self._check_recording_return_types(RX_cmp)
+        self._check_recordings_equal(self.RX, RX_cmp)
+        self.assertTrue(np.array_equal(RX_cmp.get_traces(channel_ids=[3, 1], start_frame=2500, end_frame=9500),
+                                       self.RX.get_traces(channel_ids=[3, 1], start_frame=2500, end_frame=9500)))
+        self.assertTrue(np.allclose(RX_cmp.get_channel_locations(), self.RX.get_channel_locations()))
+        self.assertLess(os.path.getsize(path1), self.RX.get_traces().nbytes)
+
+        # int16 neural data is compressed at least 1.5 times with respect to the raw int16 traces
+        RX_toy, _ = se.example_datasets.toy_example(duration=2, num_channels=8, seed=0)
+        traces_int16 = np.clip(np.rint(RX_toy.get_traces()), -2 ** 15, 2 ** 15 - 1).astype('int16')
+        RX_int16 = se.NumpyRecordingExtractor(timeseries=traces_int16, samplerate=RX_toy.get_sampling_frequency())
+        path2 = self.test_dir + '/toy.cdat'
+        se.CompressedRecordingExtractor.write_recording(RX_int16, path2)
+        self.assertGreater(traces_int16.nbytes / os.path.getsize(path2), 1.5)
+        path3 = self.test_dir + '/toy_shuffle.cdat'
+        se.CompressedRecordingExtractor.write_recording(RX_int16, path3, shuffle=True)
+        RX_cmp = se.CompressedRecordingExtractor(path3, max_cache_bytes=3 * 4096 * 8 * 2)
+        self.assertTrue(np.array_equal(RX_cmp.get_traces(), traces_int16))
+        self.assertLessEqual(RX_cmp._cache_bytes, 3 * 4096 * 8 * 2)
+
     def test_kilosort_extractor(self):
         path1 = self.test_dir + '/firings_true'
         se.KiloSortSortingExtractor.write_sorting(self.SX, path1)
@@ -161,6 +274,27 @@ class TestExtractors(unittest.TestCase):
         SX_kl = se.KlustaSortingExtractor(path1)
         self._check_sorting_return_types(SX_kl)
         self._check_sortings_equal(self.SX, SX_kl)
+        self.SX.set_units_property(property_name='group', values=[0, 1, 1])
+        se.KlustaSortingExtractor.write_sorting(self.SX, path1)
+        SX_kl = se.KlustaSortingExtractor(path1)
+        self.assertIsNone(SX_kl._F)
+        SX_kl = se.KlustaSortingExtractor(path1, lazy=True)
+        self.assertIsNotNone(SX_kl._F)
+        self._check_sortings_equal(self.SX, SX_kl)
+        self.assertEqual(SX_kl.get_units_property(property_name='group'), [0, 1, 1])
+        # the file is closed once all channel groups are loaded, or by close
+        self.assertIsNone(SX_kl._F)
+        SX_kl = se.KlustaSortingExtractor(path1, lazy=True)
+        SX_kl.get_unit_spike_train(1)
+        SX_kl.close()
+        self.assertRaises(ValueError, SX_kl.get_unit_spike_train, 2)
+        self.assertTrue(np.array_equal(SX_kl.get_unit_spike_train(1), self.SX.get_unit_spike_train(1)))
+        # the file is closed if reading it fails
+        with h5py.File(path1, 'a') as F:
+            del F['channel_groups/1/spikes/time_samples']
+        with mock.patch.object(h5py.File, 'close', autospec=True, side_effect=h5py.File.close) as close:
+            self.assertRaises(KeyError, se.KlustaSortingExtractor, path1)
+        self.assertEqual(close.call_count, 1)
 
     def test_spykingcircus_extractor(self):
         path1 = self.test_dir + '/firings_true'
@@ -168,6 +302,35 @@ class TestExtractors(unittest.TestCase):
         SX_spy = se.SpykingCircusSortingExtractor(path1)
         self._check_sorting_return_types(SX_spy)
         self._check_sortings_equal(self.SX, SX_spy)
+        # the returned spike trains are copies of the cached ones
+        SX_spy.get_unit_spike_train(1)[:] = 0
+        SX_spy.get_unit_spike_train(1, start_frame=2000)[:] = 0
+        self.assertTrue(np.array_equal(SX_spy.get_unit_spike_train(1), self.SX.get_unit_spike_train(1)))
+        self.SX.get_unit_spike_train(1)[:] = 0
+        self.assertTrue(np.array_equal(SX_spy.get_unit_spike_train(1), self.SX.get_unit_spike_train(1)))
+        self.SX.set_unit_spike_features(1, 'amplitudes', np.random.normal(0, 1, len(self.SX.get_unit_spike_train(1))))
+        path2 = self.test_dir + '/firings_amplitudes'
+        se.SpykingCircusSortingExtractor.write_sorting(self.SX, path2)
+        SX_spy = se.SpykingCircusSortingExtractor(path2)
+        self._check_sortings_equal(self.SX, SX_spy)
+        self.assertEqual(SX_spy.get_unit_spike_feature_names(), ['amplitudes'])
+        self.assertTrue(np.array_equal(SX_spy.get_unit_spike_features(1, 'amplitudes'),
+                                       self.SX.get_unit_spike_features(1, 'amplitudes')))
+        # the result file is kept open until close is called
+        SX_spy = se.SpykingCircusSortingExtractor(path2)
+        self.assertIsNotNone(SX_spy._f_results)
+        SX_spy.get_unit_spike_train(1)
+        SX_spy.close()
+        self.assertIsNone(SX_spy._f_results)
+        self.assertRaises(ValueError, SX_spy.get_unit_spike_train, 2)
+        self.assertTrue(np.array_equal(SX_spy.get_unit_spike_train(1), self.SX.get_unit_spike_train(1)))
+        with mock.patch.object(h5py.File, 'close', autospec=True, side_effect=h5py.File.close) as close:
+            del SX_spy
+        self.assertEqual(close.call_count, 0)
+        with mock.patch.object(h5py.File, 'close', autospec=True, side_effect=h5py.File.close) as close:
+            SX_spy = se.SpykingCircusSortingExtractor(path2)
+            del SX_spy
+        self.assertEqual(close.call_count, 1)
 
     def test_multi_sub_recording_extractor(self):
         RX_multi = se.MultiRecordingExtractor(
@@ -177,6 +340,55 @@ class TestExtractors(unittest.TestCase):
         RX_sub = RX_multi.get_epoch('C')
         self._check_recordings_equal(self.RX, RX_sub)
 
+    def test_cache_to_folder(self):
+        RX_multi = se.MultiRecordingExtractor(recordings=[self.RX, self.RX], epoch_names=['A', 'B'])
+        RX_sub = se.SubRecordingExtractor(RX_multi, channel_ids=[0, 1, 2], start_frame=5000, end_frame=15000)
+        RX_sub.add_epoch('middle', 4000, 6000)
+        path1 = self.test_dir + '/cached_recording'
+        RX_cached = se.cache_to_folder(RX_sub, path1, chunksize=3000)
+        self._check_recording_return_types(RX_cached)
+        self._check_recordings_equal(RX_sub, RX_cached)
+        self.assertEqual(RX_cached.get_epoch_info('middle'), {'start_frame': 4000, 'end_frame': 6000})
+        # the conversion is skipped when the source has not changed
+        mtime = os.path.getmtime(path1 + '/traces.raw')
+        RX_cached = se.cache_to_folder(RX_sub, path1)
+        self.assertEqual(os.path.getmtime(path1 + '/traces.raw'), mtime)
+        self._check_recordings_equal(RX_sub, se.load_cached(path1))
+        # in-memory sources are keyed on all their data
+        self.RX._timeseries[1, 9000] += 1
+        RX_cached = se.cache_to_folder(RX_sub, path1)
+        self._check_recordings_equal(RX_sub, RX_cached)
+        # only the declared source files are used, not any attribute that is an existing path
+        self.RX.probe_file = self.test_dir + '/probe.prb'
+        open(self.RX.probe_file, 'w').close()
+        se.cache_to_folder(RX_sub, path1)
+        self.RX._timeseries[1, 9000] += 1
+        RX_cached = se.cache_to_folder(RX_sub, path1)
+        self._check_recordings_equal(RX_sub, RX_cached)
+        del self.RX.probe_file
+        # file sources are keyed on their size and modification time
+        path_bin = self.test_dir + '/source.dat'
+        se.BinDatRecordingExtractor.write_recording(self.RX, path_bin)
+        RX_bin = se.BinDatRecordingExtractor(path_bin, self.RX.get_sampling_frequency(), self.RX.get_num_channels(),
+                                             'float32')
+        path3 = self.test_dir + '/cached_bin'
+        se.cache_to_folder(RX_bin, path3)
+        data = np.memmap(path_bin, dtype='float32', mode='r+')
+        data[len(data) // 2] += 1
+        data.flush()
+        del data
+        stat = os.stat(path_bin)
+        os.utime(path_bin, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        RX_bin = se.BinDatRecordingExtractor(path_bin, self.RX.get_sampling_frequency(), self.RX.get_num_channels(),
+                                             'float32')
+        self._check_recordings_equal(RX_bin, se.cache_to_folder(RX_bin, path3))
+
+        path2 = self.test_dir + '/cached_sorting'
+        SX_cached = se.cache_to_folder(self.SX, path2)
+        self._check_sorting_return_types(SX_cached)
+        self._check_sortings_equal(self.SX, SX_cached)
+        self.assertEqual(SX_cached.get_unit_property(1, 'stablility'), self.example_info['unit_prop'])
+
     def test_curation_sorting_extractor(self):
         #Dummy features for testing merging and splitting of features
         self.SX.set_unit_spike_features(1, 'f_int', range(0 + 1, len(self.SX.get_unit_spike_train(1)) + 1))
@@ -189,7 +401,7 @@ class TestExtractors(unittest.TestCase):
         )
         CSX.merge_units(unit_ids=[1, 2])
         original_spike_train = np.concatenate((self.SX.get_unit_spike_train(1), self.SX.get_unit_spike_train(2)))
-        indices_sort = np.argsort(original_spike_train)
+        indices_sort = np.argsort(original_spike_train, kind='mergesort')
         original_spike_train = original_spike_train[indices_sort]
         original_features = np.concatenate((self.SX.get_unit_spike_features(1, 'f_int'), self.SX.get_unit_spike_features(2, 'f_int')))
         original_features = original_features[indices_sort]
@@ -209,6 +421,92 @@ class TestExtractors(unittest.TestCase):
         self.assertTrue(np.array_equal(original_features[:10], split_features_1))
         self.assertTrue(np.array_equal(original_features[10:], split_features_2))
 
+        CSX.exclude_units([6])
+        self.assertRaises(ValueError, CSX.split_unit, 5, [10])
+        CSX_replayed = se.CurationSortingExtractor(parent_sorting=self.SX, journal=CSX.get_curation_journal())
+        self.assertEqual(CSX_replayed.get_unit_ids(), [4, 5])
+        self._check_sortings_equal(CSX, CSX_replayed)
+        self.assertTrue(np.array_equal(CSX_replayed.get_unit_spike_features(4, 'f_int'),
+                                       CSX.get_unit_spike_features(4, 'f_int')))
+        # the returned unit ids are copies
+        CSX.get_unit_ids().append(99)
+        self.assertEqual(CSX.get_unit_ids(), [4, 5])
+
+        # spikes at the same frame are ordered as their units in the merged unit ids
+        SX_ties = se.NumpySortingExtractor()
+        SX_ties.add_unit(unit_id=1, times=[10, 20])
+        SX_ties.add_unit(unit_id=2, times=[10, 30])
+        SX_ties.set_unit_spike_features(1, 'f_int', np.array([0, 1]))
+        SX_ties.set_unit_spike_features(2, 'f_int', np.array([100, 101]))
+        CSX = se.CurationSortingExtractor(parent_sorting=SX_ties)
+        CSX.merge_units(unit_ids=[2, 1])
+        self.assertTrue(np.array_equal(CSX.get_unit_spike_train(3), [10, 10, 20, 30]))
+        self.assertTrue(np.array_equal(CSX.get_unit_spike_features(3, 'f_int'), [100, 0, 1, 101]))
+        CSX.split_unit(unit_id=3, indices=[1, 2])
+        self.assertTrue(np.array_equal(CSX.get_unit_spike_features(4, 'f_int'), [0, 1]))
+        self.assertTrue(np.array_equal(CSX.get_unit_spike_features(5, 'f_int'), [100, 101]))
+
+    def test_curation_log(self):
+        log_file = os.path.join(self.test_dir, 'curation.log')
+        self.SX.set_unit_spike_features(3, 'f_int', range(0, len(self.SX.get_unit_spike_train(3))))
+        CSX = se.CurationSortingExtractor(parent_sorting=self.SX, curation_log=log_file)
+        CSX.merge_units(unit_ids=[1, 2])
+        CSX.split_unit(unit_id=3, indices=[0, 3, 5, 7])
+        CSX.exclude_units([6])
+        CSX_loaded = se.CurationSortingExtractor(parent_sorting=self.SX, curation_log=log_file)
+        self.assertEqual(CSX_loaded.get_unit_ids(), [4, 5])
+        self._check_sortings_equal(CSX, CSX_loaded)
+        self.assertTrue(np.array_equal(CSX_loaded.get_unit_spike_features(5, 'f_int'), [0, 3, 5, 7]))
+
+        # an interrupted write is discarded and new operations are appended
+        with open(log_file, 'a') as f:
+            f.write('{"op": "exclude", "unit_')
+        CSX_loaded = se.CurationSortingExtractor(parent_sorting=self.SX, curation_log=log_file)
+        CSX_loaded.exclude_units([5])
+        CSX_loaded = se.CurationSortingExtractor(parent_sorting=self.SX, curation_log=log_file)
+        self.assertEqual(CSX_loaded.get_unit_ids(), [4])
+        self.assertRaises(ValueError, se.CurationSortingExtractor, self.SX2, curation_log=log_file)
+
+    def test_curation_journal_replay(self):
+        SX = se.NumpySortingExtractor()
+        for unit_id in range(1, 41):
+            SX.add_unit(unit_id=unit_id, times=np.sort(np.random.randint(0, 10000, 50)))
+            SX.set_unit_spike_features(unit_id, 'f_int', np.arange(50) + 1000 * unit_id)
+        # each operation is applied before the next one
+        CSX = se.CurationSortingExtractor(parent_sorting=SX)
+        for unit_id in range(1, 31, 2):
+            CSX.merge_units(unit_ids=[unit_id + 1, unit_id])
+            CSX.get_spike_vector()
+        CSX.exclude_units([31, 32])
+        CSX.get_spike_vector()
+        CSX.merge_units(unit_ids=[41, 33, 43])
+        CSX.get_spike_vector()
+        journal = CSX.get_curation_journal()
+
+        # consecutive merges and excludes relabel the spikes in a single pass
+        CSX_replayed = se.CurationSortingExtractor(parent_sorting=SX, journal=journal)
+        with mock.patch.object(CSX_replayed, '_relabel_spikes', wraps=CSX_replayed._relabel_spikes) as relabel, \
+                mock.patch.object(CSX_replayed, '_get_label_positions',
+                                  wraps=CSX_replayed._get_label_positions) as get_positions:
+            self._check_sortings_equal(CSX, CSX_replayed)
+        self.assertEqual(relabel.call_count, 1)
+        self.assertEqual(get_positions.call_count, 1)
+        for unit_id in CSX.get_unit_ids():
+            self.assertTrue(np.array_equal(CSX_replayed.get_unit_spike_features(unit_id, 'f_int'),
+                                           CSX.get_unit_spike_features(unit_id, 'f_int')))
+
+        # splits are applied between the composed operations
+        CSX.split_unit(unit_id=42, indices=np.arange(0, 100, 3))
+        CSX.get_spike_vector()
+        CSX.merge_units(unit_ids=[56, 34, 35])
+        CSX_replayed = se.CurationSortingExtractor(parent_sorting=SX, journal=CSX.get_curation_journal())
+        with mock.patch.object(CSX_replayed, '_relabel_spikes', wraps=CSX_replayed._relabel_spikes) as relabel:
+            self._check_sortings_equal(CSX, CSX_replayed)
+        self.assertEqual(relabel.call_count, 2)
+        for unit_id in CSX.get_unit_ids():
+            self.assertTrue(np.array_equal(CSX_replayed.get_unit_spike_features(unit_id, 'f_int'),
+                                           CSX.get_unit_spike_features(unit_id, 'f_int')))
+
     def test_multi_sub_sorting_extractor(self):
         N = self.RX.get_num_frames()
         SX_multi = se.MultiSortingExtractor(
@@ -250,6 +548,46 @@ class TestExtractors(unittest.TestCase):
         SX_sub1 = se.SubSortingExtractor(parent_sorting=SX_multi, start_frame=0, end_frame=N)
         self._check_sortings_equal(SX_multi, SX_sub1)
 
+    def test_multi_sorting_features(self):
+        N = self.RX.get_num_frames()
+        for unit_id in self.SX.get_unit_ids():
+            self.SX.set_unit_spike_features(unit_id, 'f_int', np.arange(len(self.SX.get_unit_spike_train(unit_id))))
+        SX_multi = se.MultiSortingExtractor(
+            sortings=[self.SX, self.SX],
+            start_frames=[N, 0]
+        )
+        self.assertEqual(SX_multi.get_unit_spike_feature_names(1), ['f_int'])
+        spike_train = SX_multi.get_unit_spike_train(1, start_frame=N // 2, end_frame=N + N // 2)
+        features = SX_multi.get_unit_spike_features(1, 'f_int', start_frame=N // 2, end_frame=N + N // 2)
+        original_train = self.SX.get_unit_spike_train(1)
+        expected_train = np.concatenate((original_train, original_train + N))
+        expected_features = np.concatenate((np.arange(len(original_train)), np.arange(len(original_train))))
+        mask = (expected_train >= N // 2) & (expected_train < N + N // 2)
+        self.assertTrue(np.array_equal(spike_train, expected_train[mask]))
+        self.assertTrue(np.array_equal(features, expected_features[mask]))
+
+        # units 2 and 3 have float spike times
+        spike_trains, features = self.SX.get_all_spike_features('f_int', start_frame=50, end_frame=200)
+        for i, unit_id in enumerate(self.SX.get_unit_ids()):
+            original_train = self.SX.get_unit_spike_train(unit_id)
+            idxs = np.where((original_train >= 50) & (original_train < 200))[0]
+            self.assertTrue(np.array_equal(spike_trains[i], original_train[idxs]))
+            self.assertTrue(np.array_equal(features[i], idxs))
+
+        # float spike times at the window bounds: 49.6 -> 50 is in [50, 200) and 199.7 -> 200 is not
+        SX_float = se.NumpySortingExtractor()
+        SX_float.add_unit(unit_id=1, times=np.array([10.2, 49.6, 60.0, 199.7, 250.0]))
+        SX_float.set_unit_spike_features(1, 'f_int', np.arange(5))
+        spike_trains, features = SX_float.get_all_spike_features('f_int', start_frame=50, end_frame=200)
+        self.assertTrue(np.array_equal(spike_trains[0], [50, 60]))
+        self.assertTrue(np.array_equal(features[0], [1, 2]))
+        # in the second sorting, 49.6 -> 350 is not in [50, 350)
+        SX_multi = se.MultiSortingExtractor(sortings=[SX_float, SX_float], start_frames=[0, 300])
+        self.assertTrue(np.array_equal(SX_multi.get_unit_spike_train(1, start_frame=50, end_frame=350),
+                                       [50, 60, 200, 250, 310]))
+        self.assertTrue(np.array_equal(SX_multi.get_unit_spike_features(1, 'f_int', start_frame=50, end_frame=350),
+                                       [1, 2, 3, 4, 0]))
+
     def _check_recordings_equal(self, RX1, RX2):
         M = RX1.get_num_channels()
         N = RX1.get_num_frames()
@@ -55,6 +55,124 @@ class TestNumpyExtractors(unittest.TestCase):
         snippets = self.RX.get_snippets(reference_frames=[0, 30, 50], snippet_len=20)
         self.assertTrue(np.allclose(snippets[1], self._X[:, 20:40]))
 
+    def test_get_snippets_chunked(self):
+        N = self._X.shape[1]
+        reference_frames = [5000, 0, 3, 12, 9995, N - 1, 4000, 4010, -1, N, 7000]
+        snippets = self.RX.get_snippets(reference_frames=reference_frames, snippet_len=(10, 20),
+                                        channel_ids=[3, 1], max_chunk_frames=50)
+        self.assertEqual(snippets.shape, (len(reference_frames), 2, 30))
+        padded = np.pad(self._X[[3, 1]], ((0, 0), (10, 20)), mode='constant')
+        for i, frame in enumerate(reference_frames):
+            if 0 <= frame < N:
+                self.assertTrue(np.allclose(snippets[i], padded[:, frame:frame + 30]))
+            else:
+                self.assertTrue(np.all(snippets[i] == 0))
+        snippets_single_read = self.RX.get_snippets(reference_frames=reference_frames, snippet_len=(10, 20),
+                                                    channel_ids=[3, 1], max_chunk_frames=N)
+        self.assertTrue(np.allclose(snippets, snippets_single_read))
+        sub_RX = se.SubRecordingExtractor(self.RX, start_frame=1000, end_frame=2000)
+        sub_snippets = sub_RX.get_snippets(reference_frames=[0, 500, 999], snippet_len=20)
+        self.assertTrue(np.allclose(sub_snippets[1], self._X[:, 1490:1510]))
+        self.assertTrue(np.all(sub_snippets[0][:, :10] == 0))
+        self.assertTrue(np.all(sub_snippets[2][:, 11:] == 0))
+
+    def test_iter_chunks(self):
+        N = self._X.shape[1]
+        chunks = list(self.RX.iter_chunks(chunk_size=3000, channel_ids=[2, 0]))
+        self.assertEqual([(sf, ef) for sf, ef, _ in chunks], [(0, 3000), (3000, 6000), (6000, 9000), (9000, N)])
+        self.assertTrue(np.allclose(np.concatenate([tr for _, _, tr in chunks], axis=1), self._X[[2, 0]]))
+
+        padded = np.pad(self._X, ((0, 0), (100, 100)), mode='constant')
+        for n_jobs in [1, 3]:
+            n_chunks = 0
+            for sf, ef, traces in self.RX.iter_chunks(chunk_size=999, margin=100, start_frame=10, n_jobs=n_jobs):
+                self.assertEqual(traces.shape, (self._X.shape[0], ef - sf + 200))
+                self.assertTrue(np.allclose(traces, padded[:, sf:ef + 200]))
+                n_chunks += 1
+            self.assertEqual(n_chunks, int(np.ceil((N - 10) / 999)))
+
+    def test_multi_recording(self):
+        sub_RXs = [se.SubRecordingExtractor(self.RX, start_frame=sf, end_frame=ef)
+                   for sf, ef in [(0, 3000), (3000, 3500), (3500, 7000), (7000, 10000)]]
+        for n_jobs in [1, 3]:
+            multi_RX = se.MultiRecordingExtractor(sub_RXs, n_jobs=n_jobs)
+            self.assertTrue(np.allclose(multi_RX.get_traces(), self._X))
+            self.assertTrue(np.allclose(multi_RX.get_traces(channel_ids=[1, 3], start_frame=2999, end_frame=7000),
+                                        self._X[[1, 3], 2999:7000]))
+            self.assertTrue(np.allclose(multi_RX.get_traces(start_frame=3100, end_frame=3200),
+                                        self._X[:, 3100:3200]))
+        # the thread pool is created once and reused
+        executor = multi_RX._executor
+        multi_RX.get_traces()
+        self.assertIs(multi_RX._executor, executor)
+        frames = np.array([0, 2999, 3000, 3499, 3500, 9999])
+        times = multi_RX.frame_to_time(frames)
+        self.assertTrue(np.allclose(times, [multi_RX.frame_to_time(f) for f in frames]))
+        self.assertTrue(np.allclose(times, frames / self._samplerate))
+        self.assertTrue(np.allclose(multi_RX.time_to_frame(times), frames))
+
+    def test_cached_recording(self):
+        cached_RX = se.CachedRecordingExtractor(self.RX, block_size=1000, max_cache_bytes=3 * 4 * 1000 * 8)
+        self.assertTrue(np.allclose(cached_RX.get_traces(start_frame=1500, end_frame=1600), self._X[:, 1500:1600]))
+        self.assertEqual(cached_RX.get_cache_info()['misses'], 1)
+        # spans blocks 1 to 3, block 1 is cached
+        self.assertTrue(np.allclose(cached_RX.get_traces(channel_ids=[2, 0], start_frame=1900, end_frame=3100),
+                                    self._X[[2, 0], 1900:3100]))
+        cache_info = cached_RX.get_cache_info()
+        self.assertEqual((cache_info['hits'], cache_info['misses'], cache_info['num_blocks']), (1, 3, 3))
+        # block 1 is the least recently used one and is evicted by block 4
+        cached_RX.get_traces(start_frame=4000, end_frame=4010)
+        cached_RX.get_traces(start_frame=1000, end_frame=1010)
+        cache_info = cached_RX.get_cache_info()
+        self.assertEqual((cache_info['hits'], cache_info['misses'], cache_info['num_blocks']), (1, 5, 3))
+        self.assertTrue(np.allclose(cached_RX.get_traces(), self._X))
+        cached_RX.clear_cache()
+        self.assertEqual(cached_RX.get_cache_info()['num_blocks'], 0)
+
+    def test_unit_waveforms(self):
+        self.RX.set_channels_property(property_name='group', values=[0, 0, 1, 1])
+        self.SX.set_unit_property(2, 'group', 1)
+        waveforms, spike_idxs = se.get_unit_waveforms(self.RX, self.SX, ms_before=0.5, ms_after=1., chunk_size=3000,
+                                                      grouping_property='group', max_spikes_per_unit=50,
+                                                      return_idxs=True)
+        for unit_id, wf, idxs in zip(self.SX.get_unit_ids(), waveforms, spike_idxs):
+            channel_ids = [2, 3] if unit_id == 2 else None
+            snippets = self.RX.get_snippets(reference_frames=self.SX.get_unit_spike_train(unit_id)[idxs],
+                                            snippet_len=[15, 30], channel_ids=channel_ids)
+            self.assertEqual(len(idxs), 50)
+            self.assertEqual(wf.dtype, snippets.dtype)
+            self.assertTrue(np.allclose(wf, snippets))
+        waveforms = se.get_unit_waveforms(self.RX, self.SX, ms_before=0.5, ms_after=1., max_spikes_per_unit=50,
+                                          dtype='float32')
+        self.assertTrue(all(wf.dtype == np.float32 for wf in waveforms))
+
+    def test_lazy_features(self):
+        train = self.SX.get_unit_spike_train(1)
+        all_amplitudes = np.random.normal(0, 1, 3 * len(train))
+        spike_indices = np.arange(len(train)) * 3
+        self.SX.set_lazy_unit_spike_features(1, 'amplitudes', all_amplitudes, spike_indices=spike_indices)
+        self.SX.set_lazy_unit_spike_features(2, 'amplitudes', lambda: np.ones(len(self.SX.get_unit_spike_train(2))))
+        self.assertTrue(np.array_equal(self.SX.get_unit_spike_features(1, 'amplitudes'), all_amplitudes[::3]))
+        window = (train >= 2000) & (train < 5000)
+        self.assertTrue(np.array_equal(self.SX.get_unit_spike_features(1, 'amplitudes', start_frame=2000,
+                                                                       end_frame=5000), all_amplitudes[::3][window]))
+        self.SX.set_features_cache_size(10 ** 6)
+        self.assertTrue(np.array_equal(self.SX.get_unit_spike_features(2, 'amplitudes'), np.ones(200)))
+        self.assertRaises(ValueError, self.SX.set_lazy_unit_spike_features, 3, 'amplitudes', np.ones(5))
+
+        sub_SX = se.SubSortingExtractor(self.SX, unit_ids=[1, 2], start_frame=2000, end_frame=5000)
+        self.assertTrue(np.array_equal(sub_SX.get_unit_spike_features(1, 'amplitudes'), all_amplitudes[::3][window]))
+        # the curated spike trains are sorted, and their features with them
+        CSX = se.CurationSortingExtractor(parent_sorting=self.SX)
+        order = np.argsort(train, kind='mergesort')
+        CSX.split_unit(unit_id=1, indices=[0, 1, 2])
+        self.assertTrue(np.array_equal(CSX.get_unit_spike_features(4, 'amplitudes'), all_amplitudes[::3][order[:3]]))
+        CSX.merge_units(unit_ids=[2, 5])
+        merged_train = np.concatenate([np.sort(self.SX.get_unit_spike_train(2)), train[order[3:]]])
+        merged_features = np.concatenate([np.ones(200), all_amplitudes[::3][order[3:]]])
+        self.assertTrue(np.array_equal(CSX.get_unit_spike_features(6, 'amplitudes'),
+                                       merged_features[np.argsort(merged_train, kind='mergesort')]))
+
     def test_sorting_extractor(self):
         unit_ids = [1, 2, 3]
         # get_unit_ids
@@ -63,6 +181,92 @@ class TestNumpyExtractors(unittest.TestCase):
         st = self.SX.get_unit_spike_train(unit_id=1)
         self.assertTrue(np.allclose(st, self._train1))
 
+    def test_unsorted_unit(self):
+        times = np.array([300, 20, 150, 80, 500])
+        self.SX.add_unit(unit_id=10, times=times)
+        self.SX.set_unit_spike_features(10, 'f', np.arange(5))
+        self.assertTrue(np.array_equal(self.SX.get_unit_spike_train(10), times))
+        self.assertTrue(np.array_equal(self.SX.get_unit_spike_train(10, start_frame=50, end_frame=400), [300, 150, 80]))
+        self.assertTrue(np.array_equal(self.SX.get_unit_spike_features(10, 'f', start_frame=50, end_frame=400),
+                                       [0, 2, 3]))
+
+    def test_id_lookup(self):
+        self.SX.set_unit_property(3, 'quality', 'good')
+        self.SX.add_unit(unit_id=10, times=np.arange(5))
+        self.SX.set_unit_property(10, 'quality', 'noise')
+        self.assertEqual(self.SX.get_unit_property(10, 'quality'), 'noise')
+        self.assertRaises(ValueError, self.SX.set_unit_property, 11, 'quality', 'good')
+        self.assertEqual(self.RX._get_channel_indices([3, 0]), [3, 0])
+        self.assertRaises(ValueError, self.RX._get_channel_indices, [4])
+        # the returned ids are copies
+        self.SX.get_unit_ids().append(11)
+        self.assertRaises(ValueError, self.SX.set_unit_property, 11, 'quality', 'good')
+        self.RX.get_channel_ids().append(4)
+        self.assertEqual(self.RX.get_num_channels(), 4)
+
+    def test_property_columns(self):
+        self.RX.set_channels_property(property_name='group', values=[0, 0, 1, 1])
+        self.assertEqual(self.RX.get_channel_groups(), [0, 0, 1, 1])
+        self.assertEqual(self.RX.get_channels_property(channel_ids=[3, 1], property_name='group'), [1, 0])
+        self.assertEqual(self.RX.get_channel_property_names(), ['group', 'location'])
+        self.RX.set_channel_property(2, 'quality', 'bad')
+        self.assertEqual(self.RX.get_channel_property_names(2), ['group', 'location', 'quality'])
+        self.assertEqual(self.RX.get_channel_property_names(1), ['group', 'location'])
+        self.assertRaises(ValueError, self.RX.get_channels_property, property_name='quality')
+
+        sub_RX = se.SubRecordingExtractor(self.RX, channel_ids=[2, 3], renamed_channel_ids=[0, 1])
+        self.assertEqual(sub_RX.get_channel_groups(), [1, 1])
+        self.assertEqual(sub_RX.get_channel_property(0, 'quality'), 'bad')
+        self.assertEqual(sub_RX.get_channel_property_names(), ['group', 'location', 'quality'])
+        self.assertRaises(ValueError, sub_RX.get_channel_property_names, 2)
+        self.assertRaises(ValueError, se.SubSortingExtractor(self.SX, unit_ids=[1]).get_unit_property_names, 2)
+        sub_RX.set_channel_property(0, 'group', 5)
+        self.assertEqual(sub_RX.get_channel_groups(), [5, 1])
+        self.assertEqual(self.RX.get_channel_property(2, 'group'), 1)
+        # properties set on the parent after construction are visible
+        self.RX.set_channel_property(3, 'quality', 'good')
+        self.assertEqual(sub_RX.get_channel_property(1, 'quality'), 'good')
+
+        subs = se.get_sub_extractors_by_property(self.RX, 'group')
+        self.assertEqual([sub.get_channel_ids() for sub in subs], [[0, 1], [2, 3]])
+
+        self.SX.set_units_property(property_name='quality', values=['good', 'noise', 'good'])
+        sub_SX = se.SubSortingExtractor(self.SX, unit_ids=[2, 3])
+        self.assertEqual(sub_SX.get_units_property(property_name='quality'), ['noise', 'good'])
+        multi_SX = se.MultiSortingExtractor(sortings=[self.SX, sub_SX])
+        self.assertEqual(multi_SX.get_units_property(property_name='quality'),
+                         ['good', 'noise', 'good', 'noise', 'good'])
+        self.assertEqual(multi_SX.get_unit_property_names(4), ['quality'])
+
+    def test_spike_train_windows(self):
+        train = self.SX.get_unit_spike_train(unit_id=1)
+        windowed = self.SX.get_unit_spike_train(unit_id=1, start_frame=2000, end_frame=5000)
+        self.assertTrue(np.array_equal(windowed, train[(train >= 2000) & (train < 5000)]))
+        self.assertEqual(len(self.SX.get_unit_spike_train(unit_id=1, start_frame=5000, end_frame=2000)), 0)
+
+        sub_SX = se.SubSortingExtractor(self.SX, start_frame=1000, end_frame=6000)
+        sub_train = sub_SX.get_unit_spike_train(unit_id=1, start_frame=1000)
+        self.assertTrue(np.array_equal(sub_train, train[(train >= 2000) & (train < 6000)] - 1000))
+
+        multi_SX = se.MultiSortingExtractor(sortings=[self.SX, self.SX])
+        self.assertTrue(np.array_equal(multi_SX.get_unit_spike_train(unit_id=3, start_frame=2000, end_frame=5000),
+                                       self.SX.get_unit_spike_train(unit_id=1, start_frame=2000, end_frame=5000)))
+
+    def test_float_spike_times_sub_features(self):
+        # float spike times are windowed as the rounded frames of the spike train: 49.6 -> 50 is
+        # in [50, 200) and 199.7 -> 200 is not
+        SX = se.NumpySortingExtractor()
+        SX.add_unit(unit_id=1, times=np.array([10.2, 49.6, 60.0, 199.7, 250.0]))
+        SX.add_unit(unit_id=2, times=np.array([250.0, 49.6, 199.7, 10.2, 60.0]))
+        SX.set_unit_spike_features(1, 'f_int', np.arange(5))
+        SX.set_unit_spike_features(2, 'f_int', np.arange(5))
+        sub_SX = se.SubSortingExtractor(SX, start_frame=50, end_frame=200)
+        sub_SX.copy_unit_spike_features(SX)
+        self.assertTrue(np.array_equal(sub_SX.get_unit_spike_train(1), [0, 10]))
+        self.assertTrue(np.array_equal(sub_SX.get_unit_spike_features(1, 'f_int'), [1, 2]))
+        self.assertTrue(np.array_equal(sub_SX.get_unit_spike_train(2), [0, 10]))
+        self.assertTrue(np.array_equal(sub_SX.get_unit_spike_features(2, 'f_int'), [1, 4]))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,109 @@
+import numpy as np
+import os
+import shutil
+import tempfile
+import unittest
+import spikeextractors as se
+
+
+class TestSpikeVector(unittest.TestCase):
+    def setUp(self):
+        self._times = np.random.randint(0, 10000, 1000)
+        self._labels = np.random.choice([3, 7, 11], 1000)
+        self.SV = se.SpikeVector(self._times, self._labels, unit_ids=[3, 7, 11, 20])
+
+    def test_spike_trains(self):
+        self.assertEqual(self.SV.get_unit_ids(), [3, 7, 11, 20])
+        self.assertEqual(self.SV.get_num_spikes(), 1000)
+        for unit_id in [3, 7, 11]:
+            expected = np.sort(self._times[self._labels == unit_id])
+            self.assertTrue(np.array_equal(self.SV.get_unit_spike_train(unit_id), expected))
+            windowed = expected[(expected >= 2000) & (expected < 5000)]
+            self.assertTrue(np.array_equal(self.SV.get_unit_spike_train(unit_id, start_frame=2000, end_frame=5000),
+                                           windowed))
+            self.assertEqual(len(self.SV.get_unit_spike_train(unit_id, start_frame=5000, end_frame=2000)), 0)
+            idx = self.SV.get_unit_spike_indices(unit_id)
+            self.assertTrue(np.all(self._labels[idx] == unit_id))
+            self.assertTrue(np.array_equal(self._times[idx], expected))
+        self.assertEqual(len(self.SV.get_unit_spike_train(20)), 0)
+        with self.assertRaises(ValueError):
+            self.SV.get_unit_spike_train(5)
+
+    def test_spike_vector(self):
+        times, unit_indices = self.SV.get_spike_vector()
+        self.assertTrue(np.array_equal(times, np.sort(self._times)))
+        unit_ids = np.array(self.SV.get_unit_ids())
+        for unit_id in [3, 7, 11]:
+            self.assertTrue(np.array_equal(times[unit_ids[unit_indices] == unit_id],
+                                           self.SV.get_unit_spike_train(unit_id)))
+        times, unit_indices = self.SV.get_spike_vector(unit_ids=[11, 3], start_frame=2000, end_frame=5000)
+        mask = (self._times >= 2000) & (self._times < 5000) & np.isin(self._labels, [11, 3])
+        self.assertTrue(np.array_equal(times, np.sort(self._times[mask])))
+        labels = np.array([11, 3])[unit_indices]
+        self.assertEqual(sorted(zip(times, labels)), sorted(zip(self._times[mask], self._labels[mask])))
+
+    def test_returned_copies(self):
+        # writing to the returned arrays does not change the stored spikes
+        expected_times, expected_unit_indices = self.SV.get_spike_vector()
+        spike_train = self.SV.get_unit_spike_train(3)
+        spike_train -= 100
+        self.SV.get_unit_spike_indices(3)[:] = 0
+        times, unit_indices = self.SV.get_spike_vector()
+        times[:] = 0
+        unit_indices[:] = 0
+        self.assertTrue(np.array_equal(self.SV.get_unit_spike_train(3), np.sort(self._times[self._labels == 3])))
+        self.assertTrue(np.all(self._labels[self.SV.get_unit_spike_indices(3)] == 3))
+        times, unit_indices = self.SV.get_spike_vector()
+        self.assertTrue(np.array_equal(times, expected_times))
+        self.assertTrue(np.array_equal(unit_indices, expected_unit_indices))
+
+        # the same holds for the sorting extractors backed by a SpikeVector
+        SX = se.NumpySortingExtractor()
+        SX.set_times_labels(self._times, self._labels)
+        test_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(test_dir, 'sorting.npz')
+            se.NpzSortingExtractor.write_sorting(SX, path)
+            SX_npz = se.NpzSortingExtractor(path)
+            SX_npz.get_unit_spike_train(7)[:] = 0
+            self.assertTrue(np.array_equal(SX_npz.get_unit_spike_train(7), np.sort(self._times[self._labels == 7])))
+        finally:
+            shutil.rmtree(test_dir)
+
+    def test_sorting_spike_vector(self):
+        SX = se.NumpySortingExtractor()
+        SX.set_times_labels(self._times, self._labels)
+        sorting_times, sorting_unit_indices = SX.get_spike_vector(unit_ids=[3, 7, 11])
+        times, unit_indices = self.SV.get_spike_vector(unit_ids=[3, 7, 11])
+        self.assertTrue(np.array_equal(sorting_times, times))
+        self.assertTrue(np.array_equal(sorting_unit_indices, unit_indices))
+        spike_trains = SX.get_all_spike_trains(start_frame=100, end_frame=900)
+        for unit_id, spike_train in zip(SX.get_unit_ids(), spike_trains):
+            self.assertTrue(np.array_equal(np.sort(spike_train),
+                                           self.SV.get_unit_spike_train(unit_id, start_frame=100, end_frame=900)))
+
+    def test_tie_order(self):
+        # spikes at the same frame follow the order of the passed unit_ids
+        SV = se.SpikeVector([10, 10, 20], [1, 2, 2])
+        times, unit_indices = SV.get_spike_vector(unit_ids=[2, 1])
+        self.assertTrue(np.array_equal(times, [10, 10, 20]))
+        self.assertTrue(np.array_equal(unit_indices, [0, 1, 0]))
+
+        SX = se.NumpySortingExtractor()
+        SX.set_times_labels(np.array([10, 10, 20]), np.array([1, 2, 2]))
+        test_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(test_dir, 'sorting.npz')
+            se.NpzSortingExtractor.write_sorting(SX, path)
+            SX_npz = se.NpzSortingExtractor(path)
+            for unit_ids in ([2, 1], [1, 2], [2]):
+                sorting_times, sorting_unit_indices = SX.get_spike_vector(unit_ids=unit_ids)
+                times, unit_indices = SX_npz.get_spike_vector(unit_ids=unit_ids)
+                self.assertTrue(np.array_equal(sorting_times, times))
+                self.assertTrue(np.array_equal(sorting_unit_indices, unit_indices))
+        finally:
+            shutil.rmtree(test_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -54,9 +54,23 @@ class TestTools(unittest.TestCase):
         assert np.allclose(data, self.RX.get_traces())
         del(data) # this close the file
 
-        # time_axis=1 chunksize=99 do not work
-        with self.assertRaises(Exception) as context:
-            se.write_binary_dat_format(self.RX, self.test_dir + 'rec.dat', time_axis=1, dtype='float32', chunksize=99)
+        # time_axis=1 chunksize=99
+        se.write_binary_dat_format(self.RX, self.test_dir + 'rec.dat', time_axis=1, dtype='float32', chunksize=99)
+        data = np.memmap(open(self.test_dir + 'rec.dat'), dtype='float32', mode='r', shape=(nb_chan, nb_sample))
+        assert np.allclose(data, self.RX.get_traces())
+        del(data) # this close the file
+
+        # parallel writing with scaling and clipping to int16
+        for time_axis in [0, 1]:
+            se.write_binary_dat_format(self.RX, self.test_dir + 'rec.dat', time_axis=time_axis, dtype='int16',
+                                       chunksize=999, n_jobs=4, scale=20000)
+            if time_axis == 0:
+                data = np.memmap(open(self.test_dir + 'rec.dat'), dtype='int16', mode='r', shape=(nb_sample, nb_chan)).T
+            else:
+                data = np.memmap(open(self.test_dir + 'rec.dat'), dtype='int16', mode='r', shape=(nb_chan, nb_sample))
+            expected = np.clip(np.rint(self.RX.get_traces() * 20000), -32768, 32767)
+            assert np.array_equal(data, expected)
+            del(data) # this close the file
 
 
 